@@ -1,42 +1,109 @@
+import argparse
 import os
+import sys
+from collections import defaultdict
 
+import dataset_manifest
 
-dataset_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset", "train")
-if not os.path.exists(dataset_path):
-    dataset_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset", "padangfood")
-
-print(f"Analyzing dataset at: {dataset_path}")
-
-if not os.path.exists(dataset_path):
-    print("Dataset path not found!")
-    exit(1)
-
-class_counts = {}
-total_images = 0
-
-for class_name in os.listdir(dataset_path):
-    class_dir = os.path.join(dataset_path, class_name)
-    if os.path.isdir(class_dir):
-        count = len([f for f in os.listdir(class_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))])
-        class_counts[class_name] = count
-        total_images += count
-
-print(f"\nTotal Images: {total_images}")
-print("\nClass Distribution:")
-print("-" * 30)
-for cls, count in sorted(class_counts.items(), key=lambda x: x[1], reverse=True):
-    percentage = (count / total_images) * 100
-    print(f"{cls:<20}: {count:>3} ({percentage:.1f}%)")
-print("-" * 30)
-
-# Check for imbalance
-counts = list(class_counts.values())
-min_count = min(counts)
-max_count = max(counts)
-ratio = max_count / min_count
-
-print(f"\nImbalance Ratio (Max/Min): {ratio:.2f}")
-if ratio > 1.5:
-    print("WARNING: Dataset is imbalanced. Class weights recommended.")
-else:
-    print("Dataset is relatively balanced.")
+
+DEFAULT_DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset", "train")
+if not os.path.exists(DEFAULT_DATASET_PATH):
+    DEFAULT_DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset", "padangfood")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Class balance, integrity and resolution report for the dataset")
+    parser.add_argument('--dataset', default=DEFAULT_DATASET_PATH)
+    parser.add_argument('--workers', type=int, help="Parallel inspection threads (default: CPU count)")
+    parser.add_argument('--no-quarantine', action='store_true', help="Report corrupt files without moving them")
+    args = parser.parse_args(argv)
+    dataset_path = args.dataset
+
+    print(f"Analyzing dataset at: {dataset_path}")
+
+    if not os.path.exists(dataset_path):
+        print("Dataset path not found!")
+        return 1
+
+    # Incremental: only new or modified files are decoded and hashed again
+    manifest = dataset_manifest.update_manifest(dataset_path, args.workers, quarantine=not args.no_quarantine)
+    files = manifest['files']
+    ok_files = {rel: r for rel, r in files.items() if r['status'] == 'ok'}
+
+    class_counts = {name: 0 for name in manifest['classes']}
+    for record in ok_files.values():
+        class_counts[record['class']] += 1
+    total_images = sum(class_counts.values())
+
+    if not total_images:
+        print("No readable images found!")
+        return 1
+
+    print(f"\nTotal Images: {total_images}")
+    print("\nClass Distribution:")
+    print("-" * 30)
+    for cls, count in sorted(class_counts.items(), key=lambda x: x[1], reverse=True):
+        percentage = (count / total_images) * 100
+        print(f"{cls:<20}: {count:>3} ({percentage:.1f}%)")
+    print("-" * 30)
+
+    # Check for imbalance
+    counts = list(class_counts.values())
+    min_count = min(counts)
+    max_count = max(counts)
+    ratio = max_count / min_count if min_count else float('inf')
+
+    print(f"\nImbalance Ratio (Max/Min): {ratio:.2f}")
+    if ratio > 1.5:
+        print("WARNING: Dataset is imbalanced. Class weights recommended.")
+    else:
+        print("Dataset is relatively balanced.")
+
+    # Integrity
+    corrupt = [rel for rel, r in files.items() if r['status'] == 'corrupt']
+    print("\nIntegrity:")
+    print("-" * 30)
+    print(f"Corrupt (in dataset): {len(corrupt)}")
+    for rel in corrupt:
+        print(f"   {rel}: {files[rel].get('error')}")
+    print(f"Quarantined (total):  {len(manifest['quarantined'])}")
+    for entry in manifest['quarantined'][-10:]:
+        print(f"   {entry['path']} -> {entry['movedTo']}")
+    if manifest['unsupportedFiles']:
+        print(f"Unsupported formats:  {manifest['unsupportedFiles']} (ignored by training)")
+
+    by_hash = defaultdict(list)
+    for rel, record in ok_files.items():
+        by_hash[record['sha1']].append(rel)
+    exact_duplicates = [paths for paths in by_hash.values() if len(paths) > 1]
+    print(f"Exact duplicates:     {sum(len(p) - 1 for p in exact_duplicates)} extra copies")
+    for paths in exact_duplicates[:10]:
+        print(f"   {' == '.join(paths)}")
+
+    # Resolution
+    widths = sorted(r['width'] for r in ok_files.values())
+    heights = sorted(r['height'] for r in ok_files.values())
+    small = [rel for rel, r in ok_files.items() if min(r['width'], r['height']) < 224]
+    odd_aspect = [rel for rel, r in ok_files.items()
+                  if max(r['width'], r['height']) / max(1, min(r['width'], r['height'])) > 2.5]
+    print("\nResolution:")
+    print("-" * 30)
+    print(f"Width  min/median/max: {widths[0]} / {widths[len(widths) // 2]} / {widths[-1]}")
+    print(f"Height min/median/max: {heights[0]} / {heights[len(heights) // 2]} / {heights[-1]}")
+    print(f"Smaller than 224px:   {len(small)}")
+    print(f"Aspect ratio > 2.5:   {len(odd_aspect)}")
+    for rel in (small + odd_aspect)[:10]:
+        print(f"   {rel}: {ok_files[rel]['width']}x{ok_files[rel]['height']}")
+
+    # Growth over time
+    history = manifest['history']
+    if len(history) > 1:
+        print("\nGrowth:")
+        print("-" * 30)
+        for snapshot in history[-5:]:
+            print(f"{snapshot['time']}: {snapshot['total']} images")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Padang Food Recognition - Inference Benchmark Suite
+Benchmarks every model artifact (Keras .keras, exported SavedModel, TFLite)
+across batch sizes and intra-op/inter-op thread settings.
+
+Each configuration runs in a fresh process so cold-load time, thread
+settings and peak RSS are measured cleanly. Results are written as JSON
+(benchmarks/inference_<modelVersion>.json) and can be compared with an
+earlier run to spot regressions between model versions.
+
+Usage:
+    python benchmark_inference.py [--backends keras,saved_model,tflite]
+                                  [--batch-sizes 1,8,32] [--intra-op 1,4] [--inter-op 0]
+                                  [--compare benchmarks/inference_2.0.0.json]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+MODEL_DIR = "./model"
+TFJS_DIR = "./public/model"
+OUTPUT_DIR = "./benchmarks"
+LATENCY_RUNS = 50
+THROUGHPUT_SECONDS = 3.0
+REGRESSION_THRESHOLD = 0.10  # flag >10% slower latency / lower throughput
+
+
+def discover_artifacts(model_dir=MODEL_DIR):
+    """Find benchmarkable artifacts: (backend, path) pairs."""
+    artifacts = []
+    for path in sorted(glob.glob(os.path.join(model_dir, "*.keras"))):
+        artifacts.append(('keras', path))
+    for path in sorted(glob.glob(os.path.join(model_dir, "*", "saved_model.pb"))):
+        artifacts.append(('saved_model', os.path.dirname(path)))
+    for path in sorted(glob.glob(os.path.join(model_dir, "*.tflite"))):
+        artifacts.append(('tflite', path))
+    return artifacts
+
+
+def artifact_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, f))
+                   for root, _, files in os.walk(path) for f in files)
+    return os.path.getsize(path)
+
+
+def tfjs_artifact(tfjs_dir=TFJS_DIR):
+    """Size-only entry for the browser model (no Python runtime for TF.js)."""
+    model_json = os.path.join(tfjs_dir, 'model.json')
+    if not os.path.exists(model_json):
+        return None
+    with open(model_json) as f:
+        manifest = json.load(f).get('weightsManifest', [])
+    weights = sum(os.path.getsize(os.path.join(tfjs_dir, p))
+                  for group in manifest for p in group['paths']
+                  if os.path.exists(os.path.join(tfjs_dir, p)))
+    return {'backend': 'tfjs', 'path': tfjs_dir,
+            'sizeBytes': os.path.getsize(model_json) + weights,
+            'note': 'size only; TF.js latency is measured in the browser'}
+
+
+class SavedModelPredictor:
+    """predict_on_batch() over the 'serve' endpoint written by model.export()."""
+
+    def __init__(self, path):
+        import tensorflow as tf
+
+        self.tf = tf
+        self.module = tf.saved_model.load(path)
+        self.fn = self.module.signatures['serving_default']
+        spec = list(self.fn.structured_input_signature[1].values())[0]
+        self.input_name = list(self.fn.structured_input_signature[1].keys())[0]
+        self.input_shape = tuple(spec.shape)
+
+    def predict_on_batch(self, batch):
+        outputs = self.fn(**{self.input_name: self.tf.constant(batch, self.tf.float32)})
+        return list(outputs.values())[0].numpy()
+
+
+def run_worker(config):
+    """Benchmark one (backend, path, threads) configuration in this process."""
+    import numpy as np
+
+    import perf_utils
+
+    result = dict(config)
+    start = time.perf_counter()
+    import tensorflow as tf
+    result['tfImportS'] = round(time.perf_counter() - start, 3)
+    result['tfVersion'] = tf.__version__
+
+    if config['intraOp']:
+        tf.config.threading.set_intra_op_parallelism_threads(config['intraOp'])
+    if config['interOp']:
+        tf.config.threading.set_inter_op_parallelism_threads(config['interOp'])
+
+    start = time.perf_counter()
+    if config['backend'] == 'keras':
+        model = tf.keras.models.load_model(config['path'])
+    elif config['backend'] == 'saved_model':
+        model = SavedModelPredictor(config['path'])
+    else:
+        from tflite_export import TFLiteModel
+        model = TFLiteModel(model_path=config['path'], num_threads=config['intraOp'] or None)
+    result['coldLoadS'] = round(time.perf_counter() - start, 3)
+
+    height, width = model.input_shape[1:3]
+    rng = np.random.default_rng(0)
+
+    def make_batch(n):
+        return rng.uniform(0, 255, size=(n, height, width, 3)).astype(np.float32)
+
+    single = make_batch(1)
+    start = time.perf_counter()
+    model.predict_on_batch(single)
+    result['firstPredictS'] = round(time.perf_counter() - start, 3)
+
+    timings = []
+    for _ in range(config['latencyRuns']):
+        start = time.perf_counter()
+        model.predict_on_batch(single)
+        timings.append((time.perf_counter() - start) * 1000)
+    result['latencyMs'] = perf_utils.latency_summary(timings)
+
+    result['throughput'] = {}
+    for batch_size in config['batchSizes']:
+        batch = make_batch(batch_size)
+        model.predict_on_batch(batch)  # warm-up / shape retrace
+        images, start = 0, time.perf_counter()
+        while time.perf_counter() - start < config['throughputSeconds']:
+            model.predict_on_batch(batch)
+            images += batch_size
+        result['throughput'][str(batch_size)] = round(images / (time.perf_counter() - start), 2)
+
+    result['peakRssMb'] = round(perf_utils.peak_rss_mb() or 0, 1) or None
+    return result
+
+
+def run_config(config):
+    """Run one configuration in a subprocess and parse its JSON result."""
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', json.dumps(config)],
+        capture_output=True, text=True, env=env
+    )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return dict(config, error=(proc.stderr.strip().splitlines() or ['unknown error'])[-1])
+
+
+def result_key(result):
+    return (result['backend'], os.path.basename(os.path.normpath(result['path'])),
+            result.get('intraOp'), result.get('interOp'))
+
+
+def compare_results(current, previous_path, threshold=REGRESSION_THRESHOLD):
+    """Print p50 latency / throughput changes vs an earlier results file."""
+    with open(previous_path) as f:
+        previous = {result_key(r): r for r in json.load(f)['results'] if 'latencyMs' in r}
+
+    regressions = 0
+    print(f"\nComparison with {previous_path}:")
+    for result in current:
+        old = previous.get(result_key(result))
+        if not old or 'latencyMs' not in result:
+            continue
+        p50_change = result['latencyMs']['p50'] / old['latencyMs']['p50'] - 1
+        flags = []
+        if p50_change > threshold:
+            flags.append(f"p50 +{p50_change:.0%}")
+        for batch_size, ips in result['throughput'].items():
+            old_ips = old['throughput'].get(batch_size)
+            if old_ips and ips / old_ips - 1 < -threshold:
+                flags.append(f"bs{batch_size} throughput {ips / old_ips - 1:+.0%}")
+        status = "REGRESSION " + ", ".join(flags) if flags else "ok"
+        regressions += bool(flags)
+        print(f"   {' / '.join(str(k) for k in result_key(result))}: "
+              f"p50 {old['latencyMs']['p50']:.2f} -> {result['latencyMs']['p50']:.2f} ms  {status}")
+    return regressions
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference across backends, batch sizes and threads")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--tfjs-dir', default=TFJS_DIR)
+    parser.add_argument('--backends', default='keras,saved_model,tflite')
+    parser.add_argument('--batch-sizes', default='1,8,32')
+    parser.add_argument('--intra-op', default=f"1,{os.cpu_count() or 1}",
+                        help="Comma-separated intra-op thread counts (0 = runtime default)")
+    parser.add_argument('--inter-op', default='0', help="Comma-separated inter-op thread counts (0 = default)")
+    parser.add_argument('--latency-runs', type=int, default=LATENCY_RUNS)
+    parser.add_argument('--throughput-seconds', type=float, default=THROUGHPUT_SECONDS)
+    parser.add_argument('--output', help="Results file (default benchmarks/inference_<modelVersion>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return 0
+
+    backends = set(args.backends.split(','))
+    artifacts = [(b, p) for b, p in discover_artifacts(args.model_dir) if b in backends]
+    if not artifacts:
+        print(f"No model artifacts found in {args.model_dir}")
+        return 1
+
+    intra_ops = sorted(set(parse_int_list(args.intra_op)))
+    inter_ops = sorted(set(parse_int_list(args.inter_op)))
+    results = []
+    for backend, path in artifacts:
+        for intra in intra_ops:
+            # TFLite only exposes one thread count
+            for inter in (inter_ops if backend != 'tflite' else [0]):
+                config = {
+                    'backend': backend, 'path': path, 'intraOp': intra, 'interOp': inter,
+                    'batchSizes': parse_int_list(args.batch_sizes),
+                    'latencyRuns': args.latency_runs,
+                    'throughputSeconds': args.throughput_seconds,
+                }
+                print(f"Benchmarking {backend} {path} (intra-op {intra or 'default'}, "
+                      f"inter-op {inter or 'default'})...")
+                result = run_config(config)
+                result['sizeBytes'] = artifact_size(path)
+                results.append(result)
+                if 'error' in result:
+                    print(f"   [ERROR] {result['error']}")
+                else:
+                    lat = result['latencyMs']
+                    print(f"   load {result['coldLoadS']:.2f}s | p50 {lat['p50']:.2f} ms "
+                          f"p95 {lat['p95']:.2f} p99 {lat['p99']:.2f} | "
+                          + " ".join(f"bs{b}: {ips:.1f} img/s" for b, ips in result['throughput'].items())
+                          + f" | peak RSS {result['peakRssMb']} MB")
+
+    tfjs = tfjs_artifact(args.tfjs_dir)
+    if tfjs:
+        results.append(tfjs)
+
+    model_version = 'unversioned'
+    metadata_path = os.path.join(args.tfjs_dir, 'metadata.json')
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            model_version = json.load(f).get('modelVersion', model_version)
+
+    report = {
+        'modelVersion': model_version,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'tensorflow': next((r['tfVersion'] for r in results if 'tfVersion' in r), None),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpuCount': os.cpu_count(),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(OUTPUT_DIR, f"inference_{model_version}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        return 1 if compare_results(results, args.compare) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Padang Food Recognition - CLI Startup Benchmark
+Guards cli.py's fast startup: `--help` of every subcommand must return
+within a time budget and must not import TensorFlow, another heavy
+framework, NumPy, PIL or pandas. Each check runs several times in a fresh
+interpreter with `-X importtime`; the time reported is the median wall
+time minus a bare `python -c pass`, and the slowest imported packages are
+listed so a regression points at its cause.
+
+Exits with 1 if any check fails, so it can run in CI.
+
+Usage:
+    python benchmark_startup.py [--runs 5] [--budget-s 1.0] [--output benchmarks/startup.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+OUTPUT_PATH = "./benchmarks/startup.json"
+RUNS = 5
+STARTUP_BUDGET_S = 1.0
+# ML frameworks and the array/image/table libraries: none is needed to parse arguments
+HEAVY_MODULES = ('tensorflow', 'keras', 'tf_keras', 'tensorflowjs', 'ai_edge_litert', 'jax', 'torch',
+                 'numpy', 'PIL', 'pandas')
+# (label, cli.py arguments before --help)
+CHECKS = [
+    ('cli', []),
+    ('train', ['train']),
+    ('predict', ['predict']),
+    ('export savedmodel', ['export', 'savedmodel']),
+    ('export layers', ['export', 'layers']),
+    ('export manual', ['export', 'manual']),
+    ('analyze', ['analyze']),
+]
+
+
+def parse_importtime(stderr):
+    """{top-level package: self import time in seconds} from `-X importtime` output."""
+    packages = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1e6
+    return packages
+
+
+def time_command(args, runs):
+    """Median wall time (s), imported packages and return code of `python <args>`."""
+    times, packages, returncode = [], {}, 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', *args], capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        packages = parse_importtime(result.stderr)
+        returncode = returncode or result.returncode
+    return sorted(times)[len(times) // 2], packages, returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time and lazy-import guard for cli.py")
+    parser.add_argument('--runs', type=int, default=RUNS, help="Runs per check (median is reported)")
+    parser.add_argument('--budget-s', type=float, default=STARTUP_BUDGET_S,
+                        help="Maximum startup time over a bare interpreter per check")
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    baseline, _, _ = time_command(['-c', 'pass'], args.runs)
+    print(f"Bare interpreter: {baseline * 1000:.0f} ms (subtracted below)\n")
+    print(f"{'Check':<20} {'Startup':>10}  Status  Slowest imports")
+
+    results, failed = [], False
+    for label, cli_args in CHECKS:
+        wall, packages, returncode = time_command([CLI_PATH, *cli_args, '--help'], args.runs)
+        startup = max(0.0, wall - baseline)
+        heavy = sorted(name for name in packages if name in HEAVY_MODULES)
+        problems = []
+        if returncode != 0:
+            problems.append(f"exit code {returncode}")
+        if heavy:
+            problems.append(f"imports {', '.join(heavy)}")
+        if startup > args.budget_s:
+            problems.append(f"over budget ({args.budget_s:g}s)")
+        slowest = sorted(packages.items(), key=lambda item: -item[1])[:3]
+        results.append({
+            'check': label, 'args': cli_args + ['--help'], 'startupS': round(startup, 4),
+            'heavyImports': heavy, 'slowestImports': {name: round(s, 4) for name, s in slowest},
+            'ok': not problems, 'problems': problems,
+        })
+        failed = failed or bool(problems)
+        print(f"{label:<20} {startup * 1000:>7.0f} ms  {'OK' if not problems else 'FAIL':<6}  "
+              + ", ".join(f"{name} {s * 1000:.0f} ms" for name, s in slowest))
+        for problem in problems:
+            print(f"   [FAIL] {problem}")
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'baselineS': round(baseline, 4),
+        'budgetS': args.budget_s,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Padang Food Recognition - Command Line Interface
+Single entry point for the Python tooling. Only the standard library is
+imported up front; each subcommand imports its script (and TensorFlow, if
+that script needs it) after its arguments are parsed, so --help and
+argument errors return immediately. benchmark_startup.py guards this.
+
+Usage:
+    python cli.py train [--arch mobilenet|efficientnet] [--resume]
+    python cli.py predict <images...> [predict_manual.py options]
+    python cli.py export [savedmodel|layers|manual] [converter options]
+    python cli.py analyze [--dataset ./dataset/train] [--workers N] [--no-quarantine]
+    python cli.py <command> --help
+"""
+
+import argparse
+import importlib
+import sys
+
+# --arch -> trainer script
+TRAINERS = {
+    'mobilenet': 'train_model',
+    'efficientnet': 'train_model_optimized',
+}
+# export route -> converter script
+EXPORTERS = {
+    'savedmodel': 'convert_model',   # SavedModel + tensorflowjs_converter (graph model)
+    'layers': 'convert_to_tfjs',     # Keras config -> TF.js layers model, no tensorflowjs needed
+    'manual': 'export_tfjs',         # Minimal manual export of train_model.py's MobileNetV2
+}
+DEFAULT_EXPORTER = 'savedmodel'
+
+
+def run_train(argv):
+    parser = argparse.ArgumentParser(prog="cli.py train", description="Train a Padang food classifier")
+    parser.add_argument('--arch', choices=TRAINERS, default='mobilenet',
+                        help="mobilenet = train_model.py (MobileNetV2), "
+                             "efficientnet = train_model_optimized.py (EfficientNetV2B0)")
+    parser.add_argument('--resume', action='store_true', help="Continue from the trainer's last checkpoint")
+    args = parser.parse_args(argv)
+    trainer = importlib.import_module(TRAINERS[args.arch])
+    trainer.train_model(resume=args.resume)
+    return 0
+
+
+def run_predict(argv):
+    import predict_manual
+
+    return predict_manual.predict(argv)
+
+
+def run_export(argv):
+    exporter = DEFAULT_EXPORTER
+    if argv and argv[0] in EXPORTERS:
+        exporter, argv = argv[0], argv[1:]
+    return importlib.import_module(EXPORTERS[exporter]).main(argv)
+
+
+def run_analyze(argv):
+    import analyze_dataset
+
+    return analyze_dataset.main(argv)
+
+
+COMMANDS = {
+    'train': (run_train, "Train a classifier (train_model.py / train_model_optimized.py)"),
+    'predict': (run_predict, "Predict dishes for images or a dataset split (predict_manual.py)"),
+    'export': (run_export, "Export for the web app: export [savedmodel|layers|manual] "
+                           "(convert_model.py / convert_to_tfjs.py / export_tfjs.py)"),
+    'analyze': (run_analyze, "Dataset balance, integrity and resolution report (analyze_dataset.py)"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Padang food recognition tooling",
+        epilog="Run 'python cli.py <command> --help' for the options of a command."
+    )
+    commands = parser.add_subparsers(dest='command', metavar='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        commands.add_parser(name, help=help_text, add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS:
+        # Top-level help, a missing or an unknown command: argparse prints and exits
+        build_parser().parse_args(argv)
+        return 2
+    # Everything after the command belongs to the command's own parser
+    run, _ = COMMANDS[argv[0]]
+    return run(argv[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,45 +1,68 @@
 """
 Convert Keras model to TensorFlow.js format
 Uses SavedModel as intermediate format
+Stages whose model, dataset and settings are unchanged are skipped
+(export_cache.py); outputs are built aside and swapped in atomically
+
+Usage:
+    python convert_model.py [--model ./model/padang_food_model_optimized.keras]
+                            [--quantize float32|float16|uint8|int8] [--dataset ./dataset/train]
+                            [--tflite none|float32|float16|int8] [--no-optimize] [--force]
 """
 
-import tensorflow as tf
+import argparse
 import json
 import os
-import shutil
+import sys
+import zipfile
+
+import export_cache
+import quantization
+import tflite_export
 
 MODEL_PATH = "./model/padang_food_model_optimized.keras"
 SAVED_MODEL_PATH = "./model/saved_model_tfjs"
 OUTPUT_PATH = "./public/model"
 METADATA_PATH = "./public/model/metadata.json"
+REPORT_PATH = "./model/quantization_report"
+GRAPH_REPORT_PATH = "./model/graph_optimization_report"  # optimize_graph.REPORT_PATH (imported lazily: it loads TF)
 
-def convert_keras_to_tfjs():
-    print("=" * 60)
-    print("Converting Keras Model to TensorFlow.js")
-    print("=" * 60)
-    
-    # Load the Keras model
-    print("\n[1/4] Loading Keras model...")
-    model = tf.keras.models.load_model(MODEL_PATH)
-    print(f"   Model loaded: {model.name}")
-    print(f"   Input shape: {model.input_shape}")
-    print(f"   Output shape: {model.output_shape}")
-    
-    # Export as SavedModel
-    print("\n[2/4] Exporting as SavedModel...")
-    if os.path.exists(SAVED_MODEL_PATH):
-        shutil.rmtree(SAVED_MODEL_PATH)
-    
-    model.export(SAVED_MODEL_PATH)
-    print(f"   SavedModel saved to: {SAVED_MODEL_PATH}")
-    
-    # Prepare output directory
-    print("\n[3/4] Preparing output directory...")
-    os.makedirs(OUTPUT_PATH, exist_ok=True)
-    
-    # Run conversion
-    print("\n[4/4] Running tensorflowjs_converter...")
+# tensorflowjs_converter flags per weight encoding
+TFJS_QUANTIZE_FLAGS = {
+    'float32': [],
+    'float16': ["--quantize_float16=*"],
+    'uint8': ["--quantize_uint8=*"],
+}
+
+def keras_input_size(model_path):
+    """Input height of a .keras model, read from its config without loading it (None if unknown)."""
+    try:
+        with zipfile.ZipFile(model_path) as archive:
+            config = json.loads(archive.read('config.json'))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    for layer in config.get('config', {}).get('layers', []):
+        if layer['class_name'] == 'InputLayer':
+            return layer['config']['batch_shape'][1]
+    return None
 
+def update_metadata_image_size(metadata_path, image_size):
+    """Make metadata.json advertise the input size of the published model."""
+    if not image_size or not os.path.exists(metadata_path):
+        return
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    if metadata.get('imageSize') == image_size:
+        return
+    metadata['imageSize'] = image_size
+    tmp_path = f"{metadata_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, metadata_path)
+    print(f"   Metadata imageSize set to {image_size}: {metadata_path}")
+
+def run_tfjs_converter(saved_model_dir, output_dir, weights_mode):
+    """Run tensorflowjs_converter on a SavedModel; True on success."""
     # PATCH: Fix for numpy.object removal in newer numpy versions
     try:
         import numpy as np
@@ -49,7 +72,6 @@ def convert_keras_to_tfjs():
         pass
 
     import subprocess
-    import sys
 
     # Construct command to run via the current python executable to ensure env consistency
     # We call the module directly if possible, or via shell command, but patching 'numpy'
@@ -64,13 +86,15 @@ def convert_keras_to_tfjs():
         sys.argv = [
             "tensorflowjs_converter",
             "--input_format=tf_saved_model",
-            SAVED_MODEL_PATH,
-            OUTPUT_PATH
+            *TFJS_QUANTIZE_FLAGS[weights_mode],
+            saved_model_dir,
+            output_dir
         ]
         
         print(f"   Invoking tensorflowjs internally with args: {sys.argv}")
         pip_main()
         print("   [OK] Conversion successful!")
+        return True
         
     except Exception as e:
         print(f"   [WARNING] In-process conversion failed: {e}")
@@ -79,26 +103,120 @@ def convert_keras_to_tfjs():
         cmd = [
             "tensorflowjs_converter",
             "--input_format=tf_saved_model",
-            SAVED_MODEL_PATH,
-            OUTPUT_PATH
+            *TFJS_QUANTIZE_FLAGS[weights_mode],
+            saved_model_dir,
+            output_dir
         ]
         
         try:
             result = subprocess.run(cmd, check=True, shell=(os.name == 'nt'), capture_output=True, text=True)
             print("   [OK] Conversion successful!")
             print(result.stdout)
+            return True
         except subprocess.CalledProcessError as e:
             print(f"   [ERROR] Conversion failed with error code {e.returncode}")
             print("   STDOUT:", e.stdout)
             print("   STDERR:", e.stderr)
         except Exception as e:
             print(f"   [ERROR] Conversion failed: {e}")
+    return False
+
+def convert_keras_to_tfjs(quantize='float32', dataset_path=quantization.DEFAULT_DATASET_PATH, tflite='float32',
+                          model_path=MODEL_PATH, optimize=True, force=False):
+    import tensorflow as tf
+    import optimize_graph
+    import training_modes
+
+    weights_mode = quantization.tfjs_mode(quantize)
+    print("=" * 60)
+    print("Converting Keras Model to TensorFlow.js")
+    print("=" * 60)
+
+    # Every stage below is skipped when its inputs and settings are unchanged
+    cache = export_cache.ExportCache()
+    if force:
+        cache.stages = {}
+    model_digest = export_cache.model_fingerprint(model_path)
+    data_digest = export_cache.dataset_fingerprint(dataset_path)
+    model = None
+
+    def get_model():
+        nonlocal model
+        if model is None:
+            # Load the Keras model
+            print("\n   Loading Keras model...")
+            # e.g. a best_model.keras checkpoint saved under the bfloat16 policy
+            model = training_modes.float32_copy(tf.keras.models.load_model(model_path))
+            print(f"   Model loaded: {model.name}")
+            print(f"   Input shape: {model.input_shape}")
+            print(f"   Output shape: {model.output_shape}")
+
+            # Inference-only graph: BN folded, Dropout stripped, activations fused
+            if optimize:
+                model = optimize_graph.optimize_for_inference(model, dataset_path, report_path=GRAPH_REPORT_PATH)
+        return model
+
+    # Export as SavedModel (built next to the old one and swapped in)
+    print("\n[1/3] Exporting as SavedModel...")
+    saved_key = export_cache.stage_key('savedmodel', {'model': model_digest}, {'optimize': optimize})
+
+    def export_saved_model():
+        with export_cache.staged_dir(SAVED_MODEL_PATH) as staging:
+            get_model().export(staging)
+        print(f"   SavedModel saved to: {SAVED_MODEL_PATH}")
+
+    cache.run(f"savedmodel {SAVED_MODEL_PATH}", saved_key, [SAVED_MODEL_PATH], export_saved_model)
+    
+    # Run conversion into a staging copy of the output directory (metadata.json carried over)
+    print("\n[2/3] Running tensorflowjs_converter...")
+    tfjs_key = export_cache.stage_key('tfjs-graph', {'savedModel': saved_key}, {'weights': weights_mode})
+
+    def convert():
+        with export_cache.staged_dir(OUTPUT_PATH, carry=lambda n: n != 'model.json' and not n.endswith('.bin')) as staging:
+            if not run_tfjs_converter(SAVED_MODEL_PATH, staging, weights_mode):
+                raise export_cache.StageFailed("tensorflowjs_converter did not finish")
+
+    tfjs_ok = cache.run(f"tfjs {OUTPUT_PATH}", tfjs_key, [OUTPUT_PATH], convert)
+    if tfjs_ok:
+        # e.g. a resolution_variants.py model published in place of the 224px one
+        update_metadata_image_size(METADATA_PATH, keras_input_size(model_path))
+
+    print("\n[3/3] Writing quantization report and TFLite model...")
+    quantization.export_report_and_tflite(
+        cache, get_model, model_digest, data_digest, tfjs_key if tfjs_ok else None, quantize, tflite,
+        model_path, OUTPUT_PATH, REPORT_PATH, dataset_path, config={'optimize': optimize}
+    )
 
     print("\n" + "=" * 60)
-    print("Conversion Complete!")
+    if cache.failed:
+        print(f"Conversion finished with failed stages: {', '.join(cache.failed)}")
+    elif not cache.built:
+        print("Conversion Complete! (all stages up to date)")
+    else:
+        print(f"Conversion Complete! (rebuilt: {', '.join(cache.built)})")
     print("=" * 60)
     
     return model
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the Keras model to TensorFlow.js via SavedModel")
+    parser.add_argument('--model', default=MODEL_PATH,
+                        help="Keras model to convert (e.g. a prune_model.py output)")
+    parser.add_argument('--quantize', choices=quantization.QUANTIZATION_MODES, default='float32',
+                        help="Weight encoding (int8 = uint8 TF.js weights + calibrated int8 TFLite)")
+    parser.add_argument('--dataset', default=quantization.DEFAULT_DATASET_PATH,
+                        help="Dataset for calibration and the accuracy report")
+    parser.add_argument('--tflite', choices=tflite_export.TFLITE_MODES, default='float32',
+                        help="Also write a TFLite model next to the Keras model ('none' to skip)")
+    parser.add_argument('--no-optimize', action='store_true',
+                        help="Export the model as trained, without the inference graph optimization pass")
+    parser.add_argument('--force', action='store_true',
+                        help="Rebuild every stage even if model/export_cache.json says it is up to date")
+    args = parser.parse_args(argv)
+    convert_keras_to_tfjs(args.quantize, args.dataset, args.tflite, args.model, optimize=not args.no_optimize,
+                          force=args.force)
+    return 0
+
+
 if __name__ == '__main__':
-    convert_keras_to_tfjs()
+    sys.exit(main())
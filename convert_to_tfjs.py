@@ -1,20 +1,32 @@
 """
 Manual TensorFlow.js Model Converter
 Converts Keras model to TF.js format without using tensorflowjs library
+Unchanged stages are skipped and public/model is swapped in atomically (export_cache.py)
+
+Usage:
+    python convert_to_tfjs.py [--quantize float32|float16|uint8|int8] [--dataset ./dataset/train]
+                              [--shard-size-mb 4] [--tflite none|float32|float16|int8] [--force]
 """
 import os
 import sys
 import json
 import struct
-import numpy as np
+import argparse
+
+import export_cache
+import quantization
+import tflite_export
+import tfjs_weights
 
 # Ensure UTF-8 output
 sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
-def convert_keras_to_tfjs():
+def convert_keras_to_tfjs(quantize='float32', dataset_path=quantization.DEFAULT_DATASET_PATH,
+                          shard_bytes=tfjs_weights.DEFAULT_SHARD_BYTES, tflite='float32', force=False):
     print("=" * 60)
     print("MANUAL TENSORFLOW.JS MODEL CONVERTER")
     print("=" * 60)
+    weights_mode = quantization.tfjs_mode(quantize)
     
     try:
         import tensorflow as tf
@@ -37,99 +49,150 @@ def convert_keras_to_tfjs():
         print(f"ERROR: No model found!")
         return False
     
-    print(f"Loading model: {keras_model_path}")
-    
-    # Load model
-    model = tf.keras.models.load_model(keras_model_path)
-    print(f"Model loaded successfully!")
-    print(f"Input shape: {model.input_shape}")
-    print(f"Output shape: {model.output_shape}")
-    
-    # Get model architecture as JSON
-    model_config = model.get_config()
-    
-    # Get weights
-    weights = model.get_weights()
-    print(f"Number of weight arrays: {len(weights)}")
-    
-    # Create output directory
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Build TF.js model topology
-    layer_specs = []
-    weight_specs = []
-    weight_data = []
-    
-    for i, layer in enumerate(model.layers):
-        layer_config = layer.get_config()
-        layer_weights = layer.get_weights()
-        
-        if len(layer_weights) > 0:
-            for j, w in enumerate(layer_weights):
-                weight_name = f"{layer.name}/kernel" if j == 0 else f"{layer.name}/bias"
-                weight_specs.append({
-                    "name": weight_name,
-                    "shape": list(w.shape),
-                    "dtype": "float32"
-                })
-                # Flatten and append
-                weight_data.append(w.astype(np.float32).tobytes())
-    
-    # Concatenate all weight data
-    all_weights = b''.join(weight_data)
-    
-    # Save weights as binary
-    weights_path = os.path.join(output_dir, "group1-shard1of1.bin")
-    with open(weights_path, 'wb') as f:
-        f.write(all_weights)
-    print(f"Weights saved: {weights_path} ({len(all_weights)} bytes)")
-    
-    # Create model.json (TF.js Layers Model format)
-    model_json = {
-        "format": "layers-model",
-        "generatedBy": "keras v" + tf.keras.__version__,
-        "convertedBy": "Manual Converter for Padang Recognition",
-        "modelTopology": {
-            "keras_version": tf.keras.__version__,
-            "backend": "tensorflow",
-            "model_config": {
-                "class_name": model.__class__.__name__,
-                "config": model_config
+    # Every stage below is skipped when its inputs and settings are unchanged
+    cache = export_cache.ExportCache()
+    if force:
+        cache.stages = {}
+    model_digest = export_cache.model_fingerprint(keras_model_path)
+    data_digest = export_cache.dataset_fingerprint(dataset_path)
+    model = None
+
+    def get_model():
+        nonlocal model
+        if model is None:
+            print(f"Loading model: {keras_model_path}")
+            import training_modes
+            # best_model.keras from a MIXED_PRECISION run may carry the bfloat16 policy
+            model = training_modes.float32_copy(tf.keras.models.load_model(keras_model_path))
+            print(f"Model loaded successfully!")
+            print(f"Input shape: {model.input_shape}")
+            print(f"Output shape: {model.output_shape}")
+        return model
+
+    tfjs_key = export_cache.stage_key('tfjs-layers', {'model': model_digest},
+                                      {'weights': weights_mode, 'shardBytes': shard_bytes})
+    write_stats = {}
+
+    def write_tfjs():
+        model = get_model()
+        # Get model architecture as JSON
+        model_config = model.get_config()
+
+        # Get weights
+        weights = model.get_weights()
+        print(f"Number of weight arrays: {len(weights)}")
+
+        # Built in a staging copy of the output directory: existing shards are
+        # hard-linked in so unchanged ones are reused, metadata.json is carried over
+        with export_cache.staged_dir(output_dir, carry=lambda n: n != 'model.json') as staging:
+            # Build TF.js model topology
+            weight_specs = []
+            # Weights are streamed into fixed-size, content-hashed shards
+            writer = tfjs_weights.ShardedWeightWriter(staging, shard_bytes)
+
+            for i, layer in enumerate(model.layers):
+                layer_config = layer.get_config()
+                layer_weights = layer.get_weights()
+
+                if len(layer_weights) > 0:
+                    for j, w in enumerate(layer_weights):
+                        weight_name = f"{layer.name}/kernel" if j == 0 else f"{layer.name}/bias"
+                        w_data, w_quantization = quantization.quantize_weight(w, weights_mode)
+                        weight_spec = {
+                            "name": weight_name,
+                            "shape": list(w.shape),
+                            "dtype": "float32"
+                        }
+                        if w_quantization:
+                            weight_spec["quantization"] = w_quantization
+                        weight_specs.append(weight_spec)
+                        # Flatten and stream to the current shard
+                        writer.write(w_data)
+
+            shard_paths = writer.close()
+            stale = tfjs_weights.remove_stale_shards(staging, shard_paths)
+            print(f"Weights saved: {len(shard_paths)} shard(s) in {output_dir} "
+                  f"({writer.total_bytes} bytes, {weights_mode}, {writer.reused} unchanged, {len(stale)} stale removed)")
+            write_stats['total_bytes'] = writer.total_bytes
+
+            # Create model.json (TF.js Layers Model format)
+            model_json = {
+                "format": "layers-model",
+                "generatedBy": "keras v" + tf.keras.__version__,
+                "convertedBy": "Manual Converter for Padang Recognition",
+                "modelTopology": {
+                    "keras_version": tf.keras.__version__,
+                    "backend": "tensorflow",
+                    "model_config": {
+                        "class_name": model.__class__.__name__,
+                        "config": model_config
+                    }
+                },
+                "weightsManifest": [{
+                    "paths": shard_paths,
+                    "weights": weight_specs
+                }]
             }
-        },
-        "weightsManifest": [{
-            "paths": ["group1-shard1of1.bin"],
-            "weights": weight_specs
-        }]
-    }
-    
-    # Save model.json
+
+            # Save model.json
+            with open(os.path.join(staging, "model.json"), 'w') as f:
+                json.dump(model_json, f, indent=2)
+        print(f"Model JSON saved: {model_json_path}")
+
     model_json_path = os.path.join(output_dir, "model.json")
-    with open(model_json_path, 'w') as f:
-        json.dump(model_json, f, indent=2)
-    print(f"Model JSON saved: {model_json_path}")
+    cache.run(f"tfjs {output_dir}", tfjs_key, [output_dir], write_tfjs)
     
-    # Update metadata
+    # Update metadata (not part of any stage: other scripts rewrite it)
     metadata_path = os.path.join(output_dir, "metadata.json")
     if os.path.exists(metadata_path):
         with open(metadata_path, 'r') as f:
             metadata = json.load(f)
-        metadata['modelFormat'] = 'tfjs-layers-model'
-        metadata['modelFile'] = 'model.json'
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
-        print(f"Metadata updated: {metadata_path}")
-    
+        if metadata.get('modelFormat') != 'tfjs-layers-model' or metadata.get('modelFile') != 'model.json':
+            metadata['modelFormat'] = 'tfjs-layers-model'
+            metadata['modelFile'] = 'model.json'
+            tmp_path = f"{metadata_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(metadata, f, indent=2)
+            os.replace(tmp_path, metadata_path)
+            print(f"Metadata updated: {metadata_path}")
+    
+    # Quantization report (float32 vs exported weights, plus int8 TFLite) and TFLite model
+    quantization.export_report_and_tflite(
+        cache, get_model, model_digest, data_digest, tfjs_key, quantize, tflite,
+        keras_model_path, output_dir, os.path.join("model", "quantization_report"), dataset_path,
+        weights_nbytes=write_stats.get('total_bytes')
+    )
+    
+    with open(model_json_path) as f:
+        shard_paths = json.load(f)['weightsManifest'][0]['paths']
     print("\n" + "=" * 60)
-    print("CONVERSION COMPLETE!")
+    print("CONVERSION COMPLETE!" if cache.built else "CONVERSION COMPLETE! (all stages up to date)")
     print("=" * 60)
     print(f"Output files in: {output_dir}")
     print("  - model.json")
-    print("  - group1-shard1of1.bin")
+    for shard_path in shard_paths:
+        print(f"  - {shard_path}")
     print("  - metadata.json")
     
     return True
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manual TensorFlow.js converter")
+    parser.add_argument('--quantize', choices=quantization.QUANTIZATION_MODES, default='float32',
+                        help="Weight encoding (int8 = uint8 TF.js weights + calibrated int8 TFLite)")
+    parser.add_argument('--dataset', default=quantization.DEFAULT_DATASET_PATH,
+                        help="Dataset for calibration and the accuracy report")
+    parser.add_argument('--shard-size-mb', type=float, default=tfjs_weights.DEFAULT_SHARD_BYTES / 1024 / 1024,
+                        help="Maximum size of each weight shard")
+    parser.add_argument('--tflite', choices=tflite_export.TFLITE_MODES, default='float32',
+                        help="Also write a TFLite model next to the Keras model ('none' to skip)")
+    parser.add_argument('--force', action='store_true',
+                        help="Rebuild every stage even if model/export_cache.json says it is up to date")
+    args = parser.parse_args(argv)
+    success = convert_keras_to_tfjs(args.quantize, args.dataset, int(args.shard_size_mb * 1024 * 1024), args.tflite,
+                                    args.force)
+    return 0 if success else 1
+
+
 if __name__ == "__main__":
-    success = convert_keras_to_tfjs()
-    sys.exit(0 if success else 1)
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Padang Food Recognition - tf.data Input Pipeline
+Parallel replacement for ImageDataGenerator.flow_from_directory:
+- Train/val(/test) split from the persisted index (see dataset_split.py),
+  or the validation_split=0.2 split of flow_from_directory without one
+- Decode + resize in parallel, cache decoded uint8 images, batch, prefetch
+- Batched augmentation with Keras preprocessing layers
+- Optional zero-copy reads from materialized shards (see dataset_cache.py)
+"""
+
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+import dataset_cache
+import dataset_manifest
+import dataset_split
+import dedup_dataset
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+IMAGE_EXTENSIONS = dataset_manifest.IMAGE_EXTENSIONS
+VALIDATION_SPLIT = 0.2
+
+
+def list_image_files(dataset_path, validation_split=VALIDATION_SPLIT):
+    """List images per subset.
+
+    If dataset_split.py has written a split index, the subsets come from it
+    (including 'test' when the index has one) and `validation_split` only
+    matters when it is 0.0, which returns every image under 'training'.
+    The index keeps near-duplicate clusters in one subset; if the clusters
+    file changed since it was written, it is updated first
+    (dataset_split.ensure_split).
+
+    Otherwise the listing matches flow_from_directory(subset=...): classes
+    are the sorted sub-directories. Inside each class the files are taken
+    in walk order; the first `validation_split` fraction goes to
+    validation and the rest to training. The files come from the dataset
+    manifest (readable images only) when there is one; the tree is walked
+    only without a manifest. If dedup_dataset.py has written duplicate
+    clusters, every cluster is moved into the split of its first member,
+    so near-duplicates never sit on both sides (this deviates from
+    flow_from_directory on purpose).
+    """
+    index = dataset_split.load_split(dataset_path)
+    if index is not None:
+        if dataset_split.clusters_changed(dataset_path, index):
+            index = dataset_split.ensure_split(dataset_path)
+        return dataset_split.split_subsets(dataset_path, index, merge=not validation_split)
+
+    listing = dataset_manifest.readable_files(dataset_path)
+    if listing is not None:
+        class_names, files_by_class = listing
+    else:
+        class_names = sorted(
+            d for d in os.listdir(dataset_path)
+            if os.path.isdir(os.path.join(dataset_path, d))
+        )
+        files_by_class = {name: _walk_images(os.path.join(dataset_path, name)) for name in class_names}
+    class_indices = {name: idx for idx, name in enumerate(class_names)}
+
+    assigned = []  # (path, label, subset) in flow_from_directory order
+    for class_name, idx in class_indices.items():
+        files = files_by_class[class_name]
+        split_at = int(validation_split * len(files))
+        assigned.extend((path, idx, 'validation' if i < split_at else 'training') for i, path in enumerate(files))
+
+    if validation_split:
+        subset_of = {os.path.normpath(path): subset for path, _, subset in assigned}
+        for members in dedup_dataset.load_clusters(dataset_path):
+            present = [m for m in members if m in subset_of]
+            for m in present[1:]:
+                subset_of[m] = subset_of[present[0]]
+        assigned = [(path, idx, subset_of[os.path.normpath(path)]) for path, idx, _ in assigned]
+
+    subsets = {'training': ([], []), 'validation': ([], [])}
+    for path, idx, subset in assigned:
+        subsets[subset][0].append(path)
+        subsets[subset][1].append(idx)
+    return class_indices, subsets
+
+
+def _walk_images(class_dir):
+    """Image paths under one class folder in sorted walk order (no manifest available)."""
+    files = []
+    for root, _, fnames in sorted(os.walk(class_dir), key=lambda x: x[0]):
+        for fname in sorted(fnames):
+            if fname.lower().endswith(IMAGE_EXTENSIONS):
+                files.append(os.path.join(root, fname))
+    return files
+
+
+def decode_image(path, image_size):
+    """Read, decode and resize one image to uint8 (H, W, 3)."""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    # 'nearest' matches the PIL default used by flow_from_directory / load_img
+    image = tf.image.resize(image, image_size, method='nearest')
+    return tf.cast(image, tf.uint8)
+
+
+def build_augmenter(seed=None):
+    """Batched equivalent of the ImageDataGenerator augmentation settings.
+
+    shear_range=0.2 is 0.2 degrees in ImageDataGenerator, so it is left out.
+    """
+    return keras.Sequential([
+        keras.layers.RandomRotation(30 / 360, fill_mode='nearest', seed=seed),
+        keras.layers.RandomTranslation(0.2, 0.2, fill_mode='nearest', seed=seed),
+        keras.layers.RandomZoom(0.2, fill_mode='nearest', seed=seed),
+        keras.layers.RandomFlip('horizontal', seed=seed),
+    ], name='augmentation')
+
+
+def build_dataset(paths, labels, num_classes, image_size, batch_size,
+                  training=False, augment=False, rescale=None, cache=True, seed=None,
+                  extra_targets=None):
+    """Build a batched, prefetched dataset of (image, one-hot label).
+
+    cache: True caches decoded uint8 images in memory, a string caches them to
+    that file path, False/None disables caching.
+    extra_targets: optional (N, K) float array appended to each one-hot label,
+    e.g. cached teacher logits for distillation.
+    """
+    if extra_targets is None:
+        ds = tf.data.Dataset.from_tensor_slices((list(paths), list(labels)))
+        to_target = lambda label: tf.one_hot(label, num_classes)
+    else:
+        # One-hot label and extra targets side by side in a single y tensor
+        targets = np.concatenate([
+            np.eye(num_classes, dtype=np.float32)[np.asarray(labels)],
+            np.asarray(extra_targets, dtype=np.float32)
+        ], axis=1)
+        ds = tf.data.Dataset.from_tensor_slices((list(paths), targets))
+        to_target = lambda target: target
+
+    if training and not cache:
+        # Shuffling paths is cheap; do it before the expensive decode
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    ds = ds.map(
+        lambda path, label: (decode_image(path, image_size), to_target(label)),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not training
+    )
+
+    if cache:
+        ds = ds.cache('' if cache is True else cache)
+        if training:
+            ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    ds = ds.batch(batch_size, num_parallel_calls=AUTOTUNE)
+    return finalize_batches(ds, augment=augment, rescale=rescale, seed=seed)
+
+
+def build_materialized_dataset(store, rows, num_classes, batch_size,
+                               training=False, augment=False, rescale=None, seed=None):
+    """Dataset over rows of a MaterializedDataset; no JPEG decode at all."""
+    height, width = store.image_size
+
+    def gather(batch_rows):
+        # Sorted rows keep reads sequential within each memory-mapped shard
+        return store.take(np.sort(batch_rows))
+
+    ds = tf.data.Dataset.from_tensor_slices(np.asarray(rows, dtype=np.int64))
+    if training:
+        ds = ds.shuffle(len(rows), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+
+    def load(batch_rows):
+        images, labels = tf.numpy_function(gather, [batch_rows], [tf.uint8, tf.int32])
+        images.set_shape([None, height, width, 3])
+        labels.set_shape([None])
+        return images, tf.one_hot(labels, num_classes)
+
+    ds = ds.map(load, num_parallel_calls=AUTOTUNE, deterministic=not training)
+    return finalize_batches(ds, augment=augment, rescale=rescale, seed=seed)
+
+
+def finalize_batches(ds, augment=False, rescale=None, seed=None):
+    """Cast uint8 batches to float32, augment, rescale and prefetch."""
+    ds = ds.map(lambda x, y: (tf.cast(x, tf.float32), y), num_parallel_calls=AUTOTUNE)
+    if augment:
+        augmenter = build_augmenter(seed)
+        ds = ds.map(lambda x, y: (augmenter(x, training=True), y), num_parallel_calls=AUTOTUNE)
+    if rescale:
+        ds = ds.map(lambda x, y: (x * rescale, y), num_parallel_calls=AUTOTUNE)
+
+    return ds.prefetch(AUTOTUNE)
+
+
+def prepare_datasets(dataset_path, image_size, batch_size, rescale=None,
+                     validation_split=VALIDATION_SPLIT, cache=True, seed=None,
+                     materialized_root=None, augment=True):
+    """tf.data drop-in for the train/val generators used by the trainers.
+
+    The returned datasets carry `class_indices`, `samples` and `filenames`
+    like a DirectoryIterator, so the training scripts can use them unchanged.
+    With `materialized_root`, images are read from memory-mapped shards
+    (materialized on first use) instead of being decoded every epoch.
+    augment=False disables training-set augmentation.
+    """
+    class_indices, subsets = list_image_files(dataset_path, validation_split)
+    num_classes = len(class_indices)
+
+    store = None
+    if materialized_root:
+        store = dataset_cache.MaterializedDataset(
+            dataset_cache.materialize(dataset_path, image_size, materialized_root)
+        )
+
+    datasets = []
+    for subset in ('training', 'validation'):
+        paths, labels = subsets[subset]
+        training = subset == 'training'
+        subset_cache = cache
+        if isinstance(cache, str) and cache:
+            subset_cache = f"{cache}_{subset}"
+
+        filenames = [os.path.relpath(p, dataset_path) for p in paths]
+        if store is not None:
+            ds = build_materialized_dataset(
+                store, store.rows_for(filenames), num_classes, batch_size,
+                training=training,
+                augment=training and augment,
+                rescale=rescale,
+                seed=seed
+            )
+        else:
+            ds = build_dataset(
+                paths, labels, num_classes, image_size, batch_size,
+                training=training,
+                augment=training and augment,
+                rescale=rescale,
+                cache=subset_cache,
+                seed=seed
+            )
+        ds.class_indices = class_indices
+        ds.samples = len(paths)
+        ds.filenames = filenames
+        print(f"Found {len(paths)} images belonging to {num_classes} classes ({subset}).")
+        datasets.append(ds)
+
+    return tuple(datasets)
+
+
+def prepare_test_dataset(dataset_path, image_size, batch_size, rescale=None):
+    """Held-out 'test' subset of the split index as a dataset, or None if it has none."""
+    class_indices, subsets = list_image_files(dataset_path)
+    if 'test' not in subsets:
+        return None
+    paths, labels = subsets['test']
+    ds = build_dataset(paths, labels, len(class_indices), image_size, batch_size, rescale=rescale, cache=False)
+    ds.class_indices = class_indices
+    ds.samples = len(paths)
+    ds.filenames = [os.path.relpath(p, dataset_path) for p in paths]
+    print(f"Found {len(paths)} images belonging to {len(class_indices)} classes (test).")
+    return ds
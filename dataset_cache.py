@@ -0,0 +1,165 @@
+"""
+Padang Food Recognition - Materialized Dataset Cache
+Decodes + resizes every image once and stores the uint8 tensors and labels in
+memory-mapped .npy shards, keyed by image size and dataset content hash.
+Training and evaluation then read the shards zero-copy via np.load(mmap_mode='r').
+
+Usage:
+    python dataset_cache.py --dataset ./dataset/train --size 224
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+import dataset_manifest
+
+DEFAULT_CACHE_ROOT = "./dataset/cache"
+SHARD_SIZE = 1024  # images per shard (~150 MB at 224x224)
+INDEX_FILE = "index.json"
+
+
+def dataset_fingerprint(dataset_path, paths, labels, image_size):
+    """Hash of image size + (relative path, label, content hash) of every file.
+
+    Content hashes come from the dataset manifest when the file's size and
+    mtime are unchanged, so only new or modified files are read.
+    """
+    known = dataset_manifest.known_digests(dataset_path)
+    h = hashlib.sha256(f"{image_size[0]}x{image_size[1]}".encode())
+    for path, label in zip(paths, labels):
+        rel = os.path.relpath(path, dataset_path).replace(os.sep, '/')
+        digest = known.get(os.path.normpath(path)) or dataset_manifest.file_digest(path)
+        h.update(f"{rel}\0{label}\0{digest}\n".encode())
+    return h.hexdigest()
+
+
+def cache_dir_for(cache_root, image_size, fingerprint):
+    return os.path.join(cache_root, f"{image_size[0]}x{image_size[1]}-{fingerprint[:16]}")
+
+
+def materialize(dataset_path, image_size, cache_root=DEFAULT_CACHE_ROOT, shard_size=SHARD_SIZE):
+    """Write the decoded dataset to shards (once) and return the cache dir."""
+    import tensorflow as tf
+    import data_pipeline
+
+    class_indices, subsets = data_pipeline.list_image_files(dataset_path, validation_split=0.0)
+    paths, labels = subsets['training']
+    fingerprint = dataset_fingerprint(dataset_path, paths, labels, image_size)
+    cache_dir = cache_dir_for(cache_root, image_size, fingerprint)
+
+    if os.path.exists(os.path.join(cache_dir, INDEX_FILE)):
+        print(f"Materialized dataset up to date: {cache_dir}")
+        return cache_dir
+
+    print(f"Materializing {len(paths)} images at {image_size[0]}x{image_size[1]} -> {cache_dir}")
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    ds = tf.data.Dataset.from_tensor_slices(list(paths))
+    ds = ds.map(lambda p: data_pipeline.decode_image(p, image_size),
+                num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    ds = ds.batch(256).prefetch(tf.data.AUTOTUNE)
+
+    shards = []
+    shard, shard_fill, written = None, 0, 0
+    for batch in ds.as_numpy_iterator():
+        offset = 0
+        while offset < len(batch):
+            if shard is None:
+                count = min(shard_size, len(paths) - written)
+                name = f"images-{len(shards):05d}.npy"
+                shard = np.lib.format.open_memmap(
+                    os.path.join(tmp_dir, name), mode='w+', dtype=np.uint8,
+                    shape=(count, image_size[0], image_size[1], 3)
+                )
+                shards.append({'file': name, 'count': count})
+                shard_fill = 0
+            take = min(len(batch) - offset, len(shard) - shard_fill)
+            shard[shard_fill:shard_fill + take] = batch[offset:offset + take]
+            shard_fill += take
+            offset += take
+            written += take
+            if shard_fill == len(shard):
+                shard.flush()
+                del shard
+                shard = None
+
+    np.save(os.path.join(tmp_dir, "labels.npy"), np.asarray(labels, dtype=np.int32))
+
+    index = {
+        'imageSize': list(image_size),
+        'fingerprint': fingerprint,
+        'classIndices': class_indices,
+        'paths': [os.path.relpath(p, dataset_path).replace(os.sep, '/') for p in paths],
+        'shards': shards
+    }
+    with open(os.path.join(tmp_dir, INDEX_FILE), 'w') as f:
+        json.dump(index, f)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    print(f"Wrote {len(shards)} shard(s), {written} images")
+    return cache_dir
+
+
+class MaterializedDataset:
+    """Read-only view over the memory-mapped shards of one cache dir."""
+
+    def __init__(self, cache_dir):
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.cache_dir = cache_dir
+        self.image_size = tuple(self.index['imageSize'])
+        self.class_indices = self.index['classIndices']
+        self.paths = self.index['paths']
+        self.labels = np.load(os.path.join(cache_dir, "labels.npy"), mmap_mode='r')
+        self.shards = [
+            np.load(os.path.join(cache_dir, s['file']), mmap_mode='r')
+            for s in self.index['shards']
+        ]
+        self.offsets = np.cumsum([0] + [len(s) for s in self.shards])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def rows_for(self, relpaths):
+        """Row numbers of the given dataset-relative paths."""
+        position = {p: i for i, p in enumerate(self.paths)}
+        return np.asarray([position[p.replace(os.sep, '/')] for p in relpaths], dtype=np.int64)
+
+    def take(self, rows):
+        """Gather images + labels for `rows` (only the batch is copied)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        images = np.empty((len(rows), *self.image_size, 3), dtype=np.uint8)
+        shard_ids = np.searchsorted(self.offsets, rows, side='right') - 1
+        for shard_id in np.unique(shard_ids):
+            mask = shard_ids == shard_id
+            local = rows[mask] - self.offsets[shard_id]
+            images[mask] = self.shards[shard_id][local]
+        return images, np.asarray(self.labels[rows], dtype=np.int32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize the dataset into memory-mapped shards")
+    parser.add_argument('--dataset', default="./dataset/train", help="Dataset root (one folder per class)")
+    parser.add_argument('--size', type=int, default=224, help="Square image size")
+    parser.add_argument('--cache-root', default=DEFAULT_CACHE_ROOT)
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help="Images per shard")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dataset):
+        print(f"Error: dataset not found at {args.dataset}")
+        return 1
+    materialize(args.dataset, (args.size, args.size), args.cache_root, args.shard_size)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
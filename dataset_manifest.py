@@ -0,0 +1,232 @@
+"""
+Padang Food Recognition - Dataset Manifest & Integrity Index
+Persistent per-file index of the dataset (path, class, size, mtime, decoded
+dimensions, format, SHA-1). It is built by a parallel scanner and updated
+incrementally: only files whose size or mtime changed are opened again.
+
+Files that fail to decode are moved to a quarantine folder next to the
+dataset, so they never reach a training run. A short history of per-class
+counts is kept to track dataset growth.
+
+Usage:
+    python dataset_manifest.py [--dataset ./dataset/train] [--workers 8] [--no-quarantine]
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DATASET_PATH = "./dataset/train"
+# Formats tf.io.decode_image can read (subset of ImageDataGenerator's whitelist)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+MANIFEST_VERSION = 1
+HISTORY_LIMIT = 50
+
+
+def manifest_path_for(dataset_path):
+    """./dataset/train -> ./dataset/train_manifest.json (outside the class folders)."""
+    dataset_path = os.path.normpath(dataset_path)
+    return os.path.join(os.path.dirname(dataset_path), f"{os.path.basename(dataset_path)}_manifest.json")
+
+
+def quarantine_dir_for(dataset_path):
+    dataset_path = os.path.normpath(dataset_path)
+    return os.path.join(os.path.dirname(dataset_path), "quarantine", os.path.basename(dataset_path))
+
+
+def load_manifest(dataset_path, manifest_path=None):
+    """The saved manifest, or None if there is none (or it is from another version)."""
+    manifest_path = manifest_path or manifest_path_for(dataset_path)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def scan_files(dataset_path):
+    """(relative path, class, os.stat_result) of every image under the class folders."""
+    entries, unsupported = [], 0
+    class_names = sorted(
+        d for d in os.listdir(dataset_path)
+        if os.path.isdir(os.path.join(dataset_path, d))
+    )
+    for class_name in class_names:
+        for root, _, fnames in sorted(os.walk(os.path.join(dataset_path, class_name)), key=lambda x: x[0]):
+            for fname in sorted(fnames):
+                path = os.path.join(root, fname)
+                if not fname.lower().endswith(IMAGE_EXTENSIONS):
+                    unsupported += 1
+                    continue
+                rel = os.path.relpath(path, dataset_path).replace(os.sep, '/')
+                entries.append((rel, class_name, os.stat(path)))
+    return class_names, entries, unsupported
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-1 of a file's content."""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def inspect_file(path):
+    """Hash and fully decode one image; returns the manifest fields."""
+    # Imported here so that reading a manifest (download_dataset.py, cli.py) needs no PIL
+    from PIL import Image
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    record = {'sha1': hashlib.sha1(data).hexdigest()}
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # load() decodes every pixel, so truncated files fail here too
+            image.load()
+            record.update(width=image.width, height=image.height,
+                          format=image.format, mode=image.mode, status='ok')
+    except Exception as e:
+        record.update(status='corrupt', error=f"{type(e).__name__}: {e}")
+    return record
+
+
+def update_manifest(dataset_path=DEFAULT_DATASET_PATH, workers=None, quarantine=True,
+                    manifest_path=None, verbose=True):
+    """Bring the manifest up to date with the files on disk and save it.
+
+    Unchanged files (same size and mtime) keep their previous record; new or
+    modified ones are inspected in parallel. With `quarantine`, corrupt
+    files are moved out of the dataset and listed under 'quarantined'.
+    """
+    manifest_path = manifest_path or manifest_path_for(dataset_path)
+    previous = load_manifest(dataset_path, manifest_path) or {}
+    old_files = previous.get('files', {})
+
+    start = time.perf_counter()
+    class_names, entries, unsupported = scan_files(dataset_path)
+
+    files, todo = {}, []
+    for rel, class_name, st in entries:
+        old = old_files.get(rel)
+        if old and old['size'] == st.st_size and old['mtimeNs'] == st.st_mtime_ns:
+            files[rel] = old
+        else:
+            todo.append((rel, class_name, st))
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+            records = pool.map(inspect_file, [os.path.join(dataset_path, rel) for rel, _, _ in todo])
+            for (rel, class_name, st), record in zip(todo, records):
+                files[rel] = {'class': class_name, 'size': st.st_size, 'mtimeNs': st.st_mtime_ns, **record}
+
+    quarantined = list(previous.get('quarantined', []))
+    corrupt = [rel for rel, record in files.items() if record['status'] == 'corrupt']
+    if quarantine and corrupt:
+        target_root = quarantine_dir_for(dataset_path)
+        for rel in corrupt:
+            target = os.path.join(target_root, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(os.path.join(dataset_path, rel), target)
+            record = files.pop(rel)
+            quarantined.append({'path': rel, 'movedTo': target, 'error': record.get('error'),
+                                'time': time.strftime('%Y-%m-%dT%H:%M:%S')})
+            if verbose:
+                print(f"   [QUARANTINED] {rel}: {record.get('error')}")
+
+    per_class = {name: 0 for name in class_names}
+    for record in files.values():
+        if record['status'] == 'ok':
+            per_class[record['class']] += 1
+
+    history = list(previous.get('history', []))
+    if not history or history[-1]['perClass'] != per_class:
+        history.append({'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        'total': sum(per_class.values()), 'perClass': per_class})
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'dataset': os.path.abspath(dataset_path),
+        'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'classes': class_names,
+        'unsupportedFiles': unsupported,
+        'files': dict(sorted(files.items())),
+        'quarantined': quarantined,
+        'history': history[-HISTORY_LIMIT:],
+    }
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+    if verbose:
+        print(f"Manifest: {len(files)} files, {len(todo)} (re)inspected, "
+              f"{len(entries) - len(todo)} unchanged, {len(corrupt)} corrupt "
+              f"in {time.perf_counter() - start:.1f}s -> {manifest_path}")
+    return manifest
+
+
+def known_digests(dataset_path, manifest_path=None):
+    """{absolute path: sha1} for manifest entries whose size and mtime still match."""
+    manifest = load_manifest(dataset_path, manifest_path)
+    if not manifest:
+        return {}
+    digests = {}
+    for rel, record in manifest['files'].items():
+        path = os.path.join(dataset_path, rel)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if st.st_size == record['size'] and st.st_mtime_ns == record['mtimeNs']:
+            digests[os.path.normpath(path)] = record['sha1']
+    return digests
+
+
+def corrupt_files(dataset_path, manifest_path=None):
+    """Absolute paths the manifest marks as undecodable (when not quarantined)."""
+    manifest = load_manifest(dataset_path, manifest_path)
+    if not manifest:
+        return set()
+    return {os.path.normpath(os.path.join(dataset_path, rel))
+            for rel, record in manifest['files'].items() if record['status'] == 'corrupt'}
+
+
+def readable_files(dataset_path, manifest_path=None):
+    """(class names, {class: [absolute paths]}) of decodable images, or None without a manifest.
+
+    Paths are in directory-walk order (sorted folders, then sorted names),
+    so callers can list the dataset without walking it.
+    """
+    manifest = load_manifest(dataset_path, manifest_path)
+    if not manifest:
+        return None
+    by_class = {name: [] for name in manifest['classes']}
+    rels = (rel for rel, record in manifest['files'].items() if record['status'] == 'ok')
+    for rel in sorted(rels, key=lambda rel: rel.rpartition('/')[::2]):
+        by_class[manifest['files'][rel]['class']].append(os.path.join(dataset_path, *rel.split('/')))
+    return manifest['classes'], by_class
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build/update the dataset manifest and quarantine corrupt files")
+    parser.add_argument('--dataset', default=DEFAULT_DATASET_PATH, help="Dataset root (one folder per class)")
+    parser.add_argument('--workers', type=int, help="Parallel inspection threads (default: CPU count)")
+    parser.add_argument('--no-quarantine', action='store_true', help="Only mark corrupt files, do not move them")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dataset):
+        print(f"Error: dataset not found at {args.dataset}")
+        return 1
+    update_manifest(args.dataset, args.workers, quarantine=not args.no_quarantine)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
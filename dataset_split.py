@@ -0,0 +1,251 @@
+"""
+Padang Food Recognition - Persisted Train/Validation/Test Split
+Writes a seeded, per-class stratified split index once, next to the dataset
+(dataset/<name>_split.json). The trainers, data_pipeline, feature/teacher
+caches and predict_manual.py --split all read this file instead of
+re-deriving the split from directory order, so every experiment holds out
+the same images.
+
+- Images come from the dataset manifest (no extra directory scan);
+  corrupt files are never assigned
+- Order inside a class is a seeded hash of the file path, so the split does
+  not depend on listing order or platform
+- Near-duplicate clusters from dedup_dataset.py are assigned as one unit;
+  the index records which clusters file it used and ensure_split()
+  re-assigns clusters (like --update) when that file changes
+- --update assigns new images and keeps every existing assignment
+
+Usage:
+    python dataset_split.py [--dataset ./dataset/train] [--val 0.2] [--test 0.0]
+                            [--seed 42] [--update | --force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+import dataset_manifest
+
+DEFAULT_DATASET_PATH = dataset_manifest.DEFAULT_DATASET_PATH
+SUBSETS = ('training', 'validation', 'test')
+VALIDATION_FRACTION = 0.2
+TEST_FRACTION = 0.0
+SEED = 42
+SPLIT_VERSION = 1
+
+
+def split_path_for(dataset_path):
+    dataset_path = os.path.normpath(dataset_path)
+    return os.path.join(os.path.dirname(dataset_path), f"{os.path.basename(dataset_path)}_split.json")
+
+
+def load_split(dataset_path):
+    """The saved split index, or None."""
+    path = split_path_for(dataset_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        index = json.load(f)
+    return index if index.get('version') == SPLIT_VERSION else None
+
+
+def split_digest(dataset_path):
+    """Short hash of the current assignments (for cache keys), or None without an index."""
+    index = load_split(dataset_path)
+    if index is None:
+        return None
+    return hashlib.sha256(json.dumps(index['files'], sort_keys=True).encode()).hexdigest()[:16]
+
+
+def clusters_digest(dataset_path):
+    """Short hash of the dedup_dataset.py clusters (members only), or None without a clusters file."""
+    import dedup_dataset
+
+    clusters = dedup_dataset.load_clusters(dataset_path)
+    if not clusters:
+        return None
+    members = sorted(sorted(os.path.relpath(m, dataset_path).replace(os.sep, '/') for m in c) for c in clusters)
+    return hashlib.sha256(json.dumps(members).encode()).hexdigest()[:16]
+
+
+def clusters_changed(dataset_path, index):
+    """True if the clusters file differs from the one the index was written with."""
+    return index.get('clusters') != clusters_digest(dataset_path)
+
+
+def _rank(seed, rel):
+    return hashlib.sha1(f"{seed}:{rel}".encode()).hexdigest()
+
+
+def create_split(dataset_path=DEFAULT_DATASET_PATH, validation=VALIDATION_FRACTION, test=TEST_FRACTION,
+                 seed=SEED, update=False, manifest=None):
+    """Assign every readable image to a subset and write the index.
+
+    With `update`, images already in the index keep their subset (the
+    stored fractions and seed are reused) and only new images are assigned,
+    filling each class up to its target share. A near-duplicate cluster
+    whose members were split up moves into the subset of its first
+    assigned member.
+    """
+    import dedup_dataset
+
+    manifest = manifest or dataset_manifest.load_manifest(dataset_path) or dataset_manifest.update_manifest(dataset_path)
+    previous = load_split(dataset_path) if update else None
+    assigned = {}
+    if previous:
+        validation, test, seed = previous['fractions']['validation'], previous['fractions']['test'], previous['seed']
+        assigned = {rel: subset for subset, rels in previous['files'].items() for rel in rels}
+
+    files = {rel: r['class'] for rel, r in manifest['files'].items() if r['status'] == 'ok'}
+
+    # A near-duplicate cluster is one unit, labelled by its first member's class
+    group_of = {rel: rel for rel in files}
+    for members in dedup_dataset.load_clusters(dataset_path):
+        rels = sorted(r for r in (os.path.relpath(m, dataset_path).replace(os.sep, '/') for m in members)
+                      if r in files)
+        for rel in rels:
+            group_of[rel] = rels[0]
+    groups = defaultdict(list)
+    for rel in sorted(files):
+        groups[group_of[rel]].append(rel)
+
+    by_class = defaultdict(list)
+    for key, members in groups.items():
+        by_class[files[key]].append(members)
+
+    result = {subset: [] for subset in SUBSETS}
+    for class_name, class_groups in by_class.items():
+        total = sum(len(members) for members in class_groups)
+        quota = {'test': round(test * total), 'validation': round(validation * total)}
+        counts = dict.fromkeys(SUBSETS, 0)
+        new_groups = []
+        for members in class_groups:
+            previous_subset = next((assigned[m] for m in members if m in assigned), None)
+            if previous_subset:
+                result[previous_subset].extend(members)
+                counts[previous_subset] += len(members)
+            else:
+                new_groups.append(members)
+        for members in sorted(new_groups, key=lambda m: _rank(seed, m[0])):
+            subset = next((s for s in ('test', 'validation') if counts[s] < quota[s]), 'training')
+            result[subset].extend(members)
+            counts[subset] += len(members)
+
+    index = {
+        'version': SPLIT_VERSION,
+        'dataset': os.path.abspath(dataset_path),
+        'created': previous['created'] if previous else time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': seed,
+        'fractions': {'validation': validation, 'test': test},
+        'classes': manifest['classes'],
+        'clusters': clusters_digest(dataset_path),
+        'files': {subset: sorted(rels) for subset, rels in result.items()},
+    }
+    path = split_path_for(dataset_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, path)
+
+    counts = ", ".join(f"{len(index['files'][s])} {s}" for s in SUBSETS if index['files'][s] or s != 'test')
+    print(f"Split index: {counts} (seed {seed}) -> {path}")
+    return index
+
+
+def ensure_split(dataset_path=DEFAULT_DATASET_PATH):
+    """Load the split index, creating it with the defaults the first time.
+
+    If dedup_dataset.py has rewritten the clusters file since the index was
+    written, the index is updated so that no cluster spans two subsets.
+    """
+    index = load_split(dataset_path)
+    if index is None:
+        return create_split(dataset_path)
+    if clusters_changed(dataset_path, index):
+        print(f"Duplicate clusters changed since {split_path_for(dataset_path)} was written; updating it")
+        return create_split(dataset_path, update=True)
+    print(f"Using split index {split_path_for(dataset_path)} "
+          f"({', '.join(f'{len(rels)} {s}' for s, rels in index['files'].items() if rels)})")
+    return index
+
+
+def split_subsets(dataset_path, index, merge=False):
+    """(class_indices, {subset: (paths, labels)}) from the index.
+
+    Files the manifest no longer lists as readable are dropped. Images added
+    since the split was written are reported, not silently assigned. With
+    `merge`, every image is returned under 'training' (for caches that key
+    on the whole dataset). Paths are ordered by class, then path, like the
+    directory walk.
+    """
+    class_indices = {name: idx for idx, name in enumerate(index['classes'])}
+    manifest = dataset_manifest.load_manifest(dataset_path)
+    readable = None
+    if manifest:
+        readable = {rel for rel, r in manifest['files'].items() if r['status'] == 'ok'}
+        indexed = {rel for rels in index['files'].values() for rel in rels}
+        new = len(readable - indexed)
+        if new:
+            print(f"   Warning: {new} images are not in the split index "
+                  f"(python dataset_split.py --update to assign them)")
+
+    def entries(subsets):
+        rels = [rel for subset in subsets for rel in index['files'].get(subset, [])
+                if (readable is None or rel in readable) and rel.split('/')[0] in class_indices]
+        rels.sort(key=lambda rel: (class_indices[rel.split('/')[0]], rel))
+        return ([os.path.join(dataset_path, *rel.split('/')) for rel in rels],
+                [class_indices[rel.split('/')[0]] for rel in rels])
+
+    if merge:
+        return class_indices, {'training': entries(SUBSETS), 'validation': ([], [])}
+    subsets = {subset: entries([subset]) for subset in SUBSETS}
+    if not subsets['test'][0]:
+        del subsets['test']
+    return class_indices, subsets
+
+
+def subset_frame(dataset_path, subset):
+    """pandas DataFrame (filename, class) of one subset, for flow_from_dataframe."""
+    import pandas as pd
+
+    index = load_split(dataset_path) or create_split(dataset_path)
+    class_indices, subsets = split_subsets(dataset_path, index)
+    names = {idx: name for name, idx in class_indices.items()}
+    paths, labels = subsets.get(subset, ([], []))
+    return pd.DataFrame({'filename': paths, 'class': [names[i] for i in labels]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the persisted stratified train/val/test split index")
+    parser.add_argument('--dataset', default=DEFAULT_DATASET_PATH, help="Dataset root (one folder per class)")
+    parser.add_argument('--val', type=float, default=VALIDATION_FRACTION, help="Validation fraction per class")
+    parser.add_argument('--test', type=float, default=TEST_FRACTION, help="Test fraction per class")
+    parser.add_argument('--seed', type=int, default=SEED)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--update', action='store_true', help="Assign new images, keep existing assignments")
+    mode.add_argument('--force', action='store_true', help="Re-split everything (changes the held-out set)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dataset):
+        print(f"Error: dataset not found at {args.dataset}")
+        return 1
+    if args.val + args.test >= 1:
+        print("Error: --val + --test must be below 1")
+        return 1
+    if load_split(args.dataset) and not (args.update or args.force):
+        print(f"Split index already exists at {split_path_for(args.dataset)}; "
+              f"use --update to add new images or --force to re-split")
+        return 0
+
+    manifest = dataset_manifest.update_manifest(args.dataset)
+    create_split(args.dataset, args.val, args.test, args.seed, update=args.update, manifest=manifest)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Padang Food Recognition - Near-Duplicate Detection
+Finds near-duplicate images (re-encodes, resizes, light crops of the same
+photo) with perceptual hashes, so they cannot land on both sides of the
+train/validation split and inflate val_accuracy.
+
+- dHash (gradient) and pHash (DCT) per image, computed in parallel and
+  cached by content hash, so re-runs only hash new files
+- Vectorized Hamming search over uint64 hashes (XOR + popcount in tiles,
+  parallel over row blocks); `--benchmark N` times the search on N random
+  hashes and prints the machine it ran on
+- Union-find groups pairs into clusters, written to
+  dataset/<name>_duplicate_clusters.json; data_pipeline.list_image_files
+  then keeps every cluster inside a single split
+
+Usage:
+    python dedup_dataset.py [--dataset ./dataset/train] [--dhash-threshold 8] [--phash-threshold 12]
+    python dedup_dataset.py --benchmark 100000 [--workers 1]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import dataset_manifest
+
+DEFAULT_DATASET_PATH = dataset_manifest.DEFAULT_DATASET_PATH
+DHASH_THRESHOLD = 8   # of 64 bits
+PHASH_THRESHOLD = 12  # of 64 bits, confirms dHash candidates
+ROW_BLOCK = 128       # Hamming tile size: 128 x 4096 uint64 (~4 MB) per thread
+COL_BLOCK = 4096
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def clusters_path_for(dataset_path):
+    dataset_path = os.path.normpath(dataset_path)
+    return os.path.join(os.path.dirname(dataset_path), f"{os.path.basename(dataset_path)}_duplicate_clusters.json")
+
+
+def hash_cache_path_for(dataset_path):
+    dataset_path = os.path.normpath(dataset_path)
+    return os.path.join(os.path.dirname(dataset_path), f"{os.path.basename(dataset_path)}_phash.json")
+
+
+def _bits_to_uint64(bits):
+    return int(np.packbits(bits.astype(np.uint8).ravel()).view('>u8')[0])
+
+
+def perceptual_hashes(path):
+    """(dHash, pHash) of one image as Python ints."""
+    with Image.open(path) as image:
+        # JPEG draft mode decodes at reduced scale: much faster, same hash
+        image.draft('L', (64, 64))
+        gray = image.convert('L')
+        small = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.float32)
+        block = np.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=np.float32)
+
+    dhash = _bits_to_uint64(small[:, 1:] > small[:, :-1])
+    low = (_DCT32 @ block @ _DCT32.T)[:8, :8]
+    phash = _bits_to_uint64(low > np.median(low))
+    return dhash, phash
+
+
+def popcount64(values, out=None):
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        return np.bitwise_count(values, out=out)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(*values.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def find_pairs(dhashes, phashes, dhash_threshold=DHASH_THRESHOLD, phash_threshold=PHASH_THRESHOLD,
+               row_block=ROW_BLOCK, col_block=COL_BLOCK, workers=None):
+    """Index pairs (i < j) within both Hamming thresholds.
+
+    Scans the upper triangle of the all-pairs dHash distance matrix in
+    cache-sized tiles written into reused buffers; row blocks run in
+    parallel threads (NumPy releases the GIL). Candidates are confirmed
+    with the pHash distance.
+    """
+    dhashes = np.asarray(dhashes, dtype=np.uint64)
+    phashes = np.asarray(phashes, dtype=np.uint64)
+    n = len(dhashes)
+    buffers = threading.local()
+
+    def scan_rows(row):
+        if not hasattr(buffers, 'xor'):
+            buffers.xor = np.empty((row_block, col_block), dtype=np.uint64)
+            buffers.dist = np.empty((row_block, col_block), dtype=np.uint8)
+        rows = dhashes[row:row + row_block, None]
+        found = []
+        for col in range(row, n, col_block):
+            r, c = len(rows), min(col_block, n - col)
+            xor = np.bitwise_xor(rows, dhashes[None, col:col + c], out=buffers.xor[:r, :c])
+            dist = popcount64(xor, out=buffers.dist[:r, :c])
+            close = dist <= dhash_threshold
+            if not close.any():
+                continue
+            i, j = np.nonzero(close)
+            i, j = i + row, j + col
+            keep = i < j
+            i, j = i[keep], j[keep]
+            if len(i):
+                confirmed = popcount64(phashes[i] ^ phashes[j]) <= phash_threshold
+                found.extend(zip(i[confirmed].tolist(), j[confirmed].tolist()))
+        return found
+
+    pairs = []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+        for found in pool.map(scan_rows, range(0, n, row_block)):
+            pairs.extend(found)
+    return pairs
+
+
+def union_find_clusters(n, pairs):
+    """Connected components (size > 1) of the duplicate graph, as index lists."""
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    groups = defaultdict(list)
+    for i in range(n):
+        groups[find(i)].append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def compute_hashes(dataset_path, manifest, workers=None):
+    """{relative path: (dhash, phash)}; cached by SHA-1 so unchanged files are not re-hashed."""
+    cache_path = hash_cache_path_for(dataset_path)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+    files = {rel: r for rel, r in manifest['files'].items() if r['status'] == 'ok'}
+    todo = sorted({r['sha1']: rel for rel, r in files.items() if r['sha1'] not in cache}.items())
+    if todo:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+            results = pool.map(perceptual_hashes, [os.path.join(dataset_path, rel) for _, rel in todo])
+            for (sha1, _), (dhash, phash) in zip(todo, results):
+                cache[sha1] = [f"{dhash:016x}", f"{phash:016x}"]
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+
+    print(f"   Perceptual hashes: {len(files)} images, {len(todo)} newly hashed")
+    return {rel: (int(cache[r['sha1']][0], 16), int(cache[r['sha1']][1], 16)) for rel, r in files.items()}
+
+
+def find_duplicates(dataset_path=DEFAULT_DATASET_PATH, dhash_threshold=DHASH_THRESHOLD,
+                    phash_threshold=PHASH_THRESHOLD, workers=None):
+    """Hash, search and write the duplicate clusters file; returns its content."""
+    manifest = dataset_manifest.update_manifest(dataset_path, workers)
+    start = time.perf_counter()
+    hashes = compute_hashes(dataset_path, manifest, workers)
+    paths = sorted(hashes)
+    dhashes = [hashes[p][0] for p in paths]
+    phashes = [hashes[p][1] for p in paths]
+
+    pairs = find_pairs(dhashes, phashes, dhash_threshold, phash_threshold, workers=workers)
+    clusters = []
+    for members in union_find_clusters(len(paths), pairs):
+        member_paths = [paths[i] for i in members]
+        classes = sorted({manifest['files'][p]['class'] for p in member_paths})
+        clusters.append({'members': member_paths, 'classes': classes})
+    clusters.sort(key=lambda c: (-len(c['members']), c['members'][0]))
+
+    result = {
+        'dataset': os.path.abspath(dataset_path),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'dhashThreshold': dhash_threshold,
+        'phashThreshold': phash_threshold,
+        'images': len(paths),
+        'duplicateImages': sum(len(c['members']) - 1 for c in clusters),
+        'crossClassClusters': sum(len(c['classes']) > 1 for c in clusters),
+        'clusters': clusters,
+    }
+    output = clusters_path_for(dataset_path)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"   {len(pairs)} near-duplicate pairs -> {len(clusters)} clusters "
+          f"({result['duplicateImages']} redundant images, {result['crossClassClusters']} span classes) "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"   Written to {output}")
+    return result
+
+
+def load_clusters(dataset_path):
+    """List of member-path lists (absolute, normalized) from the clusters file, or []."""
+    path = clusters_path_for(dataset_path)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        clusters = json.load(f)['clusters']
+    return [[os.path.normpath(os.path.join(dataset_path, rel)) for rel in c['members']] for c in clusters]
+
+
+def benchmark_search(n, workers=None, seed=0):
+    """Time find_pairs on n random hash pairs; returns the measurement as a dict."""
+    import platform
+
+    rng = np.random.default_rng(seed)
+    dhashes = rng.integers(0, np.iinfo(np.uint64).max, n, dtype=np.uint64, endpoint=True)
+    phashes = rng.integers(0, np.iinfo(np.uint64).max, n, dtype=np.uint64, endpoint=True)
+    start = time.perf_counter()
+    pairs = find_pairs(dhashes, phashes, workers=workers)
+    seconds = time.perf_counter() - start
+    return {
+        'hashes': n, 'pairsCompared': n * (n - 1) // 2, 'pairsFound': len(pairs),
+        'workers': workers or os.cpu_count() or 4, 'seconds': round(seconds, 2),
+        'numpy': np.__version__, 'bitwiseCount': hasattr(np, 'bitwise_count'),
+        'machine': platform.processor() or platform.machine(), 'cpus': os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate image clusters with perceptual hashes")
+    parser.add_argument('--dataset', default=DEFAULT_DATASET_PATH, help="Dataset root (one folder per class)")
+    parser.add_argument('--dhash-threshold', type=int, default=DHASH_THRESHOLD)
+    parser.add_argument('--phash-threshold', type=int, default=PHASH_THRESHOLD)
+    parser.add_argument('--workers', type=int, help="Parallel hashing threads (default: CPU count)")
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help="Only time the Hamming search on N random hashes (no dataset needed)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        result = benchmark_search(args.benchmark, args.workers)
+        print(f"Hamming search: {result['hashes']:,} hashes ({result['pairsCompared']:.2e} pairs) "
+              f"in {result['seconds']}s with {result['workers']} worker(s)")
+        print(f"   numpy {result['numpy']} (bitwise_count: {result['bitwiseCount']}), "
+              f"{result['machine']}, {result['cpus']} CPUs")
+        return 0
+
+    if not os.path.isdir(args.dataset):
+        print(f"Error: dataset not found at {args.dataset}")
+        return 1
+    result = find_duplicates(args.dataset, args.dhash_threshold, args.phash_threshold, args.workers)
+    for cluster in result['clusters'][:20]:
+        flag = " [CLASS CONFLICT]" if len(cluster['classes']) > 1 else ""
+        print(f"   {len(cluster['members'])}x {', '.join(cluster['members'][:4])}"
+              f"{' ...' if len(cluster['members']) > 4 else ''}{flag}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
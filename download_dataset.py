@@ -1,54 +1,215 @@
-import kagglehub
-import shutil
+"""
+Padang Food Recognition - Dataset Download & Incremental Sync
+Downloads faldoae/padangfood with kagglehub (or takes any local folder via
+--source) and syncs it into dataset/train:
+
+- Only new or changed files are transferred: size first, then a stored
+  size/mtime manifest, and a SHA-1 comparison only when those are ambiguous
+- Transfers run in parallel and prefer reflink (copy-on-write clone), then
+  hardlink, then a plain copy, whichever the filesystem allows
+- Files no longer in the source are pruned; files quarantined by
+  dataset_manifest.py are not brought back
+
+Usage:
+    python download_dataset.py [--source DIR] [--link auto|reflink|hardlink|copy] [--no-prune]
+"""
+
+import argparse
+import errno
+import json
 import os
+import shutil
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+import dataset_manifest
 
 # Define target local directory within the project
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
-# We will verify what's inside cache and copy the 'dataset_padang_food' content directly to 'dataset/train'
 TARGET_DIR = os.path.join(PROJECT_DIR, "dataset", "train")
+KAGGLE_DATASET = "faldoae/padangfood"
+DATA_SUBFOLDER = "dataset_padang_food"
+LINK_MODES = ('auto', 'reflink', 'hardlink', 'copy')
+FICLONE = 0x40049409  # Linux ioctl: clone file extents (btrfs, XFS, bcachefs)
+
+
+def resolve_source(source=None):
+    """Local source folder, downloading to the kagglehub cache if none is given."""
+    if source is None:
+        import kagglehub
+
+        print("Downloading dataset to cache first...")
+        source = kagglehub.dataset_download(KAGGLE_DATASET)
+        print(f"Cached path: {source}")
+
+    # Identify the actual data folder, usually <cache>/dataset_padang_food
+    data_path = os.path.join(source, DATA_SUBFOLDER)
+    if not os.path.exists(data_path):
+        print(f"Warning: Expected subfolder '{DATA_SUBFOLDER}' not found. Using {source}.")
+        data_path = source
+    return data_path
+
+
+def sync_manifest_path_for(target_dir):
+    target_dir = os.path.normpath(target_dir)
+    return os.path.join(os.path.dirname(target_dir), f"{os.path.basename(target_dir)}_sync.json")
+
+
+def list_files(root):
+    """{relative path: os.stat_result} of every regular file under `root`."""
+    files = {}
+    for dirpath, _, fnames in os.walk(root):
+        for fname in fnames:
+            path = os.path.join(dirpath, fname)
+            files[os.path.relpath(path, root).replace(os.sep, '/')] = os.stat(path)
+    return files
+
+
+class Transfer:
+    """Places one file at the target with the cheapest method that works.
+
+    A method that fails with "not supported here" errors is disabled for
+    the rest of the sync, so each file costs at most one failed attempt.
+    """
+
+    def __init__(self, mode='auto'):
+        methods = {'auto': ['reflink', 'hardlink', 'copy'], 'reflink': ['reflink', 'copy'],
+                   'hardlink': ['hardlink', 'copy'], 'copy': ['copy']}[mode]
+        if 'reflink' in methods and not sys.platform.startswith('linux'):
+            methods.remove('reflink')
+        self.methods = methods
+        self.lock = threading.Lock()
+        self.counts = {m: 0 for m in ('reflink', 'hardlink', 'copy')}
+
+    def _reflink(self, src, dst):
+        import fcntl
+
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+
+    def __call__(self, src, dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.sync-tmp"
+        for method in list(self.methods):
+            try:
+                if method == 'reflink':
+                    self._reflink(src, tmp)
+                elif method == 'hardlink':
+                    os.link(src, tmp)
+                else:
+                    shutil.copy2(src, tmp)
+            except OSError as e:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                if method == 'copy' or e.errno not in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP,
+                                                       errno.ENOTTY, errno.EINVAL, errno.EACCES):
+                    raise
+                with self.lock:
+                    if method in self.methods:
+                        self.methods.remove(method)
+                continue
+            # Replace atomically: a crash never leaves a half-written image
+            os.replace(tmp, dst)
+            with self.lock:
+                self.counts[method] += 1
+            return method
+
+
+def sync(source_dir, target_dir=TARGET_DIR, link='auto', prune=True, workers=None):
+    """Make `target_dir` mirror `source_dir`, transferring only what changed."""
+    start = time.perf_counter()
+    manifest_path = sync_manifest_path_for(target_dir)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f).get('files', {})
+
+    source = list_files(source_dir)
+    target = list_files(target_dir) if os.path.isdir(target_dir) else {}
+    dataset = dataset_manifest.load_manifest(target_dir) or {}
+    quarantined = {entry['path'] for entry in dataset.get('quarantined', [])}
+
+    def needs_transfer(rel):
+        src, dst = source[rel], target.get(rel)
+        if dst is None or dst.st_size != src.st_size:
+            return True
+        record = previous.get(rel)
+        if (record and record['size'] == src.st_size and record['sourceMtimeNs'] == src.st_mtime_ns
+                and record['targetMtimeNs'] == dst.st_mtime_ns):
+            return False
+        # Same size but no trustworthy record: compare content
+        return (dataset_manifest.file_digest(os.path.join(source_dir, rel))
+                != dataset_manifest.file_digest(os.path.join(target_dir, rel)))
+
+    candidates = sorted(rel for rel in source if rel not in quarantined)
+    transfer = Transfer(link)
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 4) * 4)) as pool:
+        changed = [rel for rel, needed in zip(candidates, pool.map(needs_transfer, candidates)) if needed]
+        list(pool.map(lambda rel: transfer(os.path.join(source_dir, rel), os.path.join(target_dir, rel)),
+                      changed))
+
+    removed = []
+    if prune:
+        for rel in sorted(set(target) - set(source)):
+            os.remove(os.path.join(target_dir, rel))
+            removed.append(rel)
+        for dirpath, _, _ in sorted(os.walk(target_dir), key=lambda x: len(x[0]), reverse=True):
+            if dirpath != target_dir and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+
+    files = {}
+    for rel in candidates:
+        dst_path = os.path.join(target_dir, rel)
+        if os.path.exists(dst_path):
+            files[rel] = {'size': source[rel].st_size, 'sourceMtimeNs': source[rel].st_mtime_ns,
+                          'targetMtimeNs': os.stat(dst_path).st_mtime_ns}
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'source': os.path.abspath(source_dir), 'synced': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'files': files}, f)
+    os.replace(tmp_path, manifest_path)
+
+    summary = {
+        'files': len(candidates),
+        'transferred': len(changed),
+        'unchanged': len(candidates) - len(changed),
+        'removed': len(removed),
+        'skippedQuarantined': len(set(source) & quarantined),
+        'methods': {m: n for m, n in transfer.counts.items() if n},
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+    via = ', '.join(f"{m} {n}" for m, n in summary['methods'].items())
+    print(f"Sync: {summary['transferred']} transferred{f' ({via})' if via else ''}, "
+          f"{summary['unchanged']} unchanged, {summary['removed']} removed, "
+          f"{summary['skippedQuarantined']} quarantined skipped in {summary['seconds']}s")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the Padang food dataset and sync it into dataset/train")
+    parser.add_argument('--source', help="Local folder to sync from instead of the kagglehub download")
+    parser.add_argument('--target', default=TARGET_DIR)
+    parser.add_argument('--link', choices=LINK_MODES, default='auto',
+                        help="auto = reflink, then hardlink, then copy. Hardlinked files share "
+                             "storage with the source, so edit them only by replacing")
+    parser.add_argument('--no-prune', action='store_true', help="Keep target files missing from the source")
+    parser.add_argument('--workers', type=int, help="Parallel hash/transfer threads")
+    args = parser.parse_args()
+
+    source_data_path = resolve_source(args.source)
+    print(f"Source data path: {source_data_path}")
+    print(f"Target local path: {args.target}")
+    if not os.path.isdir(source_data_path):
+        print(f"Error: source not found at {source_data_path}")
+        return 1
+
+    sync(source_data_path, args.target, args.link, prune=not args.no_prune, workers=args.workers)
+    print(f"\nLocation: {args.target}")
+    return 0
 
-# Check if local dataset already exists and is not empty
-if os.path.exists(TARGET_DIR) and len(os.listdir(TARGET_DIR)) > 0:
-    print(f"Dataset already exists at: {TARGET_DIR}")
-    # Force check emptiness of a subfolder
-    subfolders = [f.path for f in os.scandir(TARGET_DIR) if f.is_dir()]
-    if subfolders and len(os.listdir(subfolders[0])) > 0:
-        print("Dataset verification passed. Skipping download.")
-        exit(0)
-    else:
-        print("Dataset seems empty/corrupted. Re-downloading...")
-        shutil.rmtree(TARGET_DIR, ignore_errors=True)
-
-print(f"Downloading dataset to cache first...")
-# Download latest version to cache
-cache_path = kagglehub.dataset_download("faldoae/padangfood")
-print(f"Cached path: {cache_path}")
-
-# Identify the actual data folder
-# Usually cache_path/dataset_padang_food
-source_data_path = os.path.join(cache_path, "dataset_padang_food")
-if not os.path.exists(source_data_path):
-    print(f"Warning: Expected subfolder 'dataset_padang_food' not found. Using root cache path.")
-    source_data_path = cache_path
-
-print(f"Source data path: {source_data_path}")
-print(f"Target local path: {TARGET_DIR}")
-
-# Copy
-print("Copying files... (This may take a moment)")
-try:
-    if os.path.exists(TARGET_DIR):
-        shutil.rmtree(TARGET_DIR)
-    shutil.copytree(source_data_path, TARGET_DIR)
-    print("✅ Copy complete!")
-except Exception as e:
-    print(f"Error copying files: {e}")
-    # Fallback: Try system copy command if python fails (permissions)
-    print("Trying system fallback copy...")
-    os.makedirs(TARGET_DIR, exist_ok=True)
-    import subprocess
-    subprocess.run(f'xcopy /E /I /Y "{source_data_path}" "{TARGET_DIR}"', shell=True)
-
-print(f"\nLocation: {TARGET_DIR}")
 
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""
+Padang Food Recognition - Embedding Index for Similar-Dish Lookup
+Re-uses the classifier's pooled features (the GlobalAveragePooling2D output
+in create_model) as image embeddings, so "similar dishes" and kNN sanity
+checks need no second model.
+
+- Embeddings are extracted in batches, L2-normalized and streamed into a
+  memory-mapped float16 matrix (model/embedding_index/embeddings.npy) with
+  an id/label sidecar (index.json, labels.npy)
+- Exact search is a blocked matrix product with argpartition top-k, so the
+  matrix is never fully loaded as float32
+- --ivf adds an inverted-file index with product-quantized residual codes
+  for large collections: only --nprobe lists are scanned with PQ lookup
+  tables, and the best candidates are re-ranked with the float16 vectors
+- `check` runs leave-one-out kNN over the index and lists images whose
+  neighbours disagree with their label (likely mislabels or duplicates)
+
+Usage:
+    python embedding_index.py build [--model ...] [--dataset ./dataset/train] [--rescale 0.00392156862745098]
+                                    [--ivf] [--nlist N] [--pq-subvectors 16]
+    python embedding_index.py query IMAGE [IMAGE ...] [--k 5] [--exact]
+    python embedding_index.py check [--k 5]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+import dataset_manifest
+
+DEFAULT_MODEL_PATH = "./model/padang_food_model_optimized.keras"
+DEFAULT_DATASET_PATH = "./dataset/train"
+DEFAULT_INDEX_DIR = "./model/embedding_index"
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+BATCH_SIZE = 64
+SEARCH_BLOCK = 65536   # rows per exact-search block (~160 MB float16 at 1280 dims)
+PQ_SUBVECTORS = 16     # bytes per vector in the PQ codes
+PQ_CENTROIDS = 256     # one uint8 code per subvector
+NPROBE = 8
+RERANK_FACTOR = 10     # PQ candidates re-scored exactly per requested neighbour
+KMEANS_ITERATIONS = 20
+KMEANS_SAMPLE = 50000
+
+
+def l2_normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+class Embedder:
+    """The pooled-feature half of a create_model() network."""
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, rescale=None):
+        from tensorflow.keras.models import load_model
+
+        import feature_cache
+
+        self.model_path = model_path
+        self.rescale = rescale
+        self.extractor, _ = feature_cache.split_at_pooling(load_model(model_path))
+        self.image_size = tuple(self.extractor.input_shape[1:3])
+        self.dim = int(self.extractor.output_shape[-1])
+
+    def embed(self, images):
+        """(N, H, W, 3) 0-255 images -> (N, dim) L2-normalized float32 embeddings."""
+        images = np.asarray(images, dtype=np.float32)
+        if self.rescale:
+            images = images * self.rescale
+        return l2_normalize(self.extractor(images, training=False).numpy())
+
+    def embed_files(self, paths):
+        import data_pipeline
+
+        images = np.stack([data_pipeline.decode_image(p, self.image_size).numpy() for p in paths])
+        return self.embed(images)
+
+
+def kmeans(x, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd k-means; returns (k, dim) float32 centroids."""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_centroid(x, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, x)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters with random points
+        if not filled.all():
+            centroids[~filled] = x[rng.choice(len(x), int((~filled).sum()), replace=False)]
+    return centroids
+
+
+def nearest_centroid(x, centroids, block=8192):
+    """Index of the closest centroid (squared L2) for every row of x."""
+    c_norms = (centroids ** 2).sum(axis=1)
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), block):
+        part = np.asarray(x[start:start + block], dtype=np.float32)
+        out[start:start + len(part)] = np.argmin(c_norms[None, :] - 2 * part @ centroids.T, axis=1)
+    return out
+
+
+def _top_k(scores, k):
+    """(indices, scores) of the k best scores per row, best first."""
+    k = min(k, scores.shape[1])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def build_ivf_pq(embeddings, index_dir, nlist=None, subvectors=PQ_SUBVECTORS, seed=0):
+    """Train the coarse quantizer and residual PQ codebooks, encode every row."""
+    n, dim = embeddings.shape
+    if dim % subvectors:
+        raise ValueError(f"--pq-subvectors must divide the embedding size {dim}")
+    nlist = nlist or max(1, int(4 * np.sqrt(n)))
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(n, min(n, KMEANS_SAMPLE), replace=False))
+    train = np.asarray(embeddings[sample], dtype=np.float32)
+
+    centroids = kmeans(train, nlist, seed=seed)
+    assignment = nearest_centroid(embeddings, centroids)
+    residuals = train - centroids[nearest_centroid(train, centroids)]
+    sub = dim // subvectors
+    codebooks = np.stack([
+        kmeans(residuals[:, m * sub:(m + 1) * sub], PQ_CENTROIDS, seed=seed + m)
+        for m in range(subvectors)
+    ])
+
+    codes = np.empty((n, subvectors), dtype=np.uint8)
+    for start in range(0, n, SEARCH_BLOCK):
+        rows = slice(start, min(n, start + SEARCH_BLOCK))
+        block = np.asarray(embeddings[rows], dtype=np.float32) - centroids[assignment[rows]]
+        for m in range(subvectors):
+            codes[rows, m] = nearest_centroid(block[:, m * sub:(m + 1) * sub], codebooks[m])
+
+    order = np.argsort(assignment, kind='stable')
+    offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+    np.save(os.path.join(index_dir, "ivf_centroids.npy"), centroids)
+    np.save(os.path.join(index_dir, "ivf_rows.npy"), order)
+    np.save(os.path.join(index_dir, "ivf_offsets.npy"), offsets)
+    np.save(os.path.join(index_dir, "pq_codebooks.npy"), codebooks.astype(np.float32))
+    np.save(os.path.join(index_dir, "pq_codes.npy"), codes)
+    return {'nlist': len(centroids), 'subvectors': subvectors, 'centroids': PQ_CENTROIDS}
+
+
+def build_index(model_path=DEFAULT_MODEL_PATH, dataset_path=DEFAULT_DATASET_PATH, index_dir=DEFAULT_INDEX_DIR,
+                rescale=None, batch_size=BATCH_SIZE, ivf=False, nlist=None, subvectors=PQ_SUBVECTORS):
+    """Embed every readable image of the dataset and write the index directory."""
+    import data_pipeline
+
+    start = time.perf_counter()
+    embedder = Embedder(model_path, rescale)
+    class_indices, subsets = data_pipeline.list_image_files(dataset_path, validation_split=0.0)
+    paths, labels = subsets['training']
+    if not paths:
+        raise ValueError(f"No images found in {dataset_path}")
+    print(f"Embedding {len(paths)} images at {embedder.image_size[0]}x{embedder.image_size[1]} "
+          f"({embedder.dim} dims) -> {index_dir}")
+
+    tmp_dir = f"{os.path.normpath(index_dir)}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    embeddings = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, "embeddings.npy"), mode='w+', dtype=np.float16,
+        shape=(len(paths), embedder.dim)
+    )
+    ds = data_pipeline.build_dataset(paths, labels, len(class_indices), embedder.image_size,
+                                     batch_size, cache=False)
+    row = 0
+    for images, _ in ds:
+        vectors = embedder.embed(images.numpy())
+        embeddings[row:row + len(vectors)] = vectors
+        row += len(vectors)
+    embeddings.flush()
+    np.save(os.path.join(tmp_dir, "labels.npy"), np.asarray(labels, dtype=np.int32))
+
+    ivf_info = None
+    if ivf:
+        ivf_info = build_ivf_pq(embeddings, tmp_dir, nlist, subvectors)
+        print(f"   IVF: {ivf_info['nlist']} lists, PQ {subvectors} x {PQ_CENTROIDS} codes "
+              f"({subvectors} bytes/vector)")
+    del embeddings
+
+    index = {
+        'version': INDEX_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model': os.path.abspath(model_path),
+        'modelDigest': dataset_manifest.file_digest(model_path),
+        'dataset': os.path.abspath(dataset_path),
+        'imageSize': list(embedder.image_size),
+        'rescale': rescale,
+        'dim': embedder.dim,
+        'count': len(paths),
+        'classes': sorted(class_indices, key=class_indices.get),
+        'ids': [os.path.relpath(p, dataset_path).replace(os.sep, '/') for p in paths],
+        'ivf': ivf_info,
+    }
+    with open(os.path.join(tmp_dir, INDEX_FILE), 'w') as f:
+        json.dump(index, f)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+    print(f"Wrote {len(paths)} embeddings ({os.path.getsize(os.path.join(index_dir, 'embeddings.npy')) / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return index
+
+
+class EmbeddingIndex:
+    """Read-only, memory-mapped view of an index directory."""
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        with open(os.path.join(index_dir, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        if self.index.get('version') != INDEX_VERSION:
+            raise ValueError(f"{index_dir} was written by another version; rebuild it")
+        self.index_dir = index_dir
+        self.ids = self.index['ids']
+        self.classes = self.index['classes']
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode='r')
+        self.labels = np.load(os.path.join(index_dir, "labels.npy"), mmap_mode='r')
+        self.ivf = None
+        if self.index.get('ivf'):
+            self.ivf = {name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode='r')
+                        for name in ('ivf_centroids', 'ivf_rows', 'ivf_offsets', 'pq_codebooks', 'pq_codes')}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def embedder(self):
+        """An Embedder configured like the one that built the index."""
+        model_path = self.index['model']
+        if os.path.exists(model_path) and dataset_manifest.file_digest(model_path) != self.index['modelDigest']:
+            print(f"   Warning: {model_path} changed since the index was built; rebuild it for meaningful results")
+        return Embedder(model_path, self.index['rescale'])
+
+    def search_exact(self, queries, k, block=SEARCH_BLOCK):
+        """Brute-force cosine top-k over the whole matrix, one block at a time."""
+        queries = l2_normalize(queries)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self), block):
+            scores = queries @ np.asarray(self.embeddings[start:start + block], dtype=np.float32).T
+            rows, scores = _top_k(scores, k)
+            merged_rows = np.concatenate([best_rows, rows + start], axis=1)
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            order, best_scores = _top_k(merged_scores, k)
+            best_rows = np.take_along_axis(merged_rows, order, axis=1)
+        return best_rows, best_scores
+
+    def search_ivf(self, queries, k, nprobe=NPROBE):
+        """Approximate top-k: PQ scores over the nprobe closest lists, exact re-rank of the best."""
+        queries = l2_normalize(queries)
+        centroids, codebooks, codes = self.ivf['ivf_centroids'], self.ivf['pq_codebooks'], self.ivf['pq_codes']
+        rows_by_list, offsets = self.ivf['ivf_rows'], self.ivf['ivf_offsets']
+        subvectors, _, sub = codebooks.shape
+        coarse = queries @ centroids.T
+        probes = np.argsort(-coarse, axis=1)[:, :nprobe]
+
+        all_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for qi, query in enumerate(queries):
+            lists = probes[qi]
+            candidates = np.concatenate([rows_by_list[offsets[c]:offsets[c + 1]] for c in lists])
+            if not len(candidates):
+                continue
+            # q.x ~= q.centroid + sum_m q_m . codebook[m, code_m]
+            tables = np.einsum('md,mjd->mj', query.reshape(subvectors, sub), codebooks)
+            list_of = np.repeat(lists, [offsets[c + 1] - offsets[c] for c in lists])
+            approx = coarse[qi, list_of] + tables[np.arange(subvectors), codes[candidates]].sum(axis=1)
+            keep = min(len(candidates), k * RERANK_FACTOR)
+            shortlist = np.sort(candidates[np.argpartition(-approx, keep - 1)[:keep]])
+            exact = np.asarray(self.embeddings[shortlist], dtype=np.float32) @ query
+            order = np.argsort(-exact)[:k]
+            all_rows[qi, :len(order)] = shortlist[order]
+            all_scores[qi, :len(order)] = exact[order]
+        return all_rows, all_scores
+
+    def search(self, queries, k=5, exact=False, nprobe=NPROBE):
+        """(rows, cosine similarities) of the k nearest images per query, best first."""
+        if self.ivf is not None and not exact:
+            return self.search_ivf(queries, k, nprobe)
+        return self.search_exact(queries, k)
+
+    def describe(self, rows, scores):
+        """Search results as lists of {id, class, score} dicts."""
+        return [[{'id': self.ids[r], 'class': self.classes[self.labels[r]], 'score': float(s)}
+                 for r, s in zip(row, score) if r >= 0]
+                for row, score in zip(rows, scores)]
+
+
+def knn_check(index, k=5, batch=1024):
+    """Leave-one-out kNN label agreement; returns (accuracy, suspicious rows)."""
+    correct, suspicious = 0, []
+    for start in range(0, len(index), batch):
+        queries = np.asarray(index.embeddings[start:start + batch], dtype=np.float32)
+        rows, scores = index.search_exact(queries, k + 1)
+        for offset, (neighbours, sims) in enumerate(zip(rows, scores)):
+            row = start + offset
+            keep = neighbours != row
+            neighbours, sims = neighbours[keep][:k], sims[keep][:k]
+            votes = np.bincount(index.labels[neighbours], weights=sims, minlength=len(index.classes))
+            if votes.argmax() == index.labels[row]:
+                correct += 1
+            else:
+                suspicious.append((row, int(votes.argmax()), float(sims[0])))
+    return correct / max(len(index), 1), suspicious
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the similar-dish embedding index")
+    parser.add_argument('--index', default=DEFAULT_INDEX_DIR, help="Index directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="Embed the dataset and write the index")
+    build.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    build.add_argument('--dataset', default=DEFAULT_DATASET_PATH)
+    build.add_argument('--rescale', type=float,
+                       help="Input scale the model was trained with (1/255 for train_model.py's MobileNetV2)")
+    build.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    build.add_argument('--ivf', action='store_true', help="Also build the IVF/PQ index for large collections")
+    build.add_argument('--nlist', type=int, help="IVF lists (default: 4 * sqrt(images))")
+    build.add_argument('--pq-subvectors', type=int, default=PQ_SUBVECTORS)
+
+    query = commands.add_parser('query', help="Most similar dataset images for new photos")
+    query.add_argument('images', nargs='+')
+    query.add_argument('--k', type=int, default=5)
+    query.add_argument('--exact', action='store_true', help="Brute-force search even if an IVF index exists")
+    query.add_argument('--nprobe', type=int, default=NPROBE)
+
+    check = commands.add_parser('check', help="Leave-one-out kNN label agreement over the index")
+    check.add_argument('--k', type=int, default=5)
+    check.add_argument('--show', type=int, default=20, help="Suspicious images to list")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        if not os.path.exists(args.model):
+            print(f"Error: model not found at {args.model}")
+            return 1
+        if not os.path.isdir(args.dataset):
+            print(f"Error: dataset not found at {args.dataset}")
+            return 1
+        build_index(args.model, args.dataset, args.index, args.rescale, args.batch_size,
+                    args.ivf, args.nlist, args.pq_subvectors)
+        return 0
+
+    if not os.path.exists(os.path.join(args.index, INDEX_FILE)):
+        print(f"Error: no index at {args.index} (run: python embedding_index.py build)")
+        return 1
+    index = EmbeddingIndex(args.index)
+
+    if args.command == 'query':
+        missing = [p for p in args.images if not os.path.isfile(p)]
+        if missing:
+            print(f"Error: not found: {', '.join(missing)}")
+            return 1
+        queries = index.embedder().embed_files(args.images)
+        start = time.perf_counter()
+        rows, scores = index.search(queries, args.k, args.exact, args.nprobe)
+        elapsed = (time.perf_counter() - start) * 1000
+        for path, matches in zip(args.images, index.describe(rows, scores)):
+            print(f"\n{path}")
+            for match in matches:
+                print(f"   {match['score']:.3f}  {match['class']:<20} {match['id']}")
+        mode = 'exact' if index.ivf is None or args.exact else f"IVF/PQ, nprobe {args.nprobe}"
+        print(f"\nSearched {len(index)} embeddings ({mode}) in {elapsed:.1f} ms")
+        return 0
+
+    accuracy, suspicious = knn_check(index, args.k)
+    print(f"Leave-one-out {args.k}-NN accuracy: {accuracy:.2%} over {len(index)} images")
+    for row, predicted, similarity in suspicious[:args.show]:
+        print(f"   {index.ids[row]}: neighbours say {index.classes[predicted]} (nearest {similarity:.3f})")
+    if len(suspicious) > args.show:
+        print(f"   ... {len(suspicious) - args.show} more")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Padang Food Recognition - Incremental Export Cache
+Lets the conversion scripts skip export stages whose outputs are already up
+to date, and publish every output atomically.
+
+- A stage's key is a hash of its input fingerprints (content hash of the
+  .keras file, dataset file listing and split, upstream stage keys) and its
+  configuration (quantization, shard size, flags)
+- model/export_cache.json records the key and an output signature (relative
+  paths, sizes, mtimes) of every finished stage; a stage is skipped when the
+  key matches and its outputs are still there unmodified (metadata.json is
+  not tracked, so editing it never triggers a rebuild)
+- Directories are built in a temporary sibling and swapped in with renames,
+  files are written to a temp name and os.replace()d, so a half-written
+  public/model or SavedModel is never served
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import dataset_manifest
+import dataset_split
+import tfjs_weights
+
+CACHE_PATH = "./model/export_cache.json"
+CACHE_VERSION = 1
+# Files inside output directories that other tools edit (class names, model
+# format); changing them never invalidates a stage
+UNTRACKED_FILES = {'metadata.json'}
+
+
+class StageFailed(Exception):
+    """Raised inside a stage to discard its staged output without recording it."""
+
+
+def stage_key(stage, inputs, config=None):
+    """Hash of a stage's name, input fingerprints and configuration."""
+    payload = {'version': CACHE_VERSION, 'stage': stage, 'inputs': inputs, 'config': config or {}}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def model_fingerprint(path):
+    """Content hash of a model file."""
+    return dataset_manifest.file_digest(path)
+
+
+def dataset_fingerprint(dataset_path):
+    """Hash of the dataset files' sizes/mtimes and the split index, or None without a dataset."""
+    if not dataset_path or not os.path.isdir(dataset_path):
+        return None
+    h = hashlib.sha256()
+    for rel, st in sorted(output_signature(dataset_path).items()):
+        h.update(f"{rel}\0{st}\n".encode())
+    h.update(str(dataset_split.split_digest(dataset_path)).encode())
+    return h.hexdigest()
+
+
+def output_signature(path):
+    """{relative path: [size, mtime_ns]} of a file or directory tree ({} if missing).
+
+    UNTRACKED_FILES at the top of a directory are left out.
+    """
+    if os.path.isfile(path):
+        st = os.stat(path)
+        return {'.': [st.st_size, st.st_mtime_ns]}
+    signature = {}
+    for root, _, files in os.walk(path):
+        for name in files:
+            if root == path and name in UNTRACKED_FILES:
+                continue
+            full = os.path.join(root, name)
+            st = os.stat(full)
+            signature[os.path.relpath(full, path).replace(os.sep, '/')] = [st.st_size, st.st_mtime_ns]
+    return signature
+
+
+class ExportCache:
+    """Stage records persisted in model/export_cache.json."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.stages = {}
+        self.built = []
+        self.failed = []
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self.stages = data['stages']
+
+    def up_to_date(self, stage, key, outputs):
+        record = self.stages.get(stage)
+        return bool(record and record['key'] == key and all(
+            os.path.exists(path) and record['outputs'].get(path) == output_signature(path) for path in outputs
+        ))
+
+    def record(self, stage, key, outputs):
+        self.stages[stage] = {
+            'key': key,
+            'outputs': {path: output_signature(path) for path in outputs},
+            'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'stages': self.stages}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def run(self, stage, key, outputs, build):
+        """Run `build()` unless the stage is up to date; True if its outputs are current afterwards.
+
+        `build` raising StageFailed leaves the previous outputs and record untouched.
+        """
+        if self.up_to_date(stage, key, outputs):
+            print(f"   [cached] {stage} is up to date")
+            return True
+        try:
+            build()
+        except StageFailed as e:
+            print(f"   [WARNING] {stage} failed, previous output kept: {e}")
+            self.failed.append(stage)
+            return False
+        self.record(stage, key, outputs)
+        self.built.append(stage)
+        return True
+
+
+@contextmanager
+def staged_dir(target, carry=None):
+    """Build `target` in a temporary sibling directory, then swap it in.
+
+    carry(name) -> True copies that existing top-level file of `target` into
+    the staging directory first (e.g. metadata.json). Content-hashed weight
+    shards are hard-linked instead: they are only ever replaced, never
+    modified in place, so the writer can still reuse unchanged ones.
+    On an exception the staging directory is removed and `target` is untouched.
+    """
+    target = os.path.normpath(target)
+    staging = f"{target}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        if carry and os.path.isdir(target):
+            for name in os.listdir(target):
+                src = os.path.join(target, name)
+                if not os.path.isfile(src) or not carry(name):
+                    continue
+                dst = os.path.join(staging, name)
+                if tfjs_weights.HASHED_SHARD_RE.match(name):
+                    try:
+                        os.link(src, dst)
+                        continue
+                    except OSError:
+                        pass
+                shutil.copy2(src, dst)
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Two renames: readers see the old tree, the new one or (for an instant) none, never a partial one
+    previous = f"{target}.{os.getpid()}.old"
+    if os.path.exists(target):
+        os.replace(target, previous)
+    os.replace(staging, target)
+    shutil.rmtree(previous, ignore_errors=True)
+
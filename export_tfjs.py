@@ -1,114 +1,180 @@
 """
 Manual TensorFlow.js Model Export
 Creates model.json and weight binary files compatible with TensorFlow.js
+Unchanged stages are skipped and public/model is swapped in atomically (export_cache.py)
+
+Usage:
+    python export_tfjs.py [--model ./model/padang_food_model.keras]
+                          [--quantize float32|float16|uint8|int8] [--dataset ./dataset/train]
+                          [--shard-size-mb 4] [--tflite none|float32|float16|int8] [--force]
 """
 
-import tensorflow as tf
+import argparse
 import json
 import os
 import struct
-import numpy as np
+import sys
+
+import export_cache
+import quantization
+import tflite_export
+import tfjs_weights
 
 MODEL_PATH = "./model/padang_food_model.keras"
 OUTPUT_PATH = "./public/model"
+REPORT_PATH = "./model/quantization_report"
+DATASET_PATH = quantization.DEFAULT_DATASET_PATH
+INPUT_SCALE = 1./255  # MobileNetV2 model from train_model.py is trained on [0, 1] inputs
+
+def export_to_tfjs(quantize='float32', dataset_path=DATASET_PATH,
+                   shard_bytes=tfjs_weights.DEFAULT_SHARD_BYTES, tflite='float32', model_path=MODEL_PATH,
+                   force=False):
+    import tensorflow as tf
 
-def export_to_tfjs():
     print("=" * 60)
     print("Manual TensorFlow.js Export")
     print("=" * 60)
+    weights_mode = quantization.tfjs_mode(quantize)
     
-    # Load model
-    print("\n[1/5] Loading Keras model...")
-    model = tf.keras.models.load_model(MODEL_PATH)
-    
-    # Create output directory
-    os.makedirs(OUTPUT_PATH, exist_ok=True)
-    
-    # Get model config
-    print("\n[2/5] Extracting model configuration...")
-    model_config = model.get_config()
-    
-    # Collect weights info
-    print("\n[3/5] Processing weights...")
-    weights_manifest = []
-    weight_specs = []
-    all_weights = []
-    
-    total_bytes = 0
-    for layer in model.layers:
-        layer_weights = layer.get_weights()
-        if not layer_weights:
-            continue
-            
-        for i, w in enumerate(layer_weights):
-            weight_name = f"{layer.name}/{['kernel', 'bias', 'gamma', 'beta', 'moving_mean', 'moving_variance'][i % 6]}"
-            
-            # Convert to float32
-            w_float32 = w.astype(np.float32)
-            
-            weight_specs.append({
-                "name": weight_name,
-                "shape": list(w.shape),
-                "dtype": "float32"
-            })
-            
-            all_weights.append(w_float32)
-            total_bytes += w_float32.nbytes
-    
-    print(f"   Total weights: {len(weight_specs)}")
-    print(f"   Total size: {total_bytes / 1024 / 1024:.2f} MB")
-    
-    # Save weights to binary file
-    print("\n[4/5] Saving weight binaries...")
-    weights_path = os.path.join(OUTPUT_PATH, "group1-shard1of1.bin")
-    
-    with open(weights_path, 'wb') as f:
-        for w in all_weights:
-            f.write(w.tobytes())
-    
-    print(f"   Saved: {weights_path}")
-    
-    # Create model.json
-    print("\n[5/5] Creating model.json...")
-    
-    # Build the model topology for TensorFlow.js
-    model_json = {
-        "format": "layers-model",
-        "generatedBy": "manual-export-1.0",
-        "convertedBy": "padang-recognition-trainer",
-        "modelTopology": {
-            "keras_version": "3.0",
-            "backend": "tensorflow",
-            "model_config": {
-                "class_name": "Functional",
-                "config": {
-                    "name": "padang_food_model",
-                    "trainable": True,
-                    "input_layers": [["input_layer", 0, 0]],
-                    "output_layers": [["dense_2", 0, 0]]
-                }
-            }
-        },
-        "weightsManifest": [{
-            "paths": ["group1-shard1of1.bin"],
-            "weights": weight_specs
-        }]
-    }
-    
+    # Every stage below is skipped when its inputs and settings are unchanged
+    cache = export_cache.ExportCache()
+    if force:
+        cache.stages = {}
+    model_digest = export_cache.model_fingerprint(model_path)
+    data_digest = export_cache.dataset_fingerprint(dataset_path)
+    model = None
+
+    def get_model():
+        nonlocal model
+        if model is None:
+            print("\n   Loading Keras model...")
+            import training_modes
+            model = training_modes.float32_copy(tf.keras.models.load_model(model_path))
+        return model
+
     model_json_path = os.path.join(OUTPUT_PATH, "model.json")
-    with open(model_json_path, 'w') as f:
-        json.dump(model_json, f, indent=2)
+    tfjs_key = export_cache.stage_key('tfjs-layers-manual', {'model': model_digest},
+                                      {'weights': weights_mode, 'shardBytes': shard_bytes})
+    write_stats = {}
+
+    def write_tfjs():
+        model = get_model()
+
+        # Get model config
+        print("\n[1/5] Extracting model configuration...")
+        model_config = model.get_config()
+
+        # Staging copy of the output directory: old shards hard-linked in for reuse, metadata.json carried over
+        with export_cache.staged_dir(OUTPUT_PATH, carry=lambda n: n != 'model.json') as staging:
+            # Collect weights info, streaming each array straight into the shards
+            print("\n[2/5] Processing weights...")
+            weight_specs = []
+            writer = tfjs_weights.ShardedWeightWriter(staging, shard_bytes)
+
+            for layer in model.layers:
+                layer_weights = layer.get_weights()
+                if not layer_weights:
+                    continue
+
+                for i, w in enumerate(layer_weights):
+                    weight_name = f"{layer.name}/{['kernel', 'bias', 'gamma', 'beta', 'moving_mean', 'moving_variance'][i % 6]}"
+
+                    # Convert to float32, then encode for the requested quantization
+                    w_data, w_quantization = quantization.quantize_weight(w, weights_mode)
+
+                    weight_spec = {
+                        "name": weight_name,
+                        "shape": list(w.shape),
+                        "dtype": "float32"
+                    }
+                    if w_quantization:
+                        weight_spec["quantization"] = w_quantization
+                    weight_specs.append(weight_spec)
+                    writer.write(w_data)
+
+            total_bytes = writer.total_bytes
+            write_stats['total_bytes'] = total_bytes
+            print(f"   Total weights: {len(weight_specs)}")
+            print(f"   Total size: {total_bytes / 1024 / 1024:.2f} MB ({weights_mode})")
+
+            # Finish the last shard and drop shards from previous exports
+            print("\n[3/5] Finalizing weight shards...")
+            shard_paths = writer.close()
+            stale = tfjs_weights.remove_stale_shards(staging, shard_paths)
+            print(f"   Shards: {len(shard_paths)} x <= {shard_bytes / 1024 / 1024:.1f} MB "
+                  f"({writer.reused} unchanged, {len(stale)} stale removed)")
+
+            # Create model.json
+            print("\n[4/5] Creating model.json...")
+
+            # Build the model topology for TensorFlow.js
+            model_json = {
+                "format": "layers-model",
+                "generatedBy": "manual-export-1.0",
+                "convertedBy": "padang-recognition-trainer",
+                "modelTopology": {
+                    "keras_version": "3.0",
+                    "backend": "tensorflow",
+                    "model_config": {
+                        "class_name": "Functional",
+                        "config": {
+                            "name": "padang_food_model",
+                            "trainable": True,
+                            "input_layers": [["input_layer", 0, 0]],
+                            "output_layers": [["dense_2", 0, 0]]
+                        }
+                    }
+                },
+                "weightsManifest": [{
+                    "paths": shard_paths,
+                    "weights": weight_specs
+                }]
+            }
+
+            with open(os.path.join(staging, "model.json"), 'w') as f:
+                json.dump(model_json, f, indent=2)
+
+        print(f"   Saved: {model_json_path}")
+
+    cache.run(f"tfjs {OUTPUT_PATH}", tfjs_key, [OUTPUT_PATH], write_tfjs)
     
-    print(f"   Saved: {model_json_path}")
+    print("\n[5/5] Writing quantization report and TFLite model...")
+    quantization.export_report_and_tflite(
+        cache, get_model, model_digest, data_digest, tfjs_key, quantize, tflite,
+        model_path, OUTPUT_PATH, REPORT_PATH, dataset_path,
+        rescale=INPUT_SCALE, weights_nbytes=write_stats.get('total_bytes')
+    )
     
+    with open(model_json_path) as f:
+        shard_paths = json.load(f)['weightsManifest'][0]['paths']
     print("\n" + "=" * 60)
-    print("Export complete!")
+    print("Export complete!" if cache.built else "Export complete! (all stages up to date)")
     print("=" * 60)
     print(f"\nFiles created:")
     print(f"   - {model_json_path}")
-    print(f"   - {weights_path}")
+    for shard_path in shard_paths:
+        print(f"   - {os.path.join(OUTPUT_PATH, shard_path)}")
     
     return True
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manual TensorFlow.js export")
+    parser.add_argument('--model', default=MODEL_PATH,
+                        help="Keras model to export (e.g. a prune_model.py output)")
+    parser.add_argument('--quantize', choices=quantization.QUANTIZATION_MODES, default='float32',
+                        help="Weight encoding (int8 = uint8 TF.js weights + calibrated int8 TFLite)")
+    parser.add_argument('--dataset', default=DATASET_PATH, help="Dataset for calibration and the accuracy report")
+    parser.add_argument('--shard-size-mb', type=float, default=tfjs_weights.DEFAULT_SHARD_BYTES / 1024 / 1024,
+                        help="Maximum size of each weight shard")
+    parser.add_argument('--tflite', choices=tflite_export.TFLITE_MODES, default='float32',
+                        help="Also write a TFLite model next to the Keras model ('none' to skip)")
+    parser.add_argument('--force', action='store_true',
+                        help="Rebuild every stage even if model/export_cache.json says it is up to date")
+    args = parser.parse_args(argv)
+    success = export_to_tfjs(args.quantize, args.dataset, int(args.shard_size_mb * 1024 * 1024), args.tflite,
+                             args.model, args.force)
+    return 0 if success else 1
+
+
 if __name__ == '__main__':
-    export_to_tfjs()
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Padang Food Recognition - Cached Backbone Features
+Phase 1 trains only the classification head on top of a frozen backbone, so
+the backbone output never changes. This module runs the frozen backbone once,
+stores the pooled features on disk and trains the head on those vectors.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras.layers import GlobalAveragePooling2D
+
+import data_pipeline
+import dataset_cache
+import dataset_split
+
+DEFAULT_CACHE_ROOT = "./model/feature_cache"
+
+
+def split_at_pooling(model):
+    """Split a create_model() network at its GlobalAveragePooling2D layer.
+
+    Returns (extractor, head). The head re-uses the model's own layer objects,
+    so training the head trains the full model's classification layers.
+    """
+    layers = model.layers
+    pool_idx = max(i for i, layer in enumerate(layers) if isinstance(layer, GlobalAveragePooling2D))
+    pool = layers[pool_idx]
+
+    extractor = keras.Model(model.input, pool.output, name='feature_extractor')
+
+    features = keras.Input(shape=pool.output.shape[1:], name='pooled_features')
+    x = features
+    for layer in layers[pool_idx + 1:]:
+        x = layer(x)
+    head = keras.Model(features, x, name='classification_head')
+    return extractor, head
+
+
+def weights_digest(model):
+    """Content hash of a model's weights."""
+    h = hashlib.sha256()
+    for w in model.get_weights():
+        h.update(str(w.shape).encode())
+        h.update(np.ascontiguousarray(w).tobytes())
+    return h.hexdigest()
+
+
+def extract_features(extractor, ds, passes=1):
+    """Run `extractor` over `ds` `passes` times, returning (features, one-hot labels).
+
+    Features are float32 whatever the compute policy: np.save cannot
+    round-trip bfloat16 (it loads back as an opaque void dtype).
+    """
+    features, labels = [], []
+    for _ in range(passes):
+        for x, y in ds:
+            features.append(extractor(x, training=False).numpy().astype(np.float32))
+            labels.append(y.numpy())
+    return np.concatenate(features), np.concatenate(labels)
+
+
+def feature_dataset(features, labels, batch_size, training=False):
+    ds = tf.data.Dataset.from_tensor_slices((features, labels))
+    if training:
+        ds = ds.shuffle(len(features), reshuffle_each_iteration=True)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def prepare_head_training(model, dataset_path, image_size, batch_size, rescale=None,
+                          cache_root=DEFAULT_CACHE_ROOT, augmented_copies=0,
+                          materialized_root=None):
+    """Cache backbone features and return (head, train_ds, val_ds) for Phase 1.
+
+    The training features are one clean pass plus `augmented_copies` passes
+    through the augmentation pipeline. The cache key covers the backbone
+    weights, dataset contents, image size, rescale, compute precision and
+    number of copies.
+    """
+    extractor, head = split_at_pooling(model)
+
+    class_indices, subsets = data_pipeline.list_image_files(dataset_path, validation_split=0.0)
+    paths, labels = subsets['training']
+    key = hashlib.sha256(json.dumps({
+        'backbone': weights_digest(extractor),
+        'dataset': dataset_cache.dataset_fingerprint(dataset_path, paths, labels, image_size),
+        'validationSplit': data_pipeline.VALIDATION_SPLIT,
+        'split': dataset_split.split_digest(dataset_path),
+        'rescale': rescale,
+        'precision': keras.mixed_precision.global_policy().name,
+        'augmentedCopies': augmented_copies
+    }, sort_keys=True).encode()).hexdigest()[:16]
+    cache_dir = os.path.join(cache_root, key)
+
+    files = {name: os.path.join(cache_dir, f"{name}.npy")
+             for name in ('train_features', 'train_labels', 'val_features', 'val_labels')}
+
+    if all(os.path.exists(f) for f in files.values()):
+        print(f"Using cached backbone features: {cache_dir}")
+        arrays = {name: np.load(f) for name, f in files.items()}
+    else:
+        print(f"Extracting backbone features once -> {cache_dir}")
+        clean_train, val = data_pipeline.prepare_datasets(
+            dataset_path, image_size, batch_size, rescale=rescale, cache=False,
+            materialized_root=materialized_root, augment=False
+        )
+        train_x, train_y = extract_features(extractor, clean_train)
+        if augmented_copies:
+            augmented_train, _ = data_pipeline.prepare_datasets(
+                dataset_path, image_size, batch_size, rescale=rescale, cache=False,
+                materialized_root=materialized_root
+            )
+            aug_x, aug_y = extract_features(extractor, augmented_train, passes=augmented_copies)
+            train_x, train_y = np.concatenate([train_x, aug_x]), np.concatenate([train_y, aug_y])
+        val_x, val_y = extract_features(extractor, val)
+
+        arrays = {'train_features': train_x, 'train_labels': train_y,
+                  'val_features': val_x, 'val_labels': val_y}
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, f in files.items():
+            np.save(f, arrays[name])
+
+    print(f"   Train features: {arrays['train_features'].shape}, Val features: {arrays['val_features'].shape}")
+    train_ds = feature_dataset(arrays['train_features'], arrays['train_labels'], batch_size, training=True)
+    val_ds = feature_dataset(arrays['val_features'], arrays['val_labels'], batch_size)
+    return head, train_ds, val_ds
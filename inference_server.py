@@ -0,0 +1,231 @@
+"""
+Padang Food Recognition - Warm Local Inference Server
+Keeps the Keras or TFLite model loaded and coalesces concurrent requests into
+micro-batches (bounded by --max-batch-size and --max-wait-ms).
+
+Endpoints:
+    POST /predict[?top_k=3]   raw image bytes in the body -> JSON predictions
+    GET  /metrics             latency percentiles, queue depth, batch stats
+    GET  /health              liveness check
+
+Usage:
+    python inference_server.py --port 8501 --max-batch-size 16 --max-wait-ms 5
+"""
+
+import argparse
+import io
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import predict_manual
+from predict_manual import CLASSES, CLASS_NAMES
+
+LATENCY_WINDOW = 1000  # requests kept for percentile metrics
+
+
+class MicroBatcher:
+    """Collects single-image requests into batches for one inference thread."""
+
+    def __init__(self, model, max_batch_size=16, max_wait_ms=5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.queue_waits_ms = deque(maxlen=LATENCY_WINDOW)
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self.max_queue_depth = 0
+        self.total_requests = 0
+        self.total_batches = 0
+        self.worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+
+    def start(self):
+        self.worker.start()
+
+    def submit(self, image):
+        """Queue one (H, W, 3) image; returns a Future with its probabilities."""
+        future = Future()
+        self.requests.put((image, future, time.perf_counter()))
+        with self.lock:
+            self.max_queue_depth = max(self.max_queue_depth, self.requests.qsize())
+        return future
+
+    def _bucket(self, n):
+        # Pad to a power of two so the model only ever sees a few batch shapes
+        size = 1
+        while size < n:
+            size *= 2
+        return min(size, self.max_batch_size)
+
+    def _run(self):
+        while True:
+            items = [self.requests.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(items) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            batch = np.stack([image for image, _, _ in items])
+            started = time.perf_counter()
+            try:
+                probabilities = predict_manual.predict_batch(self.model, batch, self._bucket(len(items)))
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            with self.lock:
+                self.total_batches += 1
+                self.total_requests += len(items)
+                self.batch_sizes.append(len(items))
+                for _, _, enqueued in items:
+                    self.queue_waits_ms.append((started - enqueued) * 1000)
+                    self.latencies_ms.append((finished - enqueued) * 1000)
+            for (_, future, _), probs in zip(items, probabilities):
+                future.set_result(probs)
+
+    def metrics(self):
+        with self.lock:
+            latencies = np.asarray(self.latencies_ms)
+            waits = np.asarray(self.queue_waits_ms)
+            batch_sizes = np.asarray(self.batch_sizes)
+            stats = {
+                'totalRequests': self.total_requests,
+                'totalBatches': self.total_batches,
+                'queueDepth': self.requests.qsize(),
+                'maxQueueDepth': self.max_queue_depth,
+                'maxBatchSize': self.max_batch_size,
+                'maxWaitMs': self.max_wait * 1000,
+                'meanBatchSize': float(batch_sizes.mean()) if len(batch_sizes) else 0.0,
+            }
+        for name, values in (('latencyMs', latencies), ('queueWaitMs', waits)):
+            if len(values):
+                p50, p95, p99 = np.percentile(values, [50, 95, 99])
+                stats[name] = {'p50': round(float(p50), 3), 'p95': round(float(p95), 3),
+                               'p99': round(float(p99), 3), 'mean': round(float(values.mean()), 3)}
+            else:
+                stats[name] = None
+        return stats
+
+
+def make_handler(batcher, image_size):
+    class InferenceHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            elif path == '/metrics':
+                self._send_json(200, batcher.metrics())
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != '/predict':
+                self._send_json(404, {'error': 'not found'})
+                return
+
+            start = time.perf_counter()
+            # Reject a bad top_k before the image is read or queued for inference
+            top_k = parse_qs(url.query).get('top_k', ['3'])[0]
+            if not top_k.isdigit() or int(top_k) < 1:
+                self._send_json(400, {'error': f'top_k must be a positive integer, got {top_k!r}'})
+                return
+            k = int(top_k)
+            length = int(self.headers.get('Content-Length') or 0)
+            if not length:
+                self._send_json(400, {'error': 'empty body, send the image bytes'})
+                return
+            try:
+                image = predict_manual.load_image(io.BytesIO(self.rfile.read(length)), image_size)
+            except Exception as e:
+                self._send_json(400, {'error': f'invalid request: {e}'})
+                return
+
+            try:
+                probabilities = batcher.submit(image).result()
+            except Exception as e:
+                self._send_json(500, {'error': f'inference failed: {e}'})
+                return
+
+            indices, scores = predict_manual.top_k(probabilities[np.newaxis], k)
+            self._send_json(200, {
+                'predictions': [
+                    {'class': CLASSES[i], 'name': CLASS_NAMES[CLASSES[i]], 'confidence': float(s)}
+                    for i, s in zip(indices[0], scores[0])
+                ],
+                'latencyMs': round((time.perf_counter() - start) * 1000, 3)
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return InferenceHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm local inference server with micro-batching")
+    parser.add_argument('--model', help="Model path (default: the Keras or TFLite model from predict_manual)")
+    parser.add_argument('--backend', choices=('keras', 'tflite'), default='keras')
+    parser.add_argument('--threads', type=int, help="Inference threads")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8501)
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="How long the first request in a batch waits for company")
+    args = parser.parse_args()
+
+    model_path = args.model or (predict_manual.TFLITE_MODEL_PATH if args.backend == 'tflite'
+                                else predict_manual.MODEL_PATH)
+    print(f"Loading {args.backend} model from {model_path}...")
+    model = predict_manual.load_predictor(model_path, args.backend, args.threads)
+    image_size = tuple(model.input_shape[1:3])
+
+    # Warm up every padded batch shape so no request pays for tracing
+    batcher = MicroBatcher(model, args.max_batch_size, args.max_wait_ms)
+    size = 1
+    while True:
+        predict_manual.predict_batch(model, np.zeros((1, *image_size, 3), np.float32), size)
+        if size >= args.max_batch_size:
+            break
+        size = min(size * 2, args.max_batch_size)
+    batcher.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(batcher, image_size))
+    print(f"Serving on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
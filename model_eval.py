@@ -0,0 +1,44 @@
+"""
+Padang Food Recognition - Post-Training Evaluation Helpers
+Validation accuracy, the short low-LR fine-tune and report cell formatting
+shared by prune_model.py, resolution_variants.py and quantization.py.
+TensorFlow is imported only when a model is fine-tuned.
+"""
+
+
+def fine_tune(model, train_ds, val_ds, epochs, learning_rate, freeze_batchnorm=False):
+    """Recover accuracy after surgery with a short low-LR run.
+
+    freeze_batchnorm keeps BatchNormalization statistics fixed (after
+    pruning); leave it off when they should adapt (a new input resolution).
+    """
+    import tensorflow as tf
+
+    if freeze_batchnorm:
+        for layer in model.layers:
+            if isinstance(layer, tf.keras.layers.BatchNormalization):
+                layer.trainable = False
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    model.fit(train_ds, validation_data=val_ds, epochs=epochs, verbose=2)
+    if freeze_batchnorm:
+        for layer in model.layers:
+            layer.trainable = True
+    return model
+
+
+def evaluate(model, val_ds):
+    """Validation accuracy rounded to 4 places, or None without validation data."""
+    if val_ds is None:
+        return None
+    model.compile(loss='categorical_crossentropy', metrics=['accuracy'])
+    _, accuracy = model.evaluate(val_ds, verbose=0)
+    return round(float(accuracy), 4)
+
+
+def fmt(value, pattern):
+    """Markdown report cell: 'N/A' for a missing value."""
+    return 'N/A' if value is None else pattern.format(value)
@@ -0,0 +1,270 @@
+"""
+Padang Food Recognition - Channel Surgery on Functional Keras Models
+Finds which convolution/dense output channels can be removed together and
+rebuilds a narrower copy of the model with the surviving weights.
+
+A "channel group" is one channel space: every tensor whose last axis must
+keep the same channels. It starts at the Conv2D/Dense layers producing it,
+runs through channel-wise layers (BatchNormalization, activations,
+DepthwiseConv2D, pooling, Dropout, SE Reshape/Multiply, residual Add) and
+ends at the Conv2D/Dense layers consuming it. Removing channel j of a group
+slices the producers' output axis, every channel-wise weight along the way
+and the consumers' input axis, so the network computes the same function on
+the remaining channels. Groups touching the model input or output, or any
+layer not understood here, are left alone.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+# Layers whose output keeps the channels of their input(s)
+CHANNEL_WISE = {
+    'BatchNormalization', 'Activation', 'ReLU', 'LeakyReLU', 'ELU', 'Softmax', 'Dropout', 'SpatialDropout2D',
+    'GaussianDropout', 'GaussianNoise', 'GlobalAveragePooling2D', 'GlobalMaxPooling2D', 'AveragePooling2D',
+    'MaxPooling2D', 'ZeroPadding2D', 'Reshape', 'DepthwiseConv2D', 'Add', 'Multiply', 'Maximum', 'Minimum',
+    'Average', 'Subtract',
+}
+# Layers whose kernel starts a new channel space: (input axis, output axis) of the kernel
+PRODUCERS = {'Conv2D': (2, 3), 'Dense': (0, 1)}
+
+
+def inbound_names(layer_config):
+    """Names of the layers feeding `layer_config` (first call node only).
+
+    Understands the Keras 3 config format (`__keras_tensor__` arguments) and
+    raises ValueError on anything else rather than reporting no inputs.
+    """
+    names = []
+
+    def walk(value):
+        if isinstance(value, dict):
+            history = value.get('config', {}).get('keras_history') if value.get('class_name') == '__keras_tensor__' else None
+            if history:
+                names.append(history[0])
+                return
+            for item in value.values():
+                walk(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                walk(item)
+
+    nodes = layer_config.get('inbound_nodes') or []
+    if nodes:
+        if isinstance(nodes[0], dict):
+            walk(nodes[0].get('args', ()))
+        if not names:
+            # e.g. the nested-list inbound_nodes of tf.keras 2.x: pruning without the graph would corrupt the model
+            raise ValueError(f"Unrecognized inbound_nodes format in layer {layer_config.get('name')!r} "
+                             f"(model_surgery needs a Keras 3 functional model config)")
+    return names
+
+
+def _is_channel_wise(layer):
+    name = type(layer).__name__
+    if name not in CHANNEL_WISE:
+        return False
+    if name == 'DepthwiseConv2D':
+        return layer.depth_multiplier == 1
+    if name == 'BatchNormalization':
+        return layer.axis in (-1, len(layer.input.shape) - 1)
+    if name == 'Reshape':
+        return layer.target_shape[-1] == layer.input.shape[-1]
+    if name in ('GlobalAveragePooling2D', 'GlobalMaxPooling2D', 'AveragePooling2D', 'MaxPooling2D'):
+        return layer.data_format == 'channels_last'
+    return True
+
+
+class ChannelGroup:
+    """One prunable channel space of a model."""
+
+    def __init__(self, name, producers, members, consumers):
+        self.name = name
+        self.producers = producers  # Conv2D / Dense layer names whose output axis is this space
+        self.members = members      # channel-wise layer names inside the space
+        self.consumers = consumers  # Conv2D / Dense layer names reading the space on their input axis
+        self.channels = None
+
+    def __repr__(self):
+        return f"ChannelGroup({self.name}, {self.channels} channels, {len(self.producers)} producers)"
+
+
+def channel_groups(model):
+    """Prunable ChannelGroups of a functional model, in layer order."""
+    config = model.get_config()
+    layer_configs = {c['name']: c for c in config['layers']}
+    layers = {layer.name: layer for layer in model.layers}
+    parent = {name: name for name in layer_configs}
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[rb] = ra
+
+    inbound = {name: inbound_names(c) for name, c in layer_configs.items()}
+    blocked = set()
+    for name, layer in layers.items():
+        kind = type(layer).__name__
+        shared = len(layer_configs[name].get('inbound_nodes') or []) > 1
+        if kind in PRODUCERS and not shared and (kind == 'Dense' or getattr(layer, 'groups', 1) == 1):
+            continue
+        if _is_channel_wise(layer) and not shared:
+            for source in inbound[name]:
+                union(source, name)
+            continue
+        # Anything else (input, Rescaling, Concatenate, Flatten, ...) pins its inputs and output
+        blocked.add(name)
+        blocked.update(inbound[name])
+
+    outputs = config['output_layers']
+    blocked.update(entry[0] for entry in (outputs if isinstance(outputs[0], (list, tuple)) else [outputs]))
+    blocked_roots = {find(name) for name in blocked}
+
+    spaces = defaultdict(lambda: {'producers': [], 'members': [], 'consumers': []})
+    for name, layer in layers.items():
+        root = find(name)
+        if type(layer).__name__ in PRODUCERS:
+            # A pinned output (e.g. the classifier) can still lose input channels
+            if name not in blocked:
+                spaces[root]['producers'].append(name)
+            for source in inbound[name]:
+                spaces[find(source)]['consumers'].append(name)
+        elif name not in blocked:
+            spaces[root]['members'].append(name)
+
+    order = {name: i for i, name in enumerate(layers)}
+    groups = []
+    for root, space in spaces.items():
+        if root in blocked_roots or not space['producers']:
+            continue
+        group = ChannelGroup(space['producers'][0], space['producers'], space['members'], space['consumers'])
+        producer = layers[group.producers[0]]
+        group.channels = int(producer.filters if hasattr(producer, 'filters') else producer.units)
+        groups.append(group)
+    groups.sort(key=lambda g: order[g.producers[0]])
+    return groups
+
+
+def channel_importance(model, group):
+    """Score per channel of `group` (higher = keep).
+
+    |gamma| of the BatchNormalization right after each producer (network
+    slimming) or, without one, the L1 norm of the producer's filters; each
+    producer's scores are normalized by their mean before summing, so a
+    residual stream fed by several convolutions weighs them equally.
+    """
+    layers = {layer.name: layer for layer in model.layers}
+    followers = defaultdict(list)
+    for c in model.get_config()['layers']:
+        for source in inbound_names(c):
+            followers[source].append(c['name'])
+
+    scores = np.zeros(group.channels, dtype=np.float64)
+    for name in group.producers:
+        bn = next((layers[f] for f in followers[name] if type(layers[f]).__name__ == 'BatchNormalization'), None)
+        if bn is not None and bn.scale:
+            score = np.abs(bn.gamma.numpy())
+        else:
+            kernel = layers[name].kernel.numpy()
+            score = np.abs(kernel).reshape(-1, kernel.shape[-1]).sum(axis=0)
+        scores += score / (score.mean() or 1.0)
+    return scores
+
+
+def _weight_axes(layer, group_of_output, group_of_input):
+    """For each weight of `layer`, {axis: group name} of the axes to slice."""
+    kind = type(layer).__name__
+    out_group = group_of_output.get(layer.name)
+    in_group = group_of_input.get(layer.name)
+    axes = []
+    for i, weight in enumerate(layer.weights):
+        slots = {}
+        if kind in PRODUCERS:
+            in_axis, out_axis = PRODUCERS[kind]
+            if i == 0:  # kernel
+                if in_group:
+                    slots[in_axis] = in_group
+                if out_group:
+                    slots[out_axis] = out_group
+            elif out_group:  # bias
+                slots[0] = out_group
+        elif out_group:
+            # Channel-wise weights (BN statistics, depthwise kernels and biases) sit on the channel axis
+            slots[2 if len(weight.shape) == 4 else 0] = out_group
+        axes.append(slots)
+    return axes
+
+
+def prune_channels(model, keep):
+    """Narrower copy of `model` keeping channels keep[group.name] of each group.
+
+    `keep` maps group names (from channel_groups) to index arrays; groups not
+    in it are unchanged. Layer names are preserved, so the result loads
+    anywhere the original did.
+    """
+    groups = {g.name: g for g in channel_groups(model)}
+    keep = {name: np.sort(np.asarray(indices, dtype=np.int64)) for name, indices in keep.items()}
+    group_of_output, group_of_input = {}, {}
+    for name, indices in keep.items():
+        group = groups[name]
+        for layer_name in group.producers + group.members:
+            group_of_output[layer_name] = name
+        for layer_name in group.consumers:
+            group_of_input[layer_name] = name
+
+    config = model.get_config()
+    for layer_config in config['layers']:
+        if layer_config['name'] in group_of_output or layer_config['name'] in group_of_input:
+            # The recorded build shape is the old width; let the layer build from its new input
+            layer_config.pop('build_config', None)
+        group_name = group_of_output.get(layer_config['name'])
+        if group_name is None:
+            continue
+        width = len(keep[group_name])
+        layer_conf = layer_config['config']
+        if layer_config['class_name'] == 'Conv2D':
+            layer_conf['filters'] = width
+        elif layer_config['class_name'] == 'Dense':
+            layer_conf['units'] = width
+        elif layer_config['class_name'] == 'Reshape':
+            layer_conf['target_shape'] = [*layer_conf['target_shape'][:-1], width]
+
+    pruned = model.__class__.from_config(config)
+    pruned_layers = {layer.name: layer for layer in pruned.layers}
+    for layer in model.layers:
+        if not layer.weights:
+            continue
+        weights = []
+        for value, slots in zip(layer.get_weights(), _weight_axes(layer, group_of_output, group_of_input)):
+            for axis, group_name in slots.items():
+                value = np.take(value, keep[group_name], axis=axis)
+            weights.append(value)
+        pruned_layers[layer.name].set_weights(weights)
+    return pruned
+
+
+def count_flops(model):
+    """Multiply-accumulate FLOPs (2 per MAC) of one forward pass at batch size 1."""
+    macs = 0
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == 'Conv2D':
+            kh, kw, cin, cout = layer.kernel.shape
+            macs += int(np.prod(layer.output.shape[1:3])) * kh * kw * cin * cout // max(layer.groups, 1)
+        elif kind == 'DepthwiseConv2D':
+            kh, kw, cin, mult = layer.kernel.shape
+            macs += int(np.prod(layer.output.shape[1:3])) * kh * kw * cin * mult
+        elif kind == 'Dense':
+            cin, cout = layer.kernel.shape
+            macs += int(np.prod(layer.input.shape[1:-1] or [1])) * cin * cout
+    return 2 * macs
+
+
+def count_params(model):
+    return int(sum(np.prod(w.shape) for w in model.weights))
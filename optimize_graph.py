@@ -0,0 +1,305 @@
+"""
+Padang Food Recognition - Inference Graph Optimization
+Rewrites a trained Keras model into an inference-only equivalent before it is
+exported to SavedModel / TF.js (convert_model.py runs this by default):
+
+- BatchNormalization folded into the preceding Conv2D / DepthwiseConv2D /
+  Dense weights, or into the following Dense when it sits after pooling
+  (the create_model head in train_model_optimized.py)
+- Training-only layers (Dropout, stochastic-depth Dropout, GaussianNoise,
+  ...) removed
+- Activation / ReLU layers fused into the preceding layer's activation
+- Rescaling folded into the following Normalization constants
+
+The result is checked against the original on sample inputs; the report
+(model/graph_optimization_report.md/.json) compares layer count, traced op
+count, SavedModel size and CPU latency.
+
+Usage:
+    python optimize_graph.py [--model ./model/padang_food_model_optimized.keras]
+                             [--output ./model/padang_food_model_optimized_inference.keras]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter, defaultdict
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+import model_surgery
+import quantization
+
+DEFAULT_MODEL_PATH = "./model/padang_food_model_optimized.keras"
+REPORT_PATH = "./model/graph_optimization_report"
+FOLD_HOSTS = ('Conv2D', 'DepthwiseConv2D', 'Dense')
+INFERENCE_IDENTITY = ('Dropout', 'SpatialDropout1D', 'SpatialDropout2D', 'SpatialDropout3D', 'GaussianDropout',
+                      'GaussianNoise', 'AlphaDropout', 'ActivityRegularization')
+EQUIVALENCE_ATOL = 1e-4
+VERIFY_SAMPLES = 8
+
+
+def optimized_path_for(model_path):
+    root, ext = os.path.splitext(model_path)
+    return f"{root}_inference{ext}"
+
+
+def _activation_name(layer):
+    """Activation string a host layer can take over, or None."""
+    config = layer.get_config()
+    if type(layer).__name__ == 'Activation':
+        activation = config['activation']
+        return activation if isinstance(activation, str) else None
+    if config.get('negative_slope') or config.get('threshold'):
+        return None
+    return {None: 'relu', 6.0: 'relu6'}.get(config.get('max_value'))
+
+
+def _batchnorm_affine(layer):
+    """(scale, shift) with BN(x) == x * scale + shift at inference."""
+    weights = list(layer.get_weights())
+    gamma = weights.pop(0) if layer.scale else 1.0
+    beta = weights.pop(0) if layer.center else 0.0
+    mean, variance = weights
+    scale = gamma / np.sqrt(variance + layer.epsilon)
+    return scale, beta - mean * scale
+
+
+def optimize(model):
+    """Inference-only copy of a functional model; returns (optimized, counts of each rewrite)."""
+    config = model.get_config()
+    layers = {layer.name: layer for layer in model.layers}
+    order = [c['name'] for c in config['layers']]
+    layer_configs = {c['name']: c for c in config['layers']}
+    inbound = {name: model_surgery.inbound_names(c) for name, c in layer_configs.items()}
+    outputs = config['output_layers']
+    outputs = [entry[0] for entry in (outputs if isinstance(outputs[0], (list, tuple)) else [outputs])]
+    configs = {name: layer.get_config() for name, layer in layers.items()}
+    weights = {name: layer.get_weights() for name, layer in layers.items()}
+    alias = {}
+    counts = Counter()
+
+    def resolve(name):
+        while name in alias:
+            name = alias[name]
+        return name
+
+    def consumers():
+        result = defaultdict(list)
+        for name in order:
+            if name not in alias:
+                for source in inbound[name]:
+                    result[resolve(source)].append(name)
+        return result
+
+    def kind(name):
+        return type(layers[name]).__name__
+
+    def foldable_host(name, single_consumer):
+        return (kind(name) in FOLD_HOSTS and name not in outputs and single_consumer
+                and configs[name].get('activation') in ('linear', None))
+
+    # 1. Layers that are the identity at inference
+    for name in order:
+        if kind(name) in INFERENCE_IDENTITY and len(inbound[name]) == 1:
+            alias[name] = inbound[name][0]
+            counts['trainingOpsStripped'] += 1
+
+    # 2. BatchNormalization into the neighbouring affine layer
+    for name in order:
+        layer = layers[name]
+        if kind(name) != 'BatchNormalization' or name in alias or name in outputs:
+            continue
+        if layer.axis not in (-1, len(layer.input.shape) - 1):
+            continue
+        cons = consumers()
+        source = resolve(inbound[name][0])
+        scale, shift = _batchnorm_affine(layer)
+        if foldable_host(source, cons[source] == [name]):
+            host = weights[source]
+            kernel = host[0]
+            if kind(source) == 'DepthwiseConv2D':
+                kernel = kernel * scale.reshape(1, 1, *kernel.shape[2:])
+            else:
+                kernel = kernel * scale
+            bias = host[1] if configs[source]['use_bias'] else np.zeros_like(shift)
+            weights[source] = [kernel, bias * scale + shift]
+            configs[source]['use_bias'] = True
+        elif (len(cons[name]) == 1 and kind(cons[name][0]) == 'Dense' and len(layer.input.shape) == 2
+              and cons[name][0] not in alias):
+            # Pooled features -> BN -> Dense: W.(x*s + t) + b == (W*s).x + (W.t + b)
+            dense = cons[name][0]
+            kernel = weights[dense][0]
+            bias = weights[dense][1] if configs[dense]['use_bias'] else np.zeros(kernel.shape[1], kernel.dtype)
+            weights[dense] = [kernel * scale[:, None], bias + shift @ kernel]
+            configs[dense]['use_bias'] = True
+        else:
+            continue
+        alias[name] = inbound[name][0]
+        counts['batchNormsFolded'] += 1
+
+    # 3. Activation layers into the layer producing their input
+    for name in order:
+        if kind(name) not in ('Activation', 'ReLU') or name in alias or name in outputs:
+            continue
+        source = resolve(inbound[name][0])
+        activation = _activation_name(layers[name])
+        if (activation and foldable_host(source, consumers()[source] == [name])
+                and configs[source]['dtype'] == configs[name]['dtype']):
+            configs[source]['activation'] = activation
+            alias[name] = source
+            counts['activationsFused'] += 1
+
+    # 4. Rescaling constants into the following Normalization
+    for name in order:
+        if kind(name) != 'Normalization' or name in alias or configs[name].get('mean') is None:
+            continue
+        source = resolve(inbound[name][0])
+        rescale = configs[source] if kind(source) == 'Rescaling' else None
+        if (rescale and np.ndim(rescale['scale']) == 0 and np.ndim(rescale['offset']) == 0
+                and consumers()[source] == [name] and not configs[name].get('invert')):
+            # (x*s + o - mean) / std == (x - (mean - o)/s) / (std/s)
+            s, o = float(rescale['scale']), float(rescale['offset'])
+            configs[name]['mean'] = ((np.asarray(configs[name]['mean']) - o) / s).tolist()
+            configs[name]['variance'] = (np.asarray(configs[name]['variance']) / s ** 2).tolist()
+            alias[source] = inbound[source][0]
+            counts['constantsFolded'] += 1
+
+    # Rebuild the graph without the aliased layers
+    tensors, inputs = {}, []
+    for name in order:
+        if name in alias:
+            continue
+        if kind(name) == 'InputLayer':
+            tensors[name] = keras.Input(batch_shape=layers[name].batch_shape, dtype=layers[name].dtype, name=name)
+            inputs.append(tensors[name])
+            continue
+        new_layer = layers[name].__class__.from_config(configs[name])
+        args = [tensors[resolve(source)] for source in inbound[name]]
+        tensors[name] = new_layer(args if len(args) > 1 else args[0])
+        if weights[name]:
+            new_layer.set_weights(weights[name])
+    result = [tensors[resolve(name)] for name in outputs]
+    optimized = keras.Model(inputs if len(inputs) > 1 else inputs[0],
+                            result if len(result) > 1 else result[0], name=model.name)
+    counts['layersBefore'], counts['layersAfter'] = len(model.layers), len(optimized.layers)
+    return optimized, dict(counts)
+
+
+def sample_inputs(model, n=VERIFY_SAMPLES, dataset_path=None, rescale=None, seed=0):
+    """Validation images when a dataset is given, otherwise random 0-255 images."""
+    if dataset_path and os.path.isdir(dataset_path):
+        images, _ = quantization.load_sample(dataset_path, tuple(model.input_shape[1:3]), n, rescale)
+        if images is not None:
+            return images
+    images = np.random.default_rng(seed).uniform(0, 255, (n, *model.input_shape[1:])).astype(np.float32)
+    return images * rescale if rescale else images
+
+
+def verify_equivalence(original, optimized, images, atol=EQUIVALENCE_ATOL):
+    """Max absolute output difference and top-1 agreement on `images`."""
+    expected = np.asarray(original.predict_on_batch(images))
+    actual = np.asarray(optimized.predict_on_batch(images))
+    max_diff = float(np.max(np.abs(expected - actual)))
+    return {
+        'maxAbsDiff': max_diff,
+        'top1Agreement': float(np.mean(expected.argmax(axis=-1) == actual.argmax(axis=-1))),
+        'equivalent': max_diff <= atol,
+    }
+
+
+def graph_op_count(model):
+    """Ops in the traced inference graph at batch size 1."""
+    spec = tf.TensorSpec([1, *model.input_shape[1:]], tf.float32)
+    concrete = tf.function(lambda x: model(x, training=False)).get_concrete_function(spec)
+    return len(concrete.graph.get_operations())
+
+
+def saved_model_nbytes(model):
+    """Size of the model exported as a SavedModel, the TF.js converter's input."""
+    tmp_dir = tempfile.mkdtemp(prefix='graph_opt_')
+    try:
+        path = os.path.join(tmp_dir, 'saved_model')
+        model.export(path, verbose=False)
+        return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def write_report(original, optimized, counts, check, report_path=REPORT_PATH):
+    """Before/after comparison as `<report_path>.md` and `<report_path>.json`."""
+    image = np.zeros(original.input_shape[1:], dtype=np.float32)
+    rows = []
+    for name, model in (('original', original), ('optimized', optimized)):
+        rows.append({
+            'model': name,
+            'layers': len(model.layers),
+            'graphOps': graph_op_count(model),
+            'savedModelBytes': saved_model_nbytes(model),
+            'latencyMs': round(quantization.measure_latency_ms(model, image), 3),
+        })
+    report = {'rewrites': counts, 'equivalence': check, 'models': rows}
+    with open(report_path + '.json', 'w') as f:
+        json.dump(report, f, indent=2)
+
+    md = f"""# Inference Graph Optimization Report
+Rewrites: {', '.join(f'{k} {v}' for k, v in counts.items() if not k.startswith('layers')) or 'none'}
+Equivalence: max |diff| {check['maxAbsDiff']:.2e}, top-1 agreement {check['top1Agreement']:.2%}
+
+| Model | Layers | Graph Ops | SavedModel Size | CPU Latency (ms) |
+| :--- | :--- | :--- | :--- | :--- |
+"""
+    for row in rows:
+        md += (f"| {row['model']} | {row['layers']} | {row['graphOps']} "
+               f"| {row['savedModelBytes'] / 1024 / 1024:.2f} MB | {row['latencyMs']:.2f} |\n")
+    with open(report_path + '.md', 'w', encoding='utf-8') as f:
+        f.write(md)
+    print(f"   Graph optimization report: {report_path}.md")
+    return report
+
+
+def optimize_for_inference(model, dataset_path=None, rescale=None, report_path=REPORT_PATH):
+    """optimize() + equivalence check + report; falls back to `model` if outputs differ."""
+    optimized, counts = optimize(model)
+    check = verify_equivalence(model, optimized, sample_inputs(model, dataset_path=dataset_path, rescale=rescale))
+    print(f"   Graph optimization: {counts['layersBefore']} -> {counts['layersAfter']} layers "
+          f"({', '.join(f'{k} {v}' for k, v in counts.items() if not k.startswith('layers'))}), "
+          f"max |diff| {check['maxAbsDiff']:.2e}")
+    if report_path:
+        write_report(model, optimized, counts, check, report_path)
+    if not check['equivalent']:
+        print(f"   [WARNING] Optimized graph differs by more than {EQUIVALENCE_ATOL:g}; keeping the original")
+        return model
+    return optimized
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold BatchNorm, strip training-only layers and fuse activations")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--output', help="Optimized .keras path (default: <model>_inference.keras)")
+    parser.add_argument('--dataset', help="Verify on validation images instead of random inputs")
+    parser.add_argument('--rescale', type=float,
+                        help="Input scale the model was trained with (1/255 for train_model.py's MobileNetV2)")
+    parser.add_argument('--report', default=REPORT_PATH, help="Report path without extension")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Error: model not found at {args.model}")
+        return 1
+    model = keras.models.load_model(args.model)
+    optimized = optimize_for_inference(model, args.dataset, args.rescale, args.report)
+    if optimized is model:
+        return 1
+    output = args.output or optimized_path_for(args.model)
+    optimized.save(output)
+    print(f"   Saved: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
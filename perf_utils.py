@@ -0,0 +1,41 @@
+"""
+Padang Food Recognition - Performance Measurement Helpers
+Small helpers (numpy only, no TensorFlow) shared by the benchmark and training logs.
+"""
+
+import sys
+
+import numpy as np
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def latency_summary(timings_ms):
+    """p50/p95/p99/mean/min/max of a list of latencies in milliseconds."""
+    values = np.asarray(timings_ms, dtype=np.float64)
+    if not len(values):
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'mean': round(float(values.mean()), 3),
+        'min': round(float(values.min()), 3),
+        'max': round(float(values.max()), 3),
+    }
@@ -1,23 +1,56 @@
+"""
+Padang Food Recognition - Manual / Batch Prediction
 
-import sys
+Usage:
+    python predict_manual.py <image_path>
+    python predict_manual.py <dir_or_glob_or_file> [...] [--file-list list.txt]
+                             [--batch-size 32] [--workers 8] [--top-k 3]
+                             [--output results.csv|results.jsonl]
+                             [--backend keras|tflite] [--threads N] [--compare-keras [--keras-model x.keras]]
+                             [--tta N] [--latency-budget-ms MS]
+    python predict_manual.py --split validation|test [--dataset ./dataset/train]
+        (scores a subset of the persisted split index and reports accuracy)
+"""
+
+import argparse
+import csv
+import glob
+import json
 import os
-import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import load_img, img_to_array
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Suppress TF logs
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
-# Image path from args
-if len(sys.argv) < 2:
-    print("Usage: python predict_manual.py <image_path>")
-    sys.exit(1)
-
-IMG_PATH = sys.argv[1]
+import dataset_split
+import tflite_export
 
 # Model Path
 MODEL_PATH = "./model/padang_food_model_optimized.keras"
+TFLITE_MODEL_PATH = tflite_export.tflite_path_for(MODEL_PATH)
+IMAGE_SIZE = (224, 224)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+# Test-time augmentation views as normalized (y1, x1, y2, x2) crop boxes, most
+# useful first so a capped N keeps the best ones. x1 > x2 mirrors the view,
+# a box outside [0, 1] zooms out (zero padding).
+TTA_VIEWS = (
+    ('original', (0.0, 0.0, 1.0, 1.0)),
+    ('flip', (0.0, 1.0, 1.0, 0.0)),
+    ('crop_87', (0.0625, 0.0625, 0.9375, 0.9375)),
+    ('crop_87_flip', (0.0625, 0.9375, 0.9375, 0.0625)),
+    ('top_left', (0.0, 0.0, 0.875, 0.875)),
+    ('top_right', (0.0, 0.125, 0.875, 1.0)),
+    ('bottom_left', (0.125, 0.0, 1.0, 0.875)),
+    ('bottom_right', (0.125, 0.125, 1.0, 1.0)),
+    ('crop_75', (0.125, 0.125, 0.875, 0.875)),
+    ('crop_75_flip', (0.125, 0.875, 0.875, 0.125)),
+    ('zoom_out', (-0.05, -0.05, 1.05, 1.05)),
+    ('zoom_out_flip', (-0.05, 1.05, 1.05, -0.05)),
+)
 
 # Classes (Alphabetical order from dataset)
 CLASSES = [
@@ -37,42 +70,458 @@ CLASS_NAMES = {
     'telur_dadar': 'Telur Dadar'
 }
 
-def predict():
-    if not os.path.exists(MODEL_PATH):
-        print(f"Error: Model not found at {MODEL_PATH}")
-        return
 
-    print(f"Loading model from {MODEL_PATH}...")
+def load_predictor(model_path, backend='keras', threads=None):
+    """Load a Keras or TFLite model; both expose predict_on_batch() and input_shape."""
+    if backend == 'tflite':
+        return tflite_export.TFLiteModel(model_path=model_path, num_threads=threads)
+    import tensorflow as tf
+
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+    return tf.keras.models.load_model(model_path)
+
+
+def load_image(path, image_size=IMAGE_SIZE):
+    """Load and resize one image. EfficientNetV2 expects inputs in range [0, 255].
+
+    PIL only (no TensorFlow import), with the same RGB conversion and
+    nearest-neighbour resize as keras load_img/img_to_array.
+    """
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+        if img.size != (image_size[1], image_size[0]):
+            img = img.resize((image_size[1], image_size[0]), Image.NEAREST)
+        return np.asarray(img, dtype=np.float32)
+
+
+def expand_inputs(inputs, file_list=None):
+    """Resolve files, directories (recursive) and glob patterns to image paths."""
+    paths = []
+    if file_list:
+        with open(file_list) as f:
+            paths.extend(line.strip() for line in f if line.strip())
+
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, fnames in sorted(os.walk(item), key=lambda x: x[0]):
+                paths.extend(os.path.join(root, f) for f in sorted(fnames)
+                             if f.lower().endswith(IMAGE_EXTENSIONS))
+        elif glob.has_magic(item):
+            paths.extend(p for p in sorted(glob.glob(item, recursive=True))
+                         if p.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.append(item)
+    return paths
+
+
+def top_k(probabilities, k):
+    """Vectorized top-k over a (batch, classes) array -> (indices, scores), best first."""
+    import numpy as np
+
+    k = min(k, probabilities.shape[1])
+    idx = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(probabilities, idx, axis=1)
+    order = np.argsort(-scores, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def _interpolation_matrix(size, start, end):
+    """(size, size) bilinear resampling weights of tf.image.crop_and_resize along one axis.
+
+    Row i samples coordinate start * (size - 1) + i * (end - start); rows
+    outside the image stay zero (crop_and_resize's extrapolation value).
+    """
+    import numpy as np
+
+    coords = start * (size - 1) + np.arange(size) * ((end - start) * (size - 1) / max(size - 1, 1))
+    weights = np.zeros((size, size), dtype=np.float32)
+    rows = np.flatnonzero((coords >= 0) & (coords <= size - 1))
+    low = np.floor(coords[rows]).astype(np.int64)
+    frac = (coords[rows] - low).astype(np.float32)
+    weights[rows, low] = 1 - frac
+    weights[rows, np.minimum(low + 1, size - 1)] += frac
+    return weights
+
+
+def tta_views(batch, n_views):
+    """(B, H, W, 3) -> (B * n_views, H, W, 3): the first n_views TTA_VIEWS of every image.
+
+    Each flip, crop and scale is tf.image.crop_and_resize done in numpy as
+    two small resampling matmuls (rows, then columns); view 0 (the full
+    box) reproduces the input exactly.
+    """
+    import numpy as np
+
+    n_images, height, width, channels = batch.shape
+    images = np.asarray(batch, dtype=np.float32)
+    views = np.empty((n_images, n_views, height, width, channels), dtype=np.float32)
+    for v, (_, (y1, x1, y2, x2)) in enumerate(TTA_VIEWS[:n_views]):
+        rows = _interpolation_matrix(height, y1, y2) @ images.reshape(n_images, height, width * channels)
+        rows = rows.reshape(n_images, height, width, channels)
+        views[:, v] = np.einsum('xw,bywc->byxc', _interpolation_matrix(width, x1, x2), rows, optimize=True)
+    return views.reshape(n_images * n_views, height, width, channels).astype(batch.dtype, copy=False)
+
+
+def predict_tta(model, batch, n_views, batch_size=None):
+    """Probabilities averaged over n_views augmented views, in one model call.
+
+    With `batch_size`, the call is padded to batch_size * n_views so its shape stays fixed.
+    """
+    n_views = max(1, n_views)
+    views = tta_views(batch, n_views) if n_views > 1 else batch
+    probabilities = predict_batch(model, views, (batch_size or len(batch)) * n_views)
+    return probabilities.reshape(len(batch), n_views, -1).mean(axis=1)
+
+
+def calibrate_tta(model, image_size, budget_ms, max_views=len(TTA_VIEWS), images_per_call=1, runs=3):
+    """Largest view count whose model call stays within `budget_ms`.
+
+    Times one call with 1 view and one with `max_views` views per image
+    (median of `runs` after a warm-up each) and fits cost = fixed + per_view * views.
+    """
+    import numpy as np
+
+    def median_ms(views):
+        batch = np.zeros((images_per_call * views, *image_size, 3), np.float32)
+        model.predict_on_batch(batch)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model.predict_on_batch(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+        return float(np.median(timings))
+
+    one, most = median_ms(1), median_ms(max_views)
+    per_view = max((most - one) / (max_views - 1), 1e-3) if max_views > 1 else one
+    fixed = max(one - per_view, 0.0)
+    n_views = int(max(1, min(max_views, (budget_ms - fixed) // per_view)))
+    # Trace the chosen shape now, so the first real call is not the slow one
+    model.predict_on_batch(np.zeros((images_per_call * n_views, *image_size, 3), np.float32))
+    print(f"TTA calibration: {fixed:.1f} ms fixed + {per_view:.1f} ms/view "
+          f"-> {n_views} view(s) within {budget_ms:g} ms")
+    return n_views
+
+
+def _timed_load(path, image_size):
+    start = time.perf_counter()
     try:
-        model = load_model(MODEL_PATH)
+        return load_image(path, image_size), None, time.perf_counter() - start
     except Exception as e:
-        print(f"Error loading model: {e}")
-        return
+        return None, str(e), time.perf_counter() - start
+
+
+def iter_batches(paths, batch_size, workers, image_size=IMAGE_SIZE, stats=None):
+    """Decode on a thread pool and yield (paths, batch, errors) in input order.
+
+    At most two batches are in flight, so memory stays bounded for any
+    number of inputs. `stats` collects decode CPU time and time spent waiting.
+    """
+    import numpy as np
+
+    stats = stats if stats is not None else {}
+    stats.setdefault('decode_s', 0.0)
+    stats.setdefault('decode_wait_s', 0.0)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        source = iter(paths)
+
+        def fill():
+            while len(pending) < 2 * batch_size:
+                path = next(source, None)
+                if path is None:
+                    return
+                pending.append((path, pool.submit(_timed_load, path, image_size)))
+
+        fill()
+        while pending:
+            batch_paths, arrays, errors = [], [], []
+            wait_start = time.perf_counter()
+            while pending and len(batch_paths) < batch_size:
+                path, future = pending.popleft()
+                array, error, elapsed = future.result()
+                stats['decode_s'] += elapsed
+                if error:
+                    errors.append((path, error))
+                else:
+                    batch_paths.append(path)
+                    arrays.append(array)
+            stats['decode_wait_s'] += time.perf_counter() - wait_start
+            fill()
+            if batch_paths or errors:
+                batch = np.stack(arrays) if arrays else None
+                yield batch_paths, batch, errors
 
-    print(f"Processing image: {IMG_PATH}")
+
+def predict_batch(model, batch, batch_size):
+    """Run one fixed-size inference batch (the last one is zero-padded)."""
+    import numpy as np
+
+    n = len(batch)
+    if n < batch_size:
+        batch = np.concatenate([batch, np.zeros((batch_size - n, *batch.shape[1:]), batch.dtype)])
+    return np.asarray(model.predict_on_batch(batch))[:n]
+
+
+class ResultWriter:
+    """Streams results to CSV or JSONL (picked from the file extension)."""
+
+    def __init__(self, path, k):
+        self.k = k
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.jsonl = path.lower().endswith(('.jsonl', '.json'))
+        if not self.jsonl:
+            self.csv = csv.writer(self.file)
+            header = ['path', 'status']
+            for rank in range(1, k + 1):
+                header += [f'class_{rank}', f'name_{rank}', f'confidence_{rank}']
+            self.csv.writerow(header)
+
+    def write(self, path, indices=None, scores=None, error=None):
+        if self.jsonl:
+            record = {'path': path, 'status': 'error' if error else 'ok'}
+            if error:
+                record['error'] = error
+            else:
+                record['predictions'] = [
+                    {'class': CLASSES[i], 'name': CLASS_NAMES[CLASSES[i]], 'confidence': round(float(s), 6)}
+                    for i, s in zip(indices, scores)
+                ]
+            self.file.write(json.dumps(record) + '\n')
+        else:
+            row = [path, error or 'ok']
+            if not error:
+                for i, s in zip(indices, scores):
+                    row += [CLASSES[i], CLASS_NAMES[CLASSES[i]], f"{s:.6f}"]
+            self.csv.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+def split_inputs(dataset_path, subset):
+    """(paths, {path: CLASSES index}) of one subset of the split index."""
+    index = dataset_split.load_split(dataset_path)
+    if index is None:
+        raise ValueError(f"No split index for {dataset_path} (run dataset_split.py first)")
+    class_indices, subsets = dataset_split.split_subsets(dataset_path, index)
+    if subset not in subsets:
+        raise ValueError(f"The split index has no '{subset}' images")
+    names = {idx: name for name, idx in class_indices.items()}
+    unknown = set(names.values()) - set(CLASSES)
+    if unknown:
+        raise ValueError(f"Dataset classes unknown to the model: {', '.join(sorted(unknown))}")
+    paths, labels = subsets[subset]
+    return paths, {path: CLASSES.index(names[label]) for path, label in zip(paths, labels)}
+
+
+def predict_many(model, paths, batch_size=32, workers=8, k=3, output=None, labels=None, tta=1):
+    """Score many images in batches, streaming results and printing throughput.
+
+    With `labels` ({path: class index}), top-1 and top-k accuracy are reported too.
+    With `tta` > 1, each batch is expanded to batch_size * tta views in one call.
+    """
+    import numpy as np
+
+    image_size = tuple(model.input_shape[1:3])
+    writer = ResultWriter(output, k) if output else None
+    stats = {'inference_s': 0.0}
+    done = failed = correct = correct_k = 0
+    start = time.perf_counter()
+
+    try:
+        for batch_paths, batch, errors in iter_batches(paths, batch_size, workers, image_size, stats):
+            for path, error in errors:
+                failed += 1
+                if writer:
+                    writer.write(path, error=error)
+                else:
+                    print(f"{path}: ERROR {error}")
+            if batch is None:
+                continue
+
+            infer_start = time.perf_counter()
+            probabilities = predict_tta(model, batch, tta, batch_size)
+            stats['inference_s'] += time.perf_counter() - infer_start
+
+            indices, scores = top_k(probabilities, k)
+            if labels:
+                truth = np.asarray([labels[p] for p in batch_paths])
+                correct += int(np.sum(indices[:, 0] == truth))
+                correct_k += int(np.sum(np.any(indices == truth[:, None], axis=1)))
+            for path, idx, sc in zip(batch_paths, indices, scores):
+                if writer:
+                    writer.write(path, idx, sc)
+                else:
+                    best = ", ".join(f"{CLASS_NAMES[CLASSES[i]]} {s:.2%}" for i, s in zip(idx, sc))
+                    print(f"{path}: {best}")
+            done += len(batch_paths)
+            if writer:
+                print(f"   Processed {done + failed}/{len(paths)}", end='\r')
+    finally:
+        if writer:
+            writer.close()
+
+    total = time.perf_counter() - start
+    print("\n--- Throughput Summary ---")
+    print(f"Images: {done} ok, {failed} failed")
+    print(f"Wall time: {total:.2f}s ({done / total if total else 0:.1f} images/sec)")
+    print(f"Decode: {stats['decode_s']:.2f}s CPU across {workers} workers, "
+          f"{stats['decode_wait_s']:.2f}s waited on by the inference loop")
+    print(f"Inference: {stats['inference_s']:.2f}s "
+          f"({done / stats['inference_s'] if stats['inference_s'] else 0:.1f} images/sec)")
+    if labels and done:
+        stats['accuracy'] = correct / done
+        stats['top_k_accuracy'] = correct_k / done
+        print(f"Accuracy: top-1 {stats['accuracy']:.2%}, top-{k} {stats['top_k_accuracy']:.2%} on {done} images")
+    if output:
+        print(f"Results written to {output}")
+    return stats
+
+
+def predict_single(model, img_path, k=3, tta=1):
+    import numpy as np
+
+    print(f"Processing image: {img_path}")
     try:
-        # Load and resize
-        # EfficientNetV2 expects inputs in range [0, 255]
-        img = load_img(IMG_PATH, target_size=(224, 224))
-        img_array = img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0) # Add batch dimension
-        
-        # Predict
-        predictions = model.predict(img_array, verbose=0)
-        
-        # Get top 3
-        top_indices = predictions[0].argsort()[-3:][::-1]
-        
+        img_array = np.expand_dims(load_image(img_path, tuple(model.input_shape[1:3])), axis=0) # Add batch dimension
+
+        # Predict (all TTA views in a single batched call)
+        start = time.perf_counter()
+        predictions = predict_tta(model, img_array, tta)
+        if tta > 1:
+            print(f"TTA: {tta} views averaged in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        # Get top k
+        top_indices = predictions[0].argsort()[-k:][::-1]
+
         print("\n--- Prediction Results ---")
         for i in top_indices:
             cls = CLASSES[i]
             conf = predictions[0][i]
             print(f"{CLASS_NAMES[cls]}: {conf:.2%}")
-            
+
     except Exception as e:
         print(f"Error during prediction: {e}")
         import traceback
         traceback.print_exc()
 
+
+def compare_with_keras(predictor, keras_path, paths, batch_size=32, tolerance=1e-3):
+    """Check TFLite outputs against the Keras model on up to one batch of images."""
+    import numpy as np
+    import tensorflow as tf
+
+    if not os.path.exists(keras_path):
+        print(f"Error: Keras model for --compare-keras not found at {keras_path} (use --keras-model)")
+        return False
+    keras_model = tf.keras.models.load_model(keras_path)
+    image_size = tuple(predictor.input_shape[1:3])
+    images = []
+    for path in paths[:batch_size]:
+        try:
+            images.append(load_image(path, image_size))
+        except Exception as e:
+            print(f"   Skipping {path} in the comparison: {e}")
+    if not images:
+        print("Error: no readable images to compare TFLite against Keras")
+        return False
+    batch = np.stack(images)
+    expected = np.asarray(keras_model.predict_on_batch(batch))
+    actual = np.asarray(predictor.predict_on_batch(batch))
+    max_diff = float(np.max(np.abs(expected - actual)))
+    agreement = float(np.mean(np.argmax(expected, 1) == np.argmax(actual, 1)))
+    ok = max_diff <= tolerance
+    print(f"TFLite vs Keras on {len(batch)} images: max |diff| {max_diff:.2e}, "
+          f"top-1 agreement {agreement:.2%} -> {'OK' if ok else 'OUT OF TOLERANCE'} (tol {tolerance:g})")
+    return ok
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Predict Padang dishes for one or many images")
+    parser.add_argument('inputs', nargs='*', help="Image files, directories or glob patterns")
+    parser.add_argument('--file-list', help="Text file with one image path per line")
+    parser.add_argument('--model', help=f"Model path (default {MODEL_PATH} or {TFLITE_MODEL_PATH})")
+    parser.add_argument('--backend', choices=('keras', 'tflite'), default='keras',
+                        help="tflite runs the exported .tflite model with multi-threaded XNNPACK")
+    parser.add_argument('--threads', type=int, help="Inference threads (default: runtime decides)")
+    parser.add_argument('--compare-keras', action='store_true',
+                        help="With --backend tflite, check outputs against the Keras model first")
+    parser.add_argument('--keras-model',
+                        help="Keras model for --compare-keras (default: the .keras next to the TFLite model)")
+    parser.add_argument('--tolerance', type=float, default=1e-3,
+                        help="Max abs probability difference accepted by --compare-keras")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help="Decode threads")
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--output', help="Stream results to a .csv or .jsonl file")
+    parser.add_argument('--tta', type=int, default=1,
+                        help=f"Test-time augmentation views per image (1-{len(TTA_VIEWS)}: flips, crops, zoom)")
+    parser.add_argument('--latency-budget-ms', type=float,
+                        help="Cap --tta (default: all views) so one model call stays within this budget, "
+                             "measured on this machine (per image, or per batch in batch mode)")
+    parser.add_argument('--split', choices=dataset_split.SUBSETS,
+                        help="Evaluate on this subset of the persisted split index instead of inputs")
+    parser.add_argument('--dataset', default=dataset_split.DEFAULT_DATASET_PATH,
+                        help="Dataset the split index belongs to (with --split)")
+    return parser
+
+
+def predict(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.file_list and not args.split:
+        parser.print_usage()
+        return 1
+    labels = None
+    if args.split:
+        try:
+            args.inputs, labels = split_inputs(args.dataset, args.split)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+
+    model_path = args.model or (TFLITE_MODEL_PATH if args.backend == 'tflite' else MODEL_PATH)
+    if not os.path.exists(model_path):
+        print(f"Error: Model not found at {model_path}")
+        return 1
+
+    print(f"Loading {args.backend} model from {model_path}...")
+    try:
+        model = load_predictor(model_path, args.backend, args.threads)
+    except Exception as e:
+        print(f"Error loading model: {e}")
+        return 1
+
+    if args.compare_keras and args.backend == 'tflite':
+        sample = expand_inputs(args.inputs, args.file_list)
+        keras_path = args.keras_model or tflite_export.keras_path_for(model_path)
+        if sample and not compare_with_keras(model, keras_path, sample, args.batch_size, args.tolerance):
+            return 2
+
+    single = (len(args.inputs) == 1 and not args.file_list and not args.output
+              and not labels and os.path.isfile(args.inputs[0]))
+    tta = max(1, min(args.tta, len(TTA_VIEWS)))
+    if args.latency_budget_ms:
+        max_views = tta if args.tta > 1 else len(TTA_VIEWS)
+        tta = calibrate_tta(model, tuple(model.input_shape[1:3]), args.latency_budget_ms, max_views,
+                            images_per_call=1 if single else args.batch_size)
+    if single:
+        predict_single(model, args.inputs[0], args.top_k, tta)
+        return 0
+
+    paths = expand_inputs(args.inputs, args.file_list)
+    if not paths:
+        print("No images found.")
+        return 1
+    print(f"Scoring {len(paths)} images (batch size {args.batch_size}, {args.workers} decode workers)")
+    predict_many(model, paths, args.batch_size, args.workers, args.top_k, args.output, labels, tta)
+    return 0
+
+
 if __name__ == "__main__":
-    predict()
+    sys.exit(predict())
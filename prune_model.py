@@ -0,0 +1,170 @@
+"""
+Padang Food Recognition - Structured Channel Pruning
+Post-training stage that removes whole convolution/dense channels from a
+trained model (MobileNetV2 from train_model.py or EfficientNetV2B0 from
+train_model_optimized.py), briefly fine-tunes to recover accuracy and saves
+a narrower .keras model the conversion scripts take as-is (--model).
+
+- Channels are ranked by |BatchNorm gamma| (or filter L1 norm) per channel
+  group found by model_surgery.py; residual streams are pruned as one group
+- Every group keeps the same fraction, rounded up to a multiple of 8
+  channels so kernels stay SIMD-friendly
+- Each sparsity level is pruned from the original model and fine-tuned
+  separately, with BatchNormalization frozen
+- Report (model/pruning_report.md/.json): FLOPs, parameters, file size,
+  CPU latency and validation accuracy before and after fine-tuning
+
+Usage:
+    python prune_model.py [--model ./model/padang_food_model_optimized.keras] [--dataset ./dataset/train]
+                          [--sparsity 0.25 0.5] [--epochs 2] [--rescale 0.00392156862745098]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+import tensorflow as tf
+
+import data_pipeline
+import dataset_cache
+import dataset_split
+import model_eval
+import model_surgery
+import quantization
+
+DEFAULT_MODEL_PATH = "./model/padang_food_model_optimized.keras"
+DEFAULT_DATASET_PATH = "./dataset/train"
+REPORT_PATH = "./model/pruning_report"
+SPARSITY_LEVELS = (0.25, 0.5)
+FINE_TUNE_EPOCHS = 2
+FINE_TUNE_LR = 1e-4
+BATCH_SIZE = 32
+CHANNEL_MULTIPLE = 8
+MIN_CHANNELS = 8
+
+
+def pruned_path_for(model_path, sparsity):
+    root, ext = os.path.splitext(model_path)
+    return f"{root}_pruned{round(sparsity * 100)}{ext}"
+
+
+def select_channels(model, sparsity):
+    """{group name: kept channel indices} removing `sparsity` of every group."""
+    keep = {}
+    for group in model_surgery.channel_groups(model):
+        target = math.ceil(group.channels * (1 - sparsity) / CHANNEL_MULTIPLE) * CHANNEL_MULTIPLE
+        target = max(target, MIN_CHANNELS)
+        if target >= group.channels:
+            continue
+        scores = model_surgery.channel_importance(model, group)
+        keep[group.name] = np.sort(np.argsort(-scores, kind='stable')[:target])
+    return keep
+
+
+def measure(model, path=None):
+    """FLOPs, parameter count, CPU latency and (if saved) file size of one model."""
+    image = np.zeros(model.input_shape[1:], dtype=np.float32)
+    return {
+        'flops': model_surgery.count_flops(model),
+        'params': model_surgery.count_params(model),
+        'latencyMs': round(quantization.measure_latency_ms(model, image), 3),
+        'sizeBytes': os.path.getsize(path) if path else None,
+    }
+
+
+def prune_model(model_path=DEFAULT_MODEL_PATH, dataset_path=DEFAULT_DATASET_PATH, levels=SPARSITY_LEVELS,
+                epochs=FINE_TUNE_EPOCHS, rescale=None, report_path=REPORT_PATH):
+    """Prune, fine-tune and save one model per sparsity level; returns the report."""
+    model = tf.keras.models.load_model(model_path)
+    image_size = tuple(model.input_shape[1:3])
+    groups = model_surgery.channel_groups(model)
+    print(f"Loaded {model_path}: {len(groups)} prunable channel groups, "
+          f"{sum(g.channels for g in groups)} channels")
+
+    train_ds = val_ds = None
+    if dataset_path and os.path.isdir(dataset_path):
+        dataset_split.ensure_split(dataset_path)
+        train_ds, val_ds = data_pipeline.prepare_datasets(
+            dataset_path, image_size, BATCH_SIZE, rescale=rescale, cache=False,
+            materialized_root=dataset_cache.DEFAULT_CACHE_ROOT
+        )
+    else:
+        print(f"   [WARNING] No dataset at {dataset_path}; pruning without fine-tuning or accuracy")
+
+    base = {'sparsity': 0.0, 'path': model_path, **measure(model, model_path),
+            'valAccuracy': model_eval.evaluate(model, val_ds)}
+    rows = [base]
+    for sparsity in levels:
+        print(f"\nSparsity {sparsity:.0%}")
+        pruned = model_surgery.prune_channels(model, select_channels(model, sparsity))
+        row = {'sparsity': sparsity, 'prunedAccuracy': model_eval.evaluate(pruned, val_ds)}
+        if train_ds is not None and epochs:
+            model_eval.fine_tune(pruned, train_ds, val_ds, epochs, FINE_TUNE_LR, freeze_batchnorm=True)
+        output = pruned_path_for(model_path, sparsity)
+        pruned.save(output)
+        row.update({'path': output, **measure(pruned, output), 'valAccuracy': model_eval.evaluate(pruned, val_ds)})
+        for key in ('flops', 'params', 'latencyMs', 'sizeBytes'):
+            row[f"{key}Reduction"] = round(1 - row[key] / base[key], 4) if base[key] else None
+        if base['valAccuracy'] is not None:
+            row['accuracyDelta'] = round(row['valAccuracy'] - base['valAccuracy'], 4)
+        rows.append(row)
+        print(f"   {output}: {row['params']:,} params ({row['paramsReduction']:.0%} fewer), "
+              f"{row['flops'] / 1e6:.0f} MFLOPs ({row['flopsReduction']:.0%} fewer), "
+              f"{row['latencyMs']:.2f} ms, val accuracy {row['valAccuracy']}")
+
+    report = {'model': model_path, 'fineTuneEpochs': epochs, 'levels': rows}
+    with open(report_path + '.json', 'w') as f:
+        json.dump(report, f, indent=2)
+
+    md = f"""# Pruning Report
+Model: `{model_path}`, fine-tuned {epochs} epoch(s) per level at lr {FINE_TUNE_LR:g}
+
+| Sparsity | Params | MFLOPs | CPU Latency (ms) | Size | Val Acc (pruned) | Val Acc (fine-tuned) | Accuracy Delta |
+| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |
+"""
+
+    def reduction(row, key):
+        return '' if row is base else f" ({model_eval.fmt(row.get(key + 'Reduction'), '-{:.0%}')})"
+
+    for row in rows:
+        md += (f"| {row['sparsity']:.0%} "
+               f"| {row['params']:,}{reduction(row, 'params')} "
+               f"| {row['flops'] / 1e6:.1f}{reduction(row, 'flops')} "
+               f"| {row['latencyMs']:.2f}{reduction(row, 'latencyMs')} "
+               f"| {model_eval.fmt(row['sizeBytes'] and row['sizeBytes'] / 1024 / 1024, '{:.2f} MB')} "
+               f"| {model_eval.fmt(row.get('prunedAccuracy'), '{:.4f}')} "
+               f"| {model_eval.fmt(row['valAccuracy'], '{:.4f}')} "
+               f"| {model_eval.fmt(row.get('accuracyDelta', 0.0 if row is base else None), '{:+.4f}')} |\n")
+    with open(report_path + '.md', 'w', encoding='utf-8') as f:
+        f.write(md)
+    print(f"\nPruning report: {report_path}.md")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structured channel pruning with fine-tune recovery")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--dataset', default=DEFAULT_DATASET_PATH, help="Dataset for fine-tuning and accuracy")
+    parser.add_argument('--sparsity', type=float, nargs='+', default=list(SPARSITY_LEVELS),
+                        help="Fractions of channels to remove, one pruned model each")
+    parser.add_argument('--epochs', type=int, default=FINE_TUNE_EPOCHS, help="Fine-tune epochs per level (0 = none)")
+    parser.add_argument('--rescale', type=float,
+                        help="Input scale the model was trained with (1/255 for train_model.py's MobileNetV2)")
+    parser.add_argument('--report', default=REPORT_PATH, help="Report path without extension")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Error: model not found at {args.model}")
+        return 1
+    if not all(0 < s < 1 for s in args.sparsity):
+        print("Error: --sparsity values must be between 0 and 1")
+        return 1
+    prune_model(args.model, args.dataset, args.sparsity, args.epochs, args.rescale, args.report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Padang Food Recognition - Post-Training Weight Quantization
+- float16 / uint8 weight encodings understood by the TF.js weights loader
+- int8 per-channel full-integer TFLite model calibrated on dataset images
+- Report comparing size, CPU latency and validation accuracy vs float32
+"""
+
+import json
+import os
+import time
+
+import model_eval
+
+# Modes the TF.js exporters can write; int8 is produced as a TFLite artifact
+TFJS_QUANTIZATION_MODES = ('float32', 'float16', 'uint8')
+QUANTIZATION_MODES = TFJS_QUANTIZATION_MODES + ('int8',)
+
+DEFAULT_DATASET_PATH = "./dataset/train"
+REPORT_SAMPLES = 200
+LATENCY_RUNS = 30
+
+
+def quantize_weight(w, mode):
+    """Encode one weight array for a TF.js weights manifest.
+
+    Returns (array_to_write, quantization_spec or None). The manifest entry
+    keeps dtype float32; TF.js dequantizes according to the spec on load.
+    """
+    import numpy as np
+
+    w = np.asarray(w, dtype=np.float32)
+    if mode == 'float32':
+        return w, None
+    if mode == 'float16':
+        return w.astype(np.float16), {'dtype': 'float16', 'original_dtype': 'float32'}
+    if mode == 'uint8':
+        w_min, w_max = (float(w.min()), float(w.max())) if w.size else (0.0, 0.0)
+        scale = (w_max - w_min) / 255.0 or 1.0
+        q = np.clip(np.round((w - w_min) / scale), 0, 255).astype(np.uint8)
+        return q, {'dtype': 'uint8', 'min': w_min, 'scale': scale, 'original_dtype': 'float32'}
+    raise ValueError(f"Unsupported TF.js quantization: {mode}")
+
+
+def dequantize_weight(data, spec):
+    """Inverse of quantize_weight(), as the TF.js loader does it."""
+    import numpy as np
+
+    if spec is None or spec['dtype'] == 'float16':
+        return np.asarray(data, dtype=np.float32)
+    return data.astype(np.float32) * spec['scale'] + spec['min']
+
+
+def _int8_per_channel(w):
+    """Symmetric int8 per output channel (last axis), as TFLite does for kernels."""
+    import numpy as np
+
+    if w.ndim < 2:
+        return w
+    axes = tuple(range(w.ndim - 1))
+    scale = np.max(np.abs(w), axis=axes, keepdims=True) / 127.0
+    scale[scale == 0] = 1.0
+    return np.clip(np.round(w / scale), -127, 127) * scale
+
+
+def fake_quantize_model(model, mode):
+    """Clone `model` with weights round-tripped through `mode`.
+
+    Used to measure the accuracy cost of weight quantization with Keras.
+    """
+    import numpy as np
+    from tensorflow import keras
+
+    clone = keras.models.clone_model(model)
+    weights = []
+    for w in model.get_weights():
+        if mode == 'int8':
+            weights.append(_int8_per_channel(np.asarray(w, np.float32)).astype(w.dtype))
+        else:
+            data, spec = quantize_weight(w, mode)
+            weights.append(dequantize_weight(data, spec).astype(w.dtype))
+    clone.set_weights(weights)
+    return clone
+
+
+def tfjs_mode(mode):
+    """TF.js has no per-channel int8 encoding; int8 exports ship uint8 TF.js weights."""
+    return 'uint8' if mode == 'int8' else mode
+
+
+def float32_nbytes(model):
+    """Size of the model's weights stored unquantized."""
+    import numpy as np
+
+    return int(sum(np.asarray(w).size for w in model.get_weights()) * 4)
+
+
+def tfjs_weights_nbytes(output_dir):
+    """Total size of the weight files referenced by output_dir/model.json."""
+    with open(os.path.join(output_dir, 'model.json')) as f:
+        manifest = json.load(f)['weightsManifest']
+    return sum(os.path.getsize(os.path.join(output_dir, path))
+               for group in manifest for path in group['paths'])
+
+
+def load_sample(dataset_path, image_size, n=REPORT_SAMPLES, rescale=None, subset='validation'):
+    """Evenly spaced sample of one split as (images, labels) arrays."""
+    import numpy as np
+
+    import data_pipeline
+
+    class_indices, subsets = data_pipeline.list_image_files(dataset_path)
+    paths, labels = subsets[subset]
+    if not paths:
+        return None, None
+    picks = np.linspace(0, len(paths) - 1, num=min(n, len(paths))).astype(int)
+    ds = data_pipeline.build_dataset(
+        [paths[i] for i in picks], [labels[i] for i in picks], len(class_indices),
+        image_size, batch_size=32, rescale=rescale, cache=False
+    )
+    images = np.concatenate([x.numpy() for x, _ in ds])
+    return images, np.asarray([labels[i] for i in picks])
+
+
+def export_int8_tflite(model, output_path, dataset_path=DEFAULT_DATASET_PATH, rescale=None,
+                       calibration_samples=REPORT_SAMPLES):
+    """Write a full-integer per-channel TFLite model calibrated on training images."""
+    from tflite_export import convert_tflite
+
+    images, _ = load_sample(dataset_path, tuple(model.input_shape[1:3]), calibration_samples,
+                            rescale, subset='training')
+    print(f"   Calibrating int8 on {len(images)} training images...")
+    content = convert_tflite(model, 'int8', representative_images=images)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, output_path)
+    print(f"   int8 TFLite model: {output_path} ({len(content) / 1024 / 1024:.2f} MB)")
+    return content
+
+
+def export_report_and_tflite(cache, get_model, model_digest, data_digest, tfjs_key, quantize, tflite,
+                             model_path, output_dir, report_path, dataset_path=DEFAULT_DATASET_PATH,
+                             rescale=None, weights_nbytes=None, config=None):
+    """Quantization-report and TFLite stages shared by the three exporters.
+
+    Both run through `cache` (an export_cache.ExportCache), so they are
+    skipped while the model, dataset, TF.js stage (`tfjs_key`, None if it
+    failed) and settings are unchanged. `get_model` loads the model only if
+    a stage has to be built. `weights_nbytes` is the size of the exported
+    TF.js weights when the exporter already knows it; otherwise it is read
+    from output_dir/model.json. `config` adds exporter settings (e.g.
+    {'optimize': True}) to both stage keys; a non-None `rescale` is keyed too.
+    """
+    import export_cache
+    import tflite_export
+
+    weights_mode = tfjs_mode(quantize)
+    config = dict(config or {})
+    if rescale is not None:
+        config['rescale'] = rescale
+
+    int8_path = tflite_export.tflite_path_for(model_path, 'int8')
+    report_outputs = [report_path + '.md', report_path + '.json'] + ([int8_path] if quantize == 'int8' else [])
+    report_key = export_cache.stage_key(
+        'quantization-report', {'model': model_digest, 'dataset': data_digest, 'tfjs': tfjs_key},
+        {'quantize': quantize, **config}
+    )
+
+    def write_report():
+        sizes = {'float32': float32_nbytes(get_model())}
+        try:
+            sizes[weights_mode] = weights_nbytes or tfjs_weights_nbytes(output_dir)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"   [WARNING] Could not measure TF.js weights: {e}")
+        tflite_content = None
+        if quantize == 'int8':
+            tflite_content = export_int8_tflite(get_model(), int8_path, dataset_path, rescale)
+            sizes['int8'] = len(tflite_content)
+        write_quantization_report(
+            get_model(), quantize, sizes, report_path,
+            dataset_path=dataset_path, rescale=rescale, tflite_content=tflite_content
+        )
+
+    cache.run(f"report {report_path}", report_key, report_outputs, write_report)
+
+    # TFLite model next to the Keras model for CPU server-side inference
+    # (with --quantize int8 the report stage already wrote the int8 one)
+    if tflite != 'none' and not (tflite == 'int8' and quantize == 'int8'):
+        tflite_path = tflite_export.tflite_path_for(model_path, tflite)
+        tflite_key = export_cache.stage_key(
+            'tflite', {'model': model_digest, 'dataset': data_digest if tflite == 'int8' else None},
+            {'mode': tflite, **config}
+        )
+        cache.run(f"tflite {tflite_path}", tflite_key, [tflite_path],
+                  lambda: tflite_export.export_tflite(get_model(), tflite_path, tflite, dataset_path, rescale))
+
+
+def measure_accuracy(predictor, images, labels, batch_size=32):
+    import numpy as np
+
+    correct = 0
+    for start in range(0, len(images), batch_size):
+        probs = np.asarray(predictor.predict_on_batch(images[start:start + batch_size]))
+        correct += int(np.sum(np.argmax(probs, axis=1) == labels[start:start + batch_size]))
+    return correct / len(images)
+
+
+def measure_latency_ms(predictor, image, runs=LATENCY_RUNS):
+    """Median single-image CPU latency after one warm-up call."""
+    import numpy as np
+
+    batch = np.expand_dims(image, 0)
+    predictor.predict_on_batch(batch)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predictor.predict_on_batch(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def write_quantization_report(model, mode, sizes, report_path, dataset_path=DEFAULT_DATASET_PATH,
+                              rescale=None, tflite_content=None, samples=REPORT_SAMPLES):
+    """Compare float32 vs the quantized artifacts on size, latency and validation accuracy.
+
+    sizes: {mode: bytes} of every exported artifact, including 'float32'.
+    tflite_content: int8 TFLite flatbuffer, measured directly for the 'int8' row;
+    other modes are measured with a fake-quantized Keras clone.
+    Writes `<report_path>.md` and `<report_path>.json`.
+    """
+    image_size = tuple(model.input_shape[1:3])
+    images, labels = (None, None)
+    if dataset_path and os.path.isdir(dataset_path):
+        images, labels = load_sample(dataset_path, image_size, samples, rescale)
+    if images is None:
+        print(f"   [WARNING] No validation images at {dataset_path}; report covers size only")
+
+    variants = [('float32', model)]
+    for name in sizes:
+        if name == 'float32':
+            continue
+        if name == 'int8' and tflite_content is not None:
+            from tflite_export import TFLiteModel
+            variants.append((name, TFLiteModel(model_content=tflite_content)))
+        else:
+            variants.append((name, fake_quantize_model(model, name)))
+
+    rows = []
+    for name, predictor in variants:
+        row = {'mode': name, 'sizeBytes': sizes.get(name)}
+        if images is not None:
+            row['latencyMs'] = round(measure_latency_ms(predictor, images[0]), 3)
+            row['valAccuracy'] = round(measure_accuracy(predictor, images, labels), 4)
+        rows.append(row)
+
+    base = rows[0]
+    for row in rows[1:]:
+        if base.get('sizeBytes') and row.get('sizeBytes'):
+            row['sizeRatio'] = round(base['sizeBytes'] / row['sizeBytes'], 2)
+        if 'valAccuracy' in row:
+            row['accuracyDelta'] = round(row['valAccuracy'] - base['valAccuracy'], 4)
+            row['latencyDeltaMs'] = round(row['latencyMs'] - base['latencyMs'], 3)
+
+    report = {'mode': mode, 'samples': 0 if images is None else len(images), 'variants': rows}
+    with open(report_path + '.json', 'w') as f:
+        json.dump(report, f, indent=2)
+
+    md = f"""# Quantization Report ({mode})
+Validation sample: {report['samples']} images from `{dataset_path}`
+
+| Mode | Size | Size Ratio | CPU Latency (ms) | Val Accuracy | Accuracy Delta |
+| :--- | :--- | :--- | :--- | :--- | :--- |
+"""
+    for row in rows:
+        size = row.get('sizeBytes')
+        md += (f"| {row['mode']} | {model_eval.fmt(size and size / 1024 / 1024, '{:.2f} MB')} "
+               f"| {model_eval.fmt(row.get('sizeRatio', 1.0 if row is base else None), '{:.2f}x')} "
+               f"| {model_eval.fmt(row.get('latencyMs'), '{:.2f}')} "
+               f"| {model_eval.fmt(row.get('valAccuracy'), '{:.4f}')} "
+               f"| {model_eval.fmt(row.get('accuracyDelta', 0.0 if row is base else None), '{:+.4f}')} |\n")
+    with open(report_path + '.md', 'w', encoding='utf-8') as f:
+        f.write(md)
+
+    print(f"   Quantization report: {report_path}.md")
+    return report
@@ -0,0 +1,277 @@
+"""
+Padang Food Recognition - Multi-Resolution Model Variants
+Builds copies of a trained model at several input resolutions and writes an
+accuracy / CPU latency / size Pareto table, so a cheaper variant can be
+picked for low-end devices from measurements.
+
+- Default: each variant starts from the trained (224px) model's weights,
+  which fit any input size (the backbones are fully convolutional and pool
+  globally), and is briefly fine-tuned at its own resolution with
+  BatchNormalization statistics re-estimated for the new object scale
+- --from-scratch instead runs the whole trainer (train_model.py or
+  train_model_optimized.py) with IMAGE_SIZE overridden, like sweep.py
+- Per variant: <model>_<size>px.keras, a TFLite model (--tflite) and
+  <model>_<size>px_metadata.json with its imageSize (from
+  public/model/metadata.json when present)
+- Report (model/resolution_report.md/.json): validation accuracy, MFLOPs,
+  median single-image CPU latency (TFLite with XNNPACK, else Keras) and
+  artifact size, with the Pareto-optimal variants marked
+
+Publish a variant with:
+    python convert_model.py --model ./model/padang_food_model_optimized_160px.keras
+
+Usage:
+    python resolution_variants.py [--model ./model/padang_food_model_optimized.keras] [--dataset ./dataset/train]
+                                  [--sizes 128 160 192 224] [--epochs 2] [--rescale 0.00392156862745098]
+                                  [--tflite none|float32|float16|int8]
+    python resolution_variants.py --from-scratch [--arch mobilenet|efficientnet] [--sizes 128 160 192 224]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import tensorflow as tf
+
+import data_pipeline
+import dataset_cache
+import dataset_split
+import model_eval
+import model_surgery
+import quantization
+import tflite_export
+
+DEFAULT_MODEL_PATH = "./model/padang_food_model_optimized.keras"
+DEFAULT_DATASET_PATH = "./dataset/train"
+METADATA_TEMPLATE_PATH = "./public/model/metadata.json"
+REPORT_PATH = "./model/resolution_report"
+SIZES = (128, 160, 192, 224)
+FINE_TUNE_EPOCHS = 2
+FINE_TUNE_LR = 1e-4
+BATCH_SIZE = 32
+TFLITE_MODE = 'float16'
+# --from-scratch: trainer module, the model file it saves and its input scale
+TRAINERS = {
+    'mobilenet': ('train_model', 'padang_food_model.keras', 1. / 255),
+    'efficientnet': ('train_model_optimized', 'padang_food_model_optimized.keras', None),
+}
+
+
+def variant_path_for(model_path, size):
+    root, ext = os.path.splitext(model_path)
+    return f"{root}_{size}px{ext}"
+
+
+def metadata_path_for(variant_path):
+    return f"{os.path.splitext(variant_path)[0]}_metadata.json"
+
+
+def resize_model(model, size):
+    """Copy of `model` taking (size, size) inputs, with the same weights."""
+    config = model.get_config()
+    for layer_config in config['layers']:
+        # Recorded build shapes carry the old spatial size
+        layer_config.pop('build_config', None)
+        if layer_config['class_name'] == 'InputLayer':
+            batch_shape = layer_config['config']['batch_shape']
+            layer_config['config']['batch_shape'] = [batch_shape[0], size, size, *batch_shape[3:]]
+    resized = model.__class__.from_config(config)
+    resized.set_weights(model.get_weights())
+    return resized
+
+
+def load_data(dataset_path, size, rescale):
+    if not dataset_path or not os.path.isdir(dataset_path):
+        return None, None
+    return data_pipeline.prepare_datasets(
+        dataset_path, (size, size), BATCH_SIZE, rescale=rescale, cache=False,
+        materialized_root=dataset_cache.DEFAULT_CACHE_ROOT
+    )
+
+
+def train_from_scratch(arch, size, model_path, dataset_path):
+    """Run a trainer end to end at `size`; returns the path of the model it saved."""
+    module_name, model_file, _ = TRAINERS[arch]
+    trainer = importlib.import_module(module_name)
+    variant_dir = os.path.join(os.path.dirname(model_path) or '.', f"variant_{size}px")
+    trainer.DATASET_PATH = dataset_path
+    trainer.IMAGE_SIZE = (size, size)
+    trainer.MODEL_OUTPUT_DIR = variant_dir
+    trainer.CHECKPOINT_DIR = os.path.join(variant_dir, "checkpoints")
+    if hasattr(trainer, 'TFJS_OUTPUT_DIR'):
+        # Keep the trainer from overwriting the published metadata.json
+        trainer.TFJS_OUTPUT_DIR = variant_dir
+    trainer.train_model()
+    tf.keras.backend.clear_session()
+    return os.path.join(variant_dir, model_file)
+
+
+def write_metadata(variant_path, size, row):
+    """Variant metadata: the published metadata.json (classes etc.) with this resolution."""
+    metadata = {}
+    if os.path.exists(METADATA_TEMPLATE_PATH):
+        with open(METADATA_TEMPLATE_PATH) as f:
+            metadata = json.load(f)
+    metadata['imageSize'] = size
+    if row['valAccuracy'] is not None:
+        metadata['accuracy'] = row['valAccuracy']
+    metadata['variant'] = {
+        'model': os.path.basename(variant_path),
+        'tflite': row['tflite'] and os.path.basename(row['tflite']),
+        'latencyMs': row['latencyMs'],
+        'sizeBytes': row['sizeBytes'],
+    }
+    path = metadata_path_for(variant_path)
+    with open(path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return path
+
+
+def measure(model, variant_path, tflite_mode, dataset_path, rescale):
+    """MFLOPs, CPU latency and artifact size of one variant (TFLite when exported)."""
+    image = np.zeros(model.input_shape[1:], dtype=np.float32)
+    row = {'mflops': round(model_surgery.count_flops(model) / 1e6, 1), 'kerasBytes': os.path.getsize(variant_path),
+           'tflite': None}
+    predictor = model
+    if tflite_mode != 'none':
+        tflite_path = tflite_export.tflite_path_for(variant_path, tflite_mode)
+        content = tflite_export.export_tflite(model, tflite_path, tflite_mode, dataset_path, rescale)
+        predictor = tflite_export.TFLiteModel(model_content=content)
+        row.update({'tflite': tflite_path, 'sizeBytes': len(content)})
+    else:
+        row['sizeBytes'] = row['kerasBytes']
+    row['latencyMs'] = round(quantization.measure_latency_ms(predictor, image), 3)
+    return row
+
+
+def pareto_front(rows):
+    """Mark rows no other row beats on accuracy, latency and size at once."""
+    def key(row):
+        return (row['valAccuracy'] if row['valAccuracy'] is not None else 0.0), -row['latencyMs'], -row['sizeBytes']
+
+    for row in rows:
+        mine = key(row)
+        row['pareto'] = not any(
+            all(a >= b for a, b in zip(key(other), mine)) and key(other) != mine for other in rows
+        )
+    return rows
+
+
+def write_report(rows, report, report_path=REPORT_PATH):
+    with open(report_path + '.json', 'w') as f:
+        json.dump(report, f, indent=2)
+
+    artifact = f"TFLite {report['tflite']}" if report['tflite'] != 'none' else "Keras"
+    md = f"""# Resolution Variants Report
+Source: `{report['source']}` ({report['method']})
+
+| Resolution | Val Accuracy | MFLOPs | CPU Latency (ms) | Size ({artifact}) | Pareto | Model |
+| :--- | :--- | :--- | :--- | :--- | :--- | :--- |
+"""
+    for row in rows:
+        md += (f"| {row['size']}px | {model_eval.fmt(row['valAccuracy'], '{:.4f}')} | {row['mflops']:.1f} "
+               f"| {row['latencyMs']:.2f} | {row['sizeBytes'] / 1024 / 1024:.2f} MB "
+               f"| {'yes' if row['pareto'] else ''} | `{os.path.basename(row['path'])}` |\n")
+    md += "\nPareto = no other variant is at least as accurate, as fast and as small at once.\n"
+    with open(report_path + '.md', 'w', encoding='utf-8') as f:
+        f.write(md)
+    print(f"\nResolution report: {report_path}.md")
+
+
+def build_variants(model_path=DEFAULT_MODEL_PATH, dataset_path=DEFAULT_DATASET_PATH, sizes=SIZES,
+                   epochs=FINE_TUNE_EPOCHS, rescale=None, tflite_mode=TFLITE_MODE, from_scratch=None,
+                   report_path=REPORT_PATH):
+    """Build, measure and save one variant per size; returns the report."""
+    if dataset_path and os.path.isdir(dataset_path):
+        dataset_split.ensure_split(dataset_path)
+    else:
+        print(f"   [WARNING] No dataset at {dataset_path}; variants without fine-tuning or accuracy")
+
+    base = None
+    if not from_scratch:
+        base = tf.keras.models.load_model(model_path)
+        print(f"Loaded {model_path} ({base.input_shape[1]}x{base.input_shape[2]} input)")
+    else:
+        rescale = TRAINERS[from_scratch][2]
+        model_path = os.path.join(os.path.dirname(model_path) or '.', TRAINERS[from_scratch][1])
+
+    rows = []
+    for size in sorted(sizes):
+        print(f"\nVariant {size}x{size}")
+        variant_path = variant_path_for(model_path, size)
+        if from_scratch:
+            trained_path = train_from_scratch(from_scratch, size, model_path, dataset_path)
+            shutil.copyfile(trained_path, variant_path)
+            model = tf.keras.models.load_model(variant_path)
+            _, val_ds = load_data(dataset_path, size, rescale)
+            source = 'trained'
+        elif base.input_shape[1:3] == (size, size):
+            model = base
+            _, val_ds = load_data(dataset_path, size, rescale)
+            source = 'original'
+        else:
+            model = resize_model(base, size)
+            train_ds, val_ds = load_data(dataset_path, size, rescale)
+            source = 'resized'
+            if train_ds is not None and epochs:
+                # BatchNorm statistics adapt to the new resolution
+                model_eval.fine_tune(model, train_ds, val_ds, epochs, FINE_TUNE_LR)
+                source = 'fine-tuned'
+        if source != 'trained':
+            model.save(variant_path)
+
+        row = {'size': size, 'path': variant_path, 'source': source, 'valAccuracy': model_eval.evaluate(model, val_ds),
+               **measure(model, variant_path, tflite_mode, dataset_path, rescale)}
+        row['metadata'] = write_metadata(variant_path, size, row)
+        rows.append(row)
+        print(f"   {variant_path} ({source}): val accuracy {row['valAccuracy']}, {row['mflops']:.0f} MFLOPs, "
+              f"{row['latencyMs']:.2f} ms, {row['sizeBytes'] / 1024 / 1024:.2f} MB")
+        if model is not base:
+            del model
+            tf.keras.backend.clear_session()
+
+    pareto_front(rows)
+    report = {
+        'source': model_path,
+        'method': f"trained from scratch ({from_scratch})" if from_scratch else f"fine-tuned {epochs} epoch(s)",
+        'tflite': tflite_mode,
+        'variants': rows,
+    }
+    write_report(rows, report, report_path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build input-resolution variants and a Pareto report")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help="Trained model the variants start from")
+    parser.add_argument('--dataset', default=DEFAULT_DATASET_PATH, help="Dataset for fine-tuning and accuracy")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help="Input resolutions (square)")
+    parser.add_argument('--epochs', type=int, default=FINE_TUNE_EPOCHS,
+                        help="Fine-tune epochs per resized variant (0 = reuse the weights as-is)")
+    parser.add_argument('--rescale', type=float,
+                        help="Input scale the model was trained with (1/255 for train_model.py's MobileNetV2)")
+    parser.add_argument('--tflite', choices=tflite_export.TFLITE_MODES, default=TFLITE_MODE,
+                        help="TFLite export per variant, also used for latency and size ('none' = Keras)")
+    parser.add_argument('--from-scratch', action='store_true',
+                        help="Train every variant with the full trainer instead of fine-tuning --model")
+    parser.add_argument('--arch', choices=TRAINERS, default='efficientnet', help="Trainer for --from-scratch")
+    parser.add_argument('--report', default=REPORT_PATH, help="Report path without extension")
+    args = parser.parse_args()
+
+    if not args.from_scratch and not os.path.exists(args.model):
+        print(f"Error: model not found at {args.model}")
+        return 1
+    if any(size < 32 for size in args.sizes):
+        print("Error: --sizes must be at least 32")
+        return 1
+    build_variants(args.model, args.dataset, args.sizes, args.epochs, args.rescale, args.tflite,
+                   args.arch if args.from_scratch else None, args.report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -407,10 +407,12 @@ export const useImageClassification = () => {
       });
 
       // Create canvas for analysis
+      // Custom models may be a lower-resolution variant (metadata.imageSize); the fallback MobileNet is 224
+      const inputSize = (isCustomModelRef.current && metadataRef.current?.imageSize) || 224;
       const canvas = document.createElement('canvas');
       const ctx = canvas.getContext('2d')!;
-      canvas.width = 224;
-      canvas.height = 224;
+      canvas.width = inputSize;
+      canvas.height = inputSize;
 
       // IMPLEMENTATION: Center Crop Strategy
       // This preserves aspect ratio features (plates, shapes) instead of squashing
@@ -419,7 +421,7 @@ export const useImageClassification = () => {
       const startY = (img.height - minDimension) / 2;
 
       // Draw cropped center square to canvas
-      ctx.drawImage(img, startX, startY, minDimension, minDimension, 0, 0, 224, 224);
+      ctx.drawImage(img, startX, startY, minDimension, minDimension, 0, 0, inputSize, inputSize);
 
       let predictions: PredictionResult[];
 
@@ -0,0 +1,334 @@
+"""
+Padang Food Recognition - Hyperparameter Sweep (ASHA)
+Runs trials of a training script's create_model() in a process pool and
+stops weak trials early with asynchronous successive halving (ASHA).
+
+- Search space: JSON mapping the trainer's module constants to a list of
+  choices or {"uniform": [lo, hi]} / {"log_uniform": [lo, hi]} /
+  {"int": [lo, hi]}; see DEFAULT_SPACE
+- Budget is epochs. Every trial starts at the lowest rung (--min-epochs);
+  each time a worker frees up, the best 1/eta of a rung's trials is promoted
+  to the next one (eta x the epochs). A promoted trial continues from its
+  checkpoint (training_state.py) instead of starting over
+- Each worker process gets `--threads` TF/OpenMP threads (default
+  cores / workers), so parallel trials do not oversubscribe the CPU
+- The manifest, split index and shards are prepared once by the parent;
+  workers read them with the trainer's IMAGE_SIZE/BATCH_SIZE and rescale
+  (always the tf.data pipeline, without the in-memory cache)
+- The leaderboard (CSV + JSON) is rewritten after every finished rung
+
+Usage:
+    python sweep.py [--trainer mobilenet|efficientnet] [--space space.json]
+                    [--trials 27] [--workers 3] [--min-epochs 2] [--max-epochs 18] [--eta 3]
+"""
+
+import argparse
+import csv
+import importlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+SWEEP_ROOT = "./model/sweeps"
+TRAINERS = {
+    # name: (module, Phase 2 optimizer used by that script, input rescale of its prepare_data())
+    'mobilenet': ('train_model', 'Adam', 1. / 255),
+    'efficientnet': ('train_model_optimized', 'AdamW', None),
+}
+DEFAULT_SPACE = {
+    'BATCH_SIZE': [16, 32, 64],
+    'EPOCHS_HEAD': [2, 4, 6],
+    'FINE_TUNE_LAYERS': [30, 60, None],
+    'DROPOUT': {'uniform': [0.1, 0.5]},
+    'HEAD_LR': {'log_uniform': [1e-4, 3e-3]},
+    'FINE_TUNE_LR': {'log_uniform': [1e-6, 1e-4]},
+}
+TRIALS = 27
+MIN_EPOCHS = 2
+MAX_EPOCHS = 18
+ETA = 3
+SEED = 42
+
+
+def sample_params(space, rng):
+    params = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            params[name] = rng.choice(spec)
+        elif 'uniform' in spec:
+            params[name] = rng.uniform(*spec['uniform'])
+        elif 'log_uniform' in spec:
+            lo, hi = spec['log_uniform']
+            params[name] = math.exp(rng.uniform(math.log(lo), math.log(hi)))
+        elif 'int' in spec:
+            params[name] = rng.randint(*spec['int'])
+        else:
+            raise ValueError(f"Unsupported search space entry for {name}: {spec}")
+    return params
+
+
+def rung_budgets(min_epochs, max_epochs, eta):
+    """Epoch budget of each rung: min, min*eta, ... capped at (and ending on) max."""
+    budgets = [min_epochs]
+    while budgets[-1] < max_epochs:
+        budgets.append(min(budgets[-1] * eta, max_epochs))
+    return budgets
+
+
+def _init_worker(threads):
+    # Must run before TensorFlow is imported in this process
+    for var in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def run_rung(trainer_name, params, epochs, trial_dir, dataset_path, seed, materialized_root=None):
+    """Train one trial up to `epochs` total epochs (continuing its checkpoint).
+
+    The parent has already updated the manifest, written the split and built
+    the shards under `materialized_root`; the worker only reads them.
+    """
+    import tensorflow as tf
+    from tensorflow import keras
+
+    import data_pipeline
+    import training_modes
+    import training_state
+
+    start = time.perf_counter()
+    module_name, fine_tune_optimizer, rescale = TRAINERS[trainer_name]
+    trainer = importlib.import_module(module_name)
+    for name, value in params.items():
+        setattr(trainer, name, value)
+    trainer.DATASET_PATH = dataset_path
+    keras.utils.set_random_seed(seed)
+    training_modes.configure_precision(trainer.MIXED_PRECISION)
+
+    # Not trainer.prepare_data(): that rescans the manifest (and quarantines) and
+    # keeps an in-memory copy of the decoded dataset in every worker
+    train_ds, val_ds = data_pipeline.prepare_datasets(
+        dataset_path, tuple(trainer.IMAGE_SIZE), trainer.BATCH_SIZE, rescale=rescale,
+        cache=False, materialized_root=materialized_root
+    )
+    model, base_model = trainer.create_model(len(train_ds.class_indices))
+    run = training_state.ResumableRun(trial_dir, ('head', 'fine'),
+                                      resume=os.path.exists(trial_dir), every=10 ** 9)
+
+    head_epochs = min(trainer.EPOCHS_HEAD, epochs)
+    history = None
+    model.compile(optimizer=keras.optimizers.Adam(trainer.HEAD_LR), loss='categorical_crossentropy',
+                  metrics=['accuracy'], jit_compile=trainer.JIT_COMPILE)
+    if run.should_run('head', head_epochs):
+        history = model.fit(train_ds, validation_data=val_ds, epochs=head_epochs, verbose=0,
+                            initial_epoch=run.initial_epoch('head', 0), callbacks=[run.checkpoint('head', [])])
+
+    if epochs > trainer.EPOCHS_HEAD:
+        base_model.trainable = True
+        if trainer.FINE_TUNE_LAYERS:
+            for layer in base_model.layers[:-trainer.FINE_TUNE_LAYERS]:
+                layer.trainable = False
+        optimizer = keras.optimizers.get({'class_name': fine_tune_optimizer,
+                                          'config': {'learning_rate': trainer.FINE_TUNE_LR}})
+        model.compile(optimizer=optimizer, loss='categorical_crossentropy',
+                      metrics=['accuracy'], jit_compile=trainer.JIT_COMPILE)
+        history = model.fit(train_ds, validation_data=val_ds, epochs=epochs, verbose=0,
+                            initial_epoch=run.initial_epoch('fine', trainer.EPOCHS_HEAD),
+                            callbacks=[run.checkpoint('fine', [])])
+
+    if history is not None and history.history.get('val_accuracy'):
+        val_loss, val_acc = history.history['val_loss'][-1], history.history['val_accuracy'][-1]
+    else:
+        run.restore_weights(model)
+        val_loss, val_acc = model.evaluate(val_ds, verbose=0)
+    tf.keras.backend.clear_session()
+    return {'epochs': epochs, 'valAccuracy': float(val_acc), 'valLoss': float(val_loss),
+            'seconds': time.perf_counter() - start}
+
+
+class ASHA:
+    """Asynchronous successive halving over a fixed number of sampled trials."""
+
+    def __init__(self, n_trials, budgets, eta):
+        self.n_trials = n_trials
+        self.budgets = budgets
+        self.eta = eta
+        self.started = 0
+        self.results = [dict() for _ in budgets]  # rung -> {trial: valAccuracy}
+        self.promoted = [set() for _ in budgets]
+
+    def next_job(self):
+        """(trial, rung) to run next: a promotion if one is due, else a new trial, else None."""
+        for rung in reversed(range(len(self.budgets) - 1)):
+            done = self.results[rung]
+            top = sorted(done, key=done.get, reverse=True)[:len(done) // self.eta]
+            for trial in top:
+                if trial not in self.promoted[rung]:
+                    self.promoted[rung].add(trial)
+                    return trial, rung + 1
+        if self.started < self.n_trials:
+            self.started += 1
+            return self.started - 1, 0
+        return None
+
+    def report(self, trial, rung, accuracy):
+        self.results[rung][trial] = accuracy
+
+
+def write_leaderboard(sweep_dir, trials, budgets):
+    rows = []
+    for trial_id, trial in trials.items():
+        last = trial['rungs'][-1] if trial['rungs'] else {}
+        status = trial['status']
+        if status == 'idle':
+            status = 'completed' if last.get('epochs') == budgets[-1] else 'stopped'
+        rows.append({
+            'trial': trial_id,
+            'status': status,
+            'epochs': last.get('epochs', 0),
+            'val_accuracy': last.get('valAccuracy'),
+            'val_loss': last.get('valLoss'),
+            'wall_s': round(sum(r['seconds'] for r in trial['rungs']), 1),
+            **trial['params'],
+        })
+    rows.sort(key=lambda r: (-r['epochs'], -(r['val_accuracy'] or 0)))
+
+    if rows:
+        with open(os.path.join(sweep_dir, 'leaderboard.csv'), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    with open(os.path.join(sweep_dir, 'leaderboard.json'), 'w') as f:
+        json.dump({'budgets': budgets, 'trials': trials}, f, indent=2)
+    return rows
+
+
+def sweep(trainer_name='mobilenet', space=None, n_trials=TRIALS, workers=None, threads=None,
+          min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA, seed=SEED, dataset_path=None, name=None):
+    space = space or DEFAULT_SPACE
+    trainer = importlib.import_module(TRAINERS[trainer_name][0])
+    unknown = [key for key in space if not hasattr(trainer, key)]
+    if unknown:
+        raise ValueError(f"{TRAINERS[trainer_name][0]} has no constants {', '.join(unknown)}")
+    dataset_path = dataset_path or trainer.DATASET_PATH
+
+    cpus = os.cpu_count() or 1
+    workers = workers or max(1, min(4, cpus // 2))
+    threads = threads or max(1, cpus // workers)
+    budgets = rung_budgets(min_epochs, max_epochs, eta)
+    name = name or time.strftime(f'{trainer_name}-%Y%m%d-%H%M%S')
+    sweep_dir = os.path.join(SWEEP_ROOT, name)
+    os.makedirs(sweep_dir, exist_ok=True)
+
+    # Shared preparation once, so trials never race on the manifest, split or shards
+    import dataset_manifest
+    import dataset_split
+    dataset_manifest.update_manifest(dataset_path)
+    dataset_split.ensure_split(dataset_path)
+    # Shards for every image size a trial can sample; without them trials decode JPEGs
+    materialized_root = getattr(trainer, 'MATERIALIZED_CACHE_DIR', None)
+    image_sizes = space.get('IMAGE_SIZE', [trainer.IMAGE_SIZE])
+    if 'MATERIALIZED_CACHE_DIR' in space or not isinstance(image_sizes, list):
+        materialized_root = None
+    if materialized_root:
+        import dataset_cache
+        for image_size in image_sizes:
+            dataset_cache.materialize(dataset_path, tuple(image_size), materialized_root)
+
+    print(f"Sweep {name}: {n_trials} trials of {trainer_name}, rungs {budgets} epochs (eta {eta}), "
+          f"{workers} workers x {threads} threads")
+    rng = random.Random(seed)
+    trials = {}
+    scheduler = ASHA(n_trials, budgets, eta)
+    start = time.perf_counter()
+
+    # spawn: TensorFlow state must not be forked, and thread limits apply before import
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        running = {}
+
+        def submit():
+            while len(running) < workers:
+                job = scheduler.next_job()
+                if job is None:
+                    return
+                trial_id, rung = job
+                if trial_id not in trials:
+                    trials[trial_id] = {'params': sample_params(space, rng), 'rungs': [], 'status': 'idle'}
+                trials[trial_id]['status'] = 'running'
+                future = pool.submit(run_rung, trainer_name, trials[trial_id]['params'], budgets[rung],
+                                     os.path.join(sweep_dir, f"trial_{trial_id:03d}"), dataset_path,
+                                     seed + trial_id, materialized_root)
+                running[future] = (trial_id, rung)
+
+        submit()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                trial_id, rung = running.pop(future)
+                trial = trials[trial_id]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    trial['status'] = 'failed'
+                    trial['error'] = f"{type(e).__name__}: {e}"
+                    print(f"   trial {trial_id:3d} FAILED at rung {rung}: {trial['error']}")
+                    continue
+                trial['rungs'].append(result)
+                trial['status'] = 'idle'
+                scheduler.report(trial_id, rung, result['valAccuracy'])
+                print(f"   trial {trial_id:3d} rung {rung} ({result['epochs']:3d} epochs): "
+                      f"val_acc {result['valAccuracy']:.4f} in {result['seconds']:.0f}s")
+            write_leaderboard(sweep_dir, trials, budgets)
+            submit()
+
+    rows = write_leaderboard(sweep_dir, trials, budgets)
+    print(f"\nSweep finished in {time.perf_counter() - start:.0f}s -> {sweep_dir}/leaderboard.csv")
+    print(f"{'trial':>5} {'status':>10} {'epochs':>6} {'val_acc':>8} {'wall_s':>8}  params")
+    for row in rows[:10]:
+        params = ", ".join(f"{k}={v:.3g}" if isinstance(v, float) else f"{k}={v}"
+                           for k, v in trials[row['trial']]['params'].items())
+        acc = f"{row['val_accuracy']:.4f}" if row['val_accuracy'] is not None else 'n/a'
+        print(f"{row['trial']:>5} {row['status']:>10} {row['epochs']:>6} {acc:>8} {row['wall_s']:>8}  {params}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep with ASHA early stopping")
+    parser.add_argument('--trainer', choices=sorted(TRAINERS), default='mobilenet')
+    parser.add_argument('--space', help="JSON search space file (default: DEFAULT_SPACE)")
+    parser.add_argument('--trials', type=int, default=TRIALS)
+    parser.add_argument('--workers', type=int, help="Parallel trial processes")
+    parser.add_argument('--threads', type=int, help="TF/OpenMP threads per trial (default: cores / workers)")
+    parser.add_argument('--min-epochs', type=int, default=MIN_EPOCHS)
+    parser.add_argument('--max-epochs', type=int, default=MAX_EPOCHS)
+    parser.add_argument('--eta', type=int, default=ETA, help="Promote the top 1/eta of each rung")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--dataset', help="Dataset root (default: the trainer's DATASET_PATH)")
+    parser.add_argument('--name', help="Sweep directory name under model/sweeps")
+    args = parser.parse_args()
+
+    space = None
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    try:
+        sweep(args.trainer, space, args.trials, args.workers, args.threads, args.min_epochs,
+              args.max_epochs, args.eta, args.seed, args.dataset, args.name)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Padang Food Recognition - dataset_split.py Tests
+Runs on a synthetic manifest (no image files needed).
+
+Usage:
+    python -m pytest test_dataset_split.py
+"""
+
+import json
+import os
+
+import pytest
+
+import dataset_manifest
+import dataset_split
+import dedup_dataset
+
+COUNTS = {'ayam_pop': 50, 'rendang': 20, 'telur_balado': 7}
+
+
+def write_manifest(dataset_path, counts):
+    files = {f"{name}/img_{i:03d}.jpg": {'status': 'ok', 'class': name}
+             for name, n in counts.items() for i in range(n)}
+    manifest = {'version': dataset_manifest.MANIFEST_VERSION, 'classes': sorted(counts), 'files': files,
+                'quarantined': [], 'history': []}
+    with open(dataset_manifest.manifest_path_for(dataset_path), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def write_clusters(dataset_path, clusters):
+    with open(dedup_dataset.clusters_path_for(dataset_path), 'w') as f:
+        json.dump({'clusters': [{'members': members} for members in clusters]}, f)
+
+
+def subset_of(index):
+    return {rel: subset for subset, rels in index['files'].items() for rel in rels}
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / 'train')
+    os.makedirs(path)
+    write_manifest(path, COUNTS)
+    return path
+
+
+def test_same_seed_gives_the_same_split(dataset):
+    first = dataset_split.create_split(dataset, validation=0.2, test=0.1, seed=7)['files']
+    again = dataset_split.create_split(dataset, validation=0.2, test=0.1, seed=7)['files']
+    other = dataset_split.create_split(dataset, validation=0.2, test=0.1, seed=8)['files']
+    assert first == again
+    assert first != other
+
+
+def test_every_class_keeps_its_proportions(dataset):
+    index = dataset_split.create_split(dataset, validation=0.2, test=0.1)
+    subsets = subset_of(index)
+    assert len(subsets) == sum(COUNTS.values())
+    for name, total in COUNTS.items():
+        counts = {s: sum(1 for rel, sub in subsets.items() if sub == s and rel.startswith(name + '/'))
+                  for s in dataset_split.SUBSETS}
+        assert counts['validation'] == round(0.2 * total)
+        assert counts['test'] == round(0.1 * total)
+        assert counts['training'] == total - counts['validation'] - counts['test']
+
+
+def test_duplicate_clusters_never_straddle_subsets(dataset):
+    clusters = [[f"ayam_pop/img_{i:03d}.jpg" for i in range(start, start + 4)] for start in range(0, 48, 6)]
+    clusters.append(['rendang/img_000.jpg', 'rendang/img_019.jpg'])
+    write_clusters(dataset, clusters)
+    subsets = subset_of(dataset_split.create_split(dataset, validation=0.2, test=0.1))
+    for members in clusters:
+        assert len({subsets[rel] for rel in members}) == 1, members
+
+
+def test_clusters_written_after_the_index_are_applied(dataset):
+    index = dataset_split.create_split(dataset, validation=0.3)
+    subsets = subset_of(index)
+    training = next(rel for rel in index['files']['training'] if rel.startswith('rendang/'))
+    held_out = next(rel for rel in index['files']['validation'] if rel.startswith('rendang/'))
+    write_clusters(dataset, [[training, held_out]])
+
+    updated = subset_of(dataset_split.ensure_split(dataset))
+    assert updated[training] == updated[held_out]
+    assert {rel: s for rel, s in updated.items() if rel not in (training, held_out)} == \
+        {rel: s for rel, s in subsets.items() if rel not in (training, held_out)}
+    assert not dataset_split.clusters_changed(dataset, dataset_split.load_split(dataset))
+
+
+def test_adding_images_never_moves_existing_ones(dataset):
+    before = subset_of(dataset_split.create_split(dataset, validation=0.2, test=0.1))
+    grown = {name: n * 2 for name, n in COUNTS.items()}
+    write_manifest(dataset, grown)
+
+    # update keeps the stored fractions and seed even if others are passed
+    index = dataset_split.create_split(dataset, validation=0.5, seed=99, update=True)
+    after = subset_of(index)
+    assert index['fractions'] == {'validation': 0.2, 'test': 0.1}
+    assert {rel: after[rel] for rel in before} == before
+    assert len(after) == sum(grown.values())
+    for name, total in grown.items():
+        validation = sum(1 for rel, s in after.items() if s == 'validation' and rel.startswith(name + '/'))
+        assert abs(validation - round(0.2 * total)) <= 1
@@ -0,0 +1,97 @@
+"""
+Padang Food Recognition - download_dataset.py Sync Tests
+A temporary folder stands in for the kagglehub cache.
+
+Usage:
+    python -m pytest test_download_dataset.py
+"""
+
+import json
+import os
+
+import pytest
+
+import dataset_manifest
+import download_dataset
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    source, target = tmp_path / 'cache' / 'dataset_padang_food', tmp_path / 'dataset' / 'train'
+    write(source / 'rendang' / 'a.jpg', b'rendang a')
+    write(source / 'rendang' / 'b.jpg', b'rendang b')
+    write(source / 'ayam_pop' / 'c.jpg', b'ayam pop c')
+    return str(source), str(target)
+
+
+@pytest.mark.parametrize('link', download_dataset.LINK_MODES)
+def test_first_sync_transfers_every_file(dirs, link):
+    source, target = dirs
+    summary = download_dataset.sync(source, target, link=link)
+    assert summary['transferred'] == 3 and summary['unchanged'] == 0
+    for rel in ('rendang/a.jpg', 'rendang/b.jpg', 'ayam_pop/c.jpg'):
+        assert read(os.path.join(target, rel)) == read(os.path.join(source, rel))
+
+
+def test_unchanged_sync_transfers_nothing(dirs):
+    source, target = dirs
+    download_dataset.sync(source, target, link='copy')
+    summary = download_dataset.sync(source, target, link='copy')
+    assert summary['transferred'] == 0 and summary['unchanged'] == 3 and summary['removed'] == 0
+
+
+def test_modified_file_is_transferred_again(dirs):
+    source, target = dirs
+    download_dataset.sync(source, target, link='copy')
+    write(os.path.join(source, 'rendang', 'a.jpg'), b'rendang A')  # same size, new content
+    write(os.path.join(source, 'rendang', 'b.jpg'), b'rendang b, re-encoded')
+    summary = download_dataset.sync(source, target, link='copy')
+    assert summary['transferred'] == 2 and summary['unchanged'] == 1
+    assert read(os.path.join(target, 'rendang', 'a.jpg')) == b'rendang A'
+    assert read(os.path.join(target, 'rendang', 'b.jpg')) == b'rendang b, re-encoded'
+
+
+def test_same_size_copy_without_record_is_compared_by_content(dirs):
+    source, target = dirs
+    download_dataset.sync(source, target, link='copy')
+    os.remove(download_dataset.sync_manifest_path_for(target))
+    summary = download_dataset.sync(source, target, link='copy')
+    assert summary['transferred'] == 0 and summary['unchanged'] == 3
+
+
+def test_deleted_source_file_is_pruned(dirs):
+    source, target = dirs
+    download_dataset.sync(source, target, link='copy')
+    os.remove(os.path.join(source, 'ayam_pop', 'c.jpg'))
+    summary = download_dataset.sync(source, target, link='copy')
+    assert summary['removed'] == 1
+    assert not os.path.exists(os.path.join(target, 'ayam_pop'))
+
+    write(os.path.join(source, 'ayam_pop', 'd.jpg'), b'ayam pop d')
+    os.remove(os.path.join(source, 'rendang', 'b.jpg'))
+    summary = download_dataset.sync(source, target, link='copy', prune=False)
+    assert summary['removed'] == 0 and os.path.exists(os.path.join(target, 'rendang', 'b.jpg'))
+
+
+def test_quarantined_files_are_skipped(dirs):
+    source, target = dirs
+    os.makedirs(target)
+    manifest = {'version': dataset_manifest.MANIFEST_VERSION, 'classes': [], 'files': {},
+                'quarantined': [{'path': 'rendang/b.jpg', 'error': 'truncated'}]}
+    with open(dataset_manifest.manifest_path_for(target), 'w') as f:
+        json.dump(manifest, f)
+
+    summary = download_dataset.sync(source, target, link='copy')
+    assert summary['transferred'] == 2 and summary['skippedQuarantined'] == 1
+    assert not os.path.exists(os.path.join(target, 'rendang', 'b.jpg'))
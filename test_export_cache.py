@@ -0,0 +1,131 @@
+"""
+Padang Food Recognition - export_cache.py Tests
+
+Usage:
+    python -m pytest test_export_cache.py
+"""
+
+import os
+
+import pytest
+
+import export_cache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'export_cache.json')
+
+
+def run_stage(cache_path, key, outputs, content=b'weights'):
+    """Run a stage that writes `content` to every output file (model.json in a directory).
+
+    Returns the cache and how many times the stage was built.
+    """
+    calls = []
+
+    def build():
+        calls.append(1)
+        for path in outputs:
+            if os.path.isdir(path):
+                path = os.path.join(path, 'model.json')
+            with open(path, 'wb') as f:
+                f.write(content)
+
+    cache = export_cache.ExportCache(cache_path)
+    assert cache.run('tflite', key, outputs, build)
+    return cache, len(calls)
+
+
+def test_unchanged_stage_is_skipped(tmp_path, cache_path):
+    output = str(tmp_path / 'model.tflite')
+    key = export_cache.stage_key('tflite', {'model': 'abc'}, {'quantize': 'float16'})
+    cache, builds = run_stage(cache_path, key, [output])
+    assert builds == 1 and cache.built == ['tflite']
+
+    # A fresh ExportCache reads the record back from disk
+    cache, builds = run_stage(cache_path, key, [output])
+    assert builds == 0 and cache.built == []
+
+
+def test_changed_key_rebuilds(tmp_path, cache_path):
+    output = str(tmp_path / 'model.tflite')
+    run_stage(cache_path, export_cache.stage_key('tflite', {'model': 'abc'}, {'quantize': 'float16'}), [output])
+    assert export_cache.stage_key('tflite', {'model': 'abc'}, {'quantize': 'float16'}) == \
+        export_cache.stage_key('tflite', {'model': 'abc'}, {'quantize': 'float16'})
+
+    for inputs, config in (({'model': 'abd'}, {'quantize': 'float16'}), ({'model': 'abc'}, {'quantize': 'int8'})):
+        _, builds = run_stage(cache_path, export_cache.stage_key('tflite', inputs, config), [output])
+        assert builds == 1
+
+
+def test_missing_or_modified_output_forces_rebuild(tmp_path, cache_path):
+    output_dir = tmp_path / 'web_model'
+    output_dir.mkdir()
+    outputs = [str(output_dir / 'model.json'), str(tmp_path / 'model.tflite')]
+    key = export_cache.stage_key('tflite', {'model': 'abc'})
+    run_stage(cache_path, key, outputs)
+
+    os.remove(outputs[1])
+    _, builds = run_stage(cache_path, key, outputs)
+    assert builds == 1
+
+    with open(outputs[0], 'ab') as f:
+        f.write(b' edited')
+    _, builds = run_stage(cache_path, key, outputs)
+    assert builds == 1
+
+    # Untracked files in an output directory never trigger a rebuild
+    run_stage(cache_path, key, [str(output_dir)])
+    (output_dir / 'metadata.json').write_text('{"classes": []}')
+    _, builds = run_stage(cache_path, key, [str(output_dir)])
+    assert builds == 0
+
+
+def test_failed_stage_keeps_previous_record(tmp_path, cache_path):
+    output = str(tmp_path / 'model.tflite')
+    key = export_cache.stage_key('tflite', {'model': 'abc'})
+    run_stage(cache_path, key, [output])
+
+    def build():
+        raise export_cache.StageFailed('converter crashed')
+
+    cache = export_cache.ExportCache(cache_path)
+    assert not cache.run('tflite', export_cache.stage_key('tflite', {'model': 'new'}), [output], build)
+    assert cache.failed == ['tflite']
+    _, builds = run_stage(cache_path, key, [output])
+    assert builds == 0
+
+
+def test_staged_dir_swaps_in_the_new_tree(tmp_path):
+    target = tmp_path / 'web_model'
+    target.mkdir()
+    (target / 'model.json').write_text('old')
+    (target / 'metadata.json').write_text('classes')
+    (target / 'group1-shard1of1.bin').write_bytes(b'legacy')
+
+    with export_cache.staged_dir(str(target), carry=lambda name: name == 'metadata.json') as staging:
+        assert (target / 'model.json').read_text() == 'old'
+        with open(os.path.join(staging, 'model.json'), 'w') as f:
+            f.write('new')
+
+    assert sorted(os.listdir(target)) == ['metadata.json', 'model.json']
+    assert (target / 'model.json').read_text() == 'new'
+    assert (target / 'metadata.json').read_text() == 'classes'
+    assert sorted(os.listdir(tmp_path)) == ['web_model']
+
+
+def test_staged_dir_exception_leaves_previous_tree_intact(tmp_path):
+    target = tmp_path / 'web_model'
+    target.mkdir()
+    (target / 'model.json').write_text('old')
+
+    with pytest.raises(RuntimeError):
+        with export_cache.staged_dir(str(target)) as staging:
+            with open(os.path.join(staging, 'model.json'), 'w') as f:
+                f.write('half written')
+            raise RuntimeError('export crashed')
+
+    assert os.listdir(target) == ['model.json']
+    assert (target / 'model.json').read_text() == 'old'
+    assert sorted(os.listdir(tmp_path)) == ['web_model']
@@ -0,0 +1,86 @@
+"""
+Padang Food Recognition - model_surgery.py Tests
+
+Usage:
+    python -m pytest test_model_surgery.py
+"""
+
+import numpy as np
+import pytest
+from tensorflow import keras
+
+import model_surgery
+
+
+def build_residual_model():
+    """Conv -> BN -> ReLU -> residual block (Add) -> GAP -> Dense, with non-trivial BN statistics."""
+    inputs = keras.Input((16, 16, 3))
+    x = keras.layers.Conv2D(8, 3, padding='same', name='stem_conv')(inputs)
+    x = keras.layers.BatchNormalization(name='stem_bn')(x)
+    x = keras.layers.ReLU(name='stem_relu')(x)
+    y = keras.layers.Conv2D(6, 3, padding='same', name='block_conv1')(x)
+    y = keras.layers.BatchNormalization(name='block_bn1')(y)
+    y = keras.layers.ReLU(name='block_relu')(y)
+    y = keras.layers.Conv2D(8, 1, name='block_conv2')(y)
+    y = keras.layers.BatchNormalization(name='block_bn2')(y)
+    x = keras.layers.Add(name='block_add')([x, y])
+    x = keras.layers.ReLU(name='block_out')(x)
+    x = keras.layers.GlobalAveragePooling2D(name='pool')(x)
+    outputs = keras.layers.Dense(3, activation='softmax', name='classifier')(x)
+    model = keras.Model(inputs, outputs)
+
+    rng = np.random.default_rng(0)
+    for layer in model.layers:
+        if isinstance(layer, keras.layers.BatchNormalization):
+            gamma, beta, mean, var = layer.get_weights()
+            layer.set_weights([rng.uniform(0.5, 1.5, gamma.shape), rng.normal(0, 0.1, beta.shape),
+                               rng.normal(0, 0.1, mean.shape), rng.uniform(0.5, 1.5, var.shape)])
+    return model
+
+
+def test_prune_channels_keeps_function_on_kept_channels():
+    model = build_residual_model()
+    groups = {g.name: g for g in model_surgery.channel_groups(model)}
+    # The residual stream is one group fed by both convolutions; the block's inner width is another
+    assert set(groups['stem_conv'].producers) == {'stem_conv', 'block_conv2'}
+    assert groups['block_conv1'].channels == 6
+
+    keep = {'stem_conv': [0, 2, 3, 5, 7], 'block_conv1': [1, 2, 4]}
+    # Silence the dropped channels (BN gamma = beta = 0), so removing them must not change the output
+    for bn_name, group in (('stem_bn', 'stem_conv'), ('block_bn2', 'stem_conv'), ('block_bn1', 'block_conv1')):
+        bn = model.get_layer(bn_name)
+        gamma, beta, mean, var = bn.get_weights()
+        dropped = np.setdiff1d(np.arange(len(gamma)), keep[group])
+        gamma[dropped], beta[dropped] = 0.0, 0.0
+        bn.set_weights([gamma, beta, mean, var])
+
+    pruned = model_surgery.prune_channels(model, keep)
+    assert pruned.get_layer('stem_conv').filters == 5
+    assert pruned.get_layer('block_conv1').filters == 3
+    assert pruned.get_layer('classifier').kernel.shape == (5, 3)
+
+    images = np.random.default_rng(1).uniform(size=(4, 16, 16, 3)).astype(np.float32)
+
+    def features(m):
+        return keras.Model(m.input, m.get_layer('pool').output).predict(images, verbose=0)
+
+    np.testing.assert_allclose(features(pruned), features(model)[:, keep['stem_conv']], rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(pruned.predict(images, verbose=0), model.predict(images, verbose=0),
+                               rtol=1e-4, atol=1e-5)
+
+
+def test_prune_channels_identity_keep_matches_original():
+    model = build_residual_model()
+    keep = {g.name: np.arange(g.channels) for g in model_surgery.channel_groups(model)}
+    pruned = model_surgery.prune_channels(model, keep)
+
+    images = np.random.default_rng(2).uniform(size=(2, 16, 16, 3)).astype(np.float32)
+    np.testing.assert_allclose(pruned.predict(images, verbose=0), model.predict(images, verbose=0),
+                               rtol=1e-5, atol=1e-6)
+
+
+def test_inbound_names_rejects_unknown_config_format():
+    # tf.keras 2.x: nested [layer name, node index, tensor index, kwargs] lists
+    legacy = {'name': 'relu', 'inbound_nodes': [[['conv', 0, 0, {}]]]}
+    with pytest.raises(ValueError, match='relu'):
+        model_surgery.inbound_names(legacy)
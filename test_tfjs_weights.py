@@ -0,0 +1,72 @@
+"""
+Padang Food Recognition - tfjs_weights.py Tests
+
+Usage:
+    python -m pytest test_tfjs_weights.py
+"""
+
+import os
+
+import numpy as np
+
+import tfjs_weights
+
+
+def arrays():
+    rng = np.random.default_rng(0)
+    # Odd sizes so arrays span shard boundaries
+    return [rng.normal(size=shape).astype(np.float32) for shape in ((37, 11), (5,), (3, 3, 8, 16), (250,))]
+
+
+def write_all(output_dir, shard_bytes):
+    writer = tfjs_weights.ShardedWeightWriter(str(output_dir), shard_bytes=shard_bytes)
+    for array in arrays():
+        writer.write(array)
+    return writer, writer.close()
+
+
+def test_shards_stay_within_size_and_hold_every_byte(tmp_path):
+    writer, names = write_all(tmp_path, shard_bytes=1000)
+    sizes = [os.path.getsize(tmp_path / name) for name in names]
+    expected = b''.join(array.tobytes() for array in arrays())
+
+    assert all(size <= 1000 for size in sizes)
+    assert all(size == 1000 for size in sizes[:-1])
+    assert sum(sizes) == writer.total_bytes == len(expected)
+    assert b''.join((tmp_path / name).read_bytes() for name in names) == expected
+    assert all(tfjs_weights.HASHED_SHARD_RE.match(name) for name in names)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_identical_content_reuses_shard_names(tmp_path):
+    _, first = write_all(tmp_path, shard_bytes=1000)
+    mtimes = {name: os.stat(tmp_path / name).st_mtime_ns for name in first}
+
+    writer, second = write_all(tmp_path, shard_bytes=1000)
+    assert second == first
+    assert writer.reused == len(first)
+    assert {name: os.stat(tmp_path / name).st_mtime_ns for name in second} == mtimes
+
+
+def test_changed_content_gets_a_new_name(tmp_path):
+    _, first = write_all(tmp_path, shard_bytes=1000)
+    writer = tfjs_weights.ShardedWeightWriter(str(tmp_path), shard_bytes=1000)
+    changed = arrays()
+    changed[-1][-1] += 1.0  # only the last shard differs
+    for array in changed:
+        writer.write(array)
+    second = writer.close()
+    assert second[:-1] == first[:-1] and second[-1] != first[-1]
+    assert writer.reused == len(first) - 1
+
+
+def test_remove_stale_shards_covers_hashed_and_legacy_names(tmp_path):
+    _, keep = write_all(tmp_path, shard_bytes=1000)
+    stale = ['group1-shard9-0123456789abcdef.bin', 'group1-shard1of3.bin', 'group2-shard3of3.bin']
+    others = ['model.json', 'metadata.json', 'notes.bin']
+    for name in stale + others:
+        (tmp_path / name).write_bytes(b'x')
+
+    removed = tfjs_weights.remove_stale_shards(str(tmp_path), keep)
+    assert sorted(removed) == sorted(stale)
+    assert sorted(os.listdir(tmp_path)) == sorted(keep + others)
@@ -0,0 +1,94 @@
+"""
+Padang Food Recognition - Streaming TF.js Weight Shards
+Writes weight arrays to fixed-size shard files without building the whole
+blob in memory. Each shard is named after its content hash, so it can be
+cached forever by browsers/CDNs and is only re-downloaded when it changes.
+"""
+
+import hashlib
+import os
+import re
+
+DEFAULT_SHARD_BYTES = 4 * 1024 * 1024
+SHARD_PREFIX = "group1-shard"
+HASHED_SHARD_RE = re.compile(rf"^{SHARD_PREFIX}\d+-[0-9a-f]{{16}}\.bin$")
+# tensorflowjs_converter / earlier exports: group1-shard3of6.bin
+LEGACY_SHARD_RE = re.compile(r"^group\d+-shard\d+of\d+\.bin$")
+CHUNK_BYTES = 1 << 20
+
+
+class ShardedWeightWriter:
+    """Streams bytes into `shard_bytes`-sized, content-hashed shard files.
+
+    TF.js concatenates the shards listed in a manifest group and reads the
+    weights back by offset, so arrays may span shard boundaries.
+    """
+
+    def __init__(self, output_dir, shard_bytes=DEFAULT_SHARD_BYTES):
+        self.output_dir = output_dir
+        self.shard_bytes = shard_bytes
+        self.paths = []
+        self.total_bytes = 0
+        self.reused = 0
+        self._file = None
+        self._hash = None
+        self._size = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open(self):
+        self._tmp_path = os.path.join(self.output_dir, f".{SHARD_PREFIX}{len(self.paths) + 1}.tmp")
+        self._file = open(self._tmp_path, 'wb')
+        self._hash = hashlib.sha256()
+        self._size = 0
+
+    def _finish(self):
+        self._file.close()
+        self._file = None
+        name = f"{SHARD_PREFIX}{len(self.paths) + 1}-{self._hash.hexdigest()[:16]}.bin"
+        final_path = os.path.join(self.output_dir, name)
+        if os.path.exists(final_path) and os.path.getsize(final_path) == self._size:
+            # Same content already on disk: keep the old file (and its mtime/cache)
+            os.remove(self._tmp_path)
+            self.reused += 1
+        else:
+            os.replace(self._tmp_path, final_path)
+        self.paths.append(name)
+
+    def write(self, array):
+        """Append one array's raw bytes (C order)."""
+        import numpy as np
+
+        data = memoryview(np.ascontiguousarray(array)).cast('B')
+        offset = 0
+        while offset < len(data):
+            if self._file is None:
+                self._open()
+            take = min(len(data) - offset, self.shard_bytes - self._size, CHUNK_BYTES)
+            chunk = data[offset:offset + take]
+            self._file.write(chunk)
+            self._hash.update(chunk)
+            self._size += take
+            self.total_bytes += take
+            offset += take
+            if self._size >= self.shard_bytes:
+                self._finish()
+
+    def close(self):
+        """Flush the last shard and return the shard file names in order."""
+        if self._file is not None:
+            self._finish()
+        return list(self.paths)
+
+
+def remove_stale_shards(output_dir, keep):
+    """Delete weight shards in output_dir that are not in `keep`.
+
+    Covers content-hashed shards and legacy groupN-shardNofM.bin files, so
+    switching exporters does not leave old shards behind.
+    """
+    removed = []
+    for name in os.listdir(output_dir):
+        if (HASHED_SHARD_RE.match(name) or LEGACY_SHARD_RE.match(name)) and name not in keep:
+            os.remove(os.path.join(output_dir, name))
+            removed.append(name)
+    return removed
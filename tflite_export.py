@@ -0,0 +1,118 @@
+"""
+Padang Food Recognition - TFLite Conversion Helpers
+Converts a Keras model to TFLite (optionally quantized) and wraps the TFLite
+interpreter (multi-threaded XNNPACK on CPU) with the same predict_on_batch()
+interface as a Keras model.
+"""
+
+import os
+
+TFLITE_MODES = ('none', 'float32', 'float16', 'int8')
+
+
+def tflite_path_for(keras_path, quantization='float32'):
+    """model/x.keras -> model/x.tflite, model/x_float16.tflite, model/x_int8.tflite"""
+    stem = os.path.splitext(keras_path)[0]
+    return f"{stem}.tflite" if quantization == 'float32' else f"{stem}_{quantization}.tflite"
+
+
+def keras_path_for(tflite_path):
+    """Inverse of tflite_path_for: model/x_float16.tflite -> model/x.keras"""
+    stem = os.path.splitext(tflite_path)[0]
+    for quantization in TFLITE_MODES:
+        if quantization not in ('none', 'float32') and stem.endswith(f"_{quantization}"):
+            stem = stem[:-len(quantization) - 1]
+            break
+    return f"{stem}.keras"
+
+
+def convert_tflite(model, quantization='float32', representative_images=None):
+    """Convert `model` to a TFLite flatbuffer.
+
+    quantization:
+        float32 - no quantization
+        float16 - float16 weights
+        int8    - full-integer, per-channel weights calibrated on
+                  `representative_images` (float32 inputs in model range)
+    """
+    import numpy as np
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantization == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if representative_images is None or not len(representative_images):
+            raise ValueError("int8 quantization needs representative images for calibration")
+
+        def representative_dataset():
+            for image in representative_images:
+                yield [np.expand_dims(image, 0).astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        # Keep float32 input/output so callers feed the same tensors as Keras
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantization != 'float32':
+        raise ValueError(f"Unsupported TFLite quantization: {quantization}")
+
+    return converter.convert()
+
+
+def export_tflite(model, output_path, quantization='float32', dataset_path=None, rescale=None):
+    """Convert and write a TFLite model; int8 is calibrated on `dataset_path`."""
+    if quantization == 'int8':
+        import quantization as quant
+        return quant.export_int8_tflite(model, output_path, dataset_path or quant.DEFAULT_DATASET_PATH, rescale)
+
+    content = convert_tflite(model, quantization)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, output_path)
+    print(f"   TFLite model ({quantization}): {output_path} ({len(content) / 1024 / 1024:.2f} MB)")
+    return content
+
+
+def _interpreter_class():
+    # The standalone LiteRT runtime replaces tf.lite.Interpreter when installed
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        import tensorflow as tf
+        return tf.lite.Interpreter
+
+
+class TFLiteModel:
+    """Minimal Keras-like wrapper around the TFLite interpreter.
+
+    The default op resolver applies the XNNPACK delegate on CPU, using
+    `num_threads` threads (None = runtime default).
+    """
+
+    def __init__(self, model_path=None, model_content=None, num_threads=None):
+        self.interpreter = _interpreter_class()(
+            model_path=model_path,
+            model_content=model_content,
+            num_threads=num_threads
+        )
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.input_shape = tuple(self.input['shape'])
+        self.batch_size = int(self.input_shape[0])
+
+    def predict_on_batch(self, batch):
+        import numpy as np
+
+        batch = np.asarray(batch, dtype=self.input['dtype'])
+        if batch.shape[0] != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input['index'], batch.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = batch.shape[0]
+        self.interpreter.set_tensor(self.input['index'], batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output['index']).copy()
@@ -0,0 +1,246 @@
+"""
+Padang Food Recognition - Knowledge Distillation
+Trains a small student network for browser inference on the soft targets of
+the EfficientNetV2B0 teacher saved by train_model_optimized.py.
+
+- Teacher logits are computed once per (teacher weights, dataset, image size)
+  and cached on disk, so epochs only run the student
+- Loss: alpha * T^2 * KL(teacher_T || student_T) + (1 - alpha) * cross-entropy
+- Students take [0, 1] inputs, like the web app (imgTensor.div(255))
+
+Usage:
+    python train_distill.py [--student mobilenet_v3_small|mobilenet_v2_050]
+                            [--temperature 4] [--alpha 0.7] [--epochs 30]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras.applications import MobileNetV2, MobileNetV3Small
+from tensorflow.keras.layers import Dense, Dropout, GlobalAveragePooling2D, Rescaling
+from tensorflow.keras.callbacks import CSVLogger, EarlyStopping, ReduceLROnPlateau
+
+import data_pipeline
+import dataset_cache
+import dataset_split
+import feature_cache
+import quantization
+import training_metrics
+
+# Configuration
+DATASET_PATH = "./dataset/train"
+TEACHER_PATH = "./model/padang_food_model_optimized.keras"
+TEACHER_INPUT_SCALE = None  # EfficientNetV2 rescales internally (0-255 inputs)
+TEACHER_CACHE_DIR = "./model/teacher_cache"
+MODEL_OUTPUT_DIR = "./model"
+STUDENT_MODEL_PATH = "./model/padang_food_model_student.keras"
+REPORT_PATH = "./model/distill_report.json"
+LOG_FILE = "distill_log.csv"
+STUDENTS = ('mobilenet_v3_small', 'mobilenet_v2_050')
+STUDENT = 'mobilenet_v3_small'
+STUDENT_INPUT_SCALE = 1./255
+IMAGE_SIZE = (224, 224)
+BATCH_SIZE = 32
+EPOCHS_HEAD = 5
+EPOCHS = 30  # total, head epochs included
+TEMPERATURE = 4.0
+ALPHA = 0.7  # weight of the soft (teacher) term
+
+
+def teacher_logits(teacher, dataset_path, image_size, batch_size, cache_root=TEACHER_CACHE_DIR):
+    """Teacher log-probabilities for every training/validation image, cached.
+
+    Returns (class_indices, subsets, logits) where logits[subset] is aligned
+    with subsets[subset] from data_pipeline.list_image_files().
+    """
+    class_indices, subsets = data_pipeline.list_image_files(dataset_path)
+    _, everything = data_pipeline.list_image_files(dataset_path, validation_split=0.0)
+    paths, labels = everything['training']
+    key = hashlib.sha256(json.dumps({
+        'teacher': feature_cache.weights_digest(teacher),
+        'dataset': dataset_cache.dataset_fingerprint(dataset_path, paths, labels, image_size),
+        'validationSplit': data_pipeline.VALIDATION_SPLIT,
+        'split': dataset_split.split_digest(dataset_path),
+        'rescale': TEACHER_INPUT_SCALE
+    }, sort_keys=True).encode()).hexdigest()[:16]
+    cache_dir = os.path.join(cache_root, key)
+
+    logits = {}
+    for subset, (paths, labels) in subsets.items():
+        cache_file = os.path.join(cache_dir, f"{subset}_logits.npy")
+        if os.path.exists(cache_file):
+            logits[subset] = np.load(cache_file)
+            continue
+        print(f"   Running teacher over {len(paths)} {subset} images (cached afterwards)...")
+        ds = data_pipeline.build_dataset(
+            paths, labels, len(class_indices), image_size, batch_size,
+            rescale=TEACHER_INPUT_SCALE, cache=False
+        )
+        probs = np.concatenate([teacher.predict_on_batch(x) for x, _ in ds])
+        # Log-probabilities are logits up to a per-row constant, which softmax ignores
+        logits[subset] = np.log(np.clip(probs, 1e-7, 1.0)).astype(np.float32)
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(cache_file, logits[subset])
+    print(f"   Teacher logits: {cache_dir}")
+    return class_indices, subsets, logits
+
+
+def create_student(name, num_classes, image_size=IMAGE_SIZE):
+    """Student on [0, 1] inputs; returns (model, backbone)."""
+    inputs = keras.Input(shape=(*image_size, 3))
+    if name == 'mobilenet_v3_small':
+        # include_preprocessing expects 0-255
+        x = Rescaling(255.)(inputs)
+        base_model = MobileNetV3Small(
+            weights='imagenet', include_top=False, input_shape=(*image_size, 3),
+            include_preprocessing=True
+        )
+    elif name == 'mobilenet_v2_050':
+        # MobileNetV2 expects [-1, 1]
+        x = Rescaling(2., offset=-1.)(inputs)
+        base_model = MobileNetV2(
+            weights='imagenet', include_top=False, input_shape=(*image_size, 3), alpha=0.5
+        )
+    else:
+        raise ValueError(f"Unknown student: {name} (choose from {', '.join(STUDENTS)})")
+
+    base_model.trainable = False
+    # Backbone BatchNorm stays in inference mode, also while fine-tuning
+    x = base_model(x, training=False)
+    x = GlobalAveragePooling2D()(x)
+    x = Dropout(0.2)(x)
+    outputs = Dense(num_classes, activation='softmax', dtype='float32')(x)
+    return keras.Model(inputs, outputs, name=f"student_{name}"), base_model
+
+
+def distillation_loss(num_classes, temperature=TEMPERATURE, alpha=ALPHA):
+    """Loss on y_true = [one-hot label | teacher logits] and student softmax output."""
+    def loss(y_true, y_pred):
+        labels, teacher = y_true[:, :num_classes], y_true[:, num_classes:]
+        hard = keras.losses.categorical_crossentropy(labels, y_pred)
+
+        student = tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.0))
+        teacher_soft = tf.nn.softmax(teacher / temperature)
+        kl = tf.reduce_sum(
+            teacher_soft * (tf.math.log(teacher_soft + 1e-7) - tf.nn.log_softmax(student / temperature)),
+            axis=-1
+        )
+        # T^2 keeps the soft-target gradients on the same scale as the hard ones
+        return alpha * temperature ** 2 * kl + (1 - alpha) * hard
+    return loss
+
+
+def label_accuracy(num_classes):
+    """Accuracy against the one-hot part of the concatenated targets."""
+    def accuracy(y_true, y_pred):
+        return tf.cast(tf.equal(tf.argmax(y_true[:, :num_classes], axis=-1), tf.argmax(y_pred, axis=-1)), tf.float32)
+    return accuracy
+
+
+def distill(student_name=STUDENT, teacher_path=TEACHER_PATH, dataset_path=DATASET_PATH,
+            temperature=TEMPERATURE, alpha=ALPHA, epochs=EPOCHS):
+    print("=" * 60)
+    print("Padang Food Recognition - Knowledge Distillation")
+    print("=" * 60)
+
+    # Same held-out images as the trainers (written once, see dataset_split.py)
+    dataset_split.ensure_split(dataset_path)
+
+    print(f"\n[1/5] Loading teacher {teacher_path}...")
+    teacher = keras.models.load_model(teacher_path)
+    image_size = tuple(teacher.input_shape[1:3]) if teacher.input_shape[1] else IMAGE_SIZE
+    class_indices, subsets, logits = teacher_logits(teacher, dataset_path, image_size, BATCH_SIZE, TEACHER_CACHE_DIR)
+    num_classes = len(class_indices)
+
+    val_paths, val_labels = subsets['validation']
+    teacher_acc = float(np.mean(np.argmax(logits['validation'], axis=1) == np.asarray(val_labels)))
+    print(f"   Teacher validation accuracy: {teacher_acc:.2%}")
+
+    print("\n[2/5] Building datasets with soft targets...")
+    train_paths, train_labels = subsets['training']
+    train_ds = data_pipeline.build_dataset(
+        train_paths, train_labels, num_classes, image_size, BATCH_SIZE,
+        training=True, augment=True, rescale=STUDENT_INPUT_SCALE, extra_targets=logits['training']
+    )
+    val_ds = data_pipeline.build_dataset(
+        val_paths, val_labels, num_classes, image_size, BATCH_SIZE,
+        rescale=STUDENT_INPUT_SCALE, extra_targets=logits['validation']
+    )
+
+    print(f"\n[3/5] Creating student ({student_name}, T={temperature}, alpha={alpha})...")
+    student, base_model = create_student(student_name, num_classes, image_size)
+    print(f"   Parameters: student {student.count_params():,} vs teacher {teacher.count_params():,}")
+
+    throughput = training_metrics.ThroughputLogger(BATCH_SIZE, len(train_paths))
+    train_ds = throughput.instrument(train_ds)
+    callbacks = [
+        EarlyStopping(monitor='val_accuracy', mode='max', patience=6, restore_best_weights=True, verbose=1),
+        ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=3, min_lr=1e-7, verbose=1),
+        throughput,
+        CSVLogger(LOG_FILE)
+    ]
+    loss = distillation_loss(num_classes, temperature, alpha)
+
+    print("\n[4/5] Phase 1: head, then Phase 2: full student...")
+    student.compile(optimizer=keras.optimizers.Adam(1e-3), loss=loss, metrics=[label_accuracy(num_classes)])
+    student.fit(train_ds, validation_data=val_ds, epochs=EPOCHS_HEAD, callbacks=callbacks)
+
+    base_model.trainable = True
+    student.compile(optimizer=keras.optimizers.Adam(1e-4), loss=loss, metrics=[label_accuracy(num_classes)])
+    student.fit(train_ds, validation_data=val_ds, epochs=epochs, initial_epoch=EPOCHS_HEAD, callbacks=callbacks)
+
+    print("\n[5/5] Evaluating and saving...")
+    # Plain cross-entropy compile: the saved model needs no custom objects
+    student.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    plain_val = data_pipeline.build_dataset(
+        val_paths, val_labels, num_classes, image_size, BATCH_SIZE, rescale=STUDENT_INPUT_SCALE
+    )
+    _, student_acc = student.evaluate(plain_val, verbose=0)
+
+    sample = np.zeros((*image_size, 3), np.float32)
+    report = {
+        'temperature': temperature,
+        'alpha': alpha,
+        'imageSize': image_size[0],
+        'teacher': {'path': teacher_path, 'accuracy': teacher_acc, 'params': teacher.count_params(),
+                    'latencyMs': quantization.measure_latency_ms(teacher, sample)},
+        'student': {'name': student_name, 'path': STUDENT_MODEL_PATH, 'accuracy': float(student_acc),
+                    'params': student.count_params(), 'inputScale': STUDENT_INPUT_SCALE,
+                    'latencyMs': quantization.measure_latency_ms(student, sample)},
+    }
+
+    os.makedirs(MODEL_OUTPUT_DIR, exist_ok=True)
+    student.save(STUDENT_MODEL_PATH)
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    t, s = report['teacher'], report['student']
+    print(f"\n   {'':10} {'Accuracy':>10} {'Params':>12} {'Latency':>10}")
+    print(f"   {'Teacher':10} {t['accuracy']:>10.2%} {t['params']:>12,} {t['latencyMs']:>8.1f}ms")
+    print(f"   {'Student':10} {s['accuracy']:>10.2%} {s['params']:>12,} {s['latencyMs']:>8.1f}ms")
+    print(f"\nSaved student to {STUDENT_MODEL_PATH} and report to {REPORT_PATH}")
+    print(f"\nTo convert to TensorFlow.js, run:")
+    print(f"   tensorflowjs_converter --input_format=keras {STUDENT_MODEL_PATH} ./public/model")
+    return student, report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Distill the EfficientNetV2B0 teacher into a small student")
+    parser.add_argument('--student', choices=STUDENTS, default=STUDENT)
+    parser.add_argument('--teacher', default=TEACHER_PATH)
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--temperature', type=float, default=TEMPERATURE)
+    parser.add_argument('--alpha', type=float, default=ALPHA, help="Weight of the soft-target loss (0-1)")
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    args = parser.parse_args()
+    distill(args.student, args.teacher, args.dataset, args.temperature, args.alpha, args.epochs)
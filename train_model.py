@@ -3,6 +3,7 @@ Padang Food Recognition - Model Training Script
 Uses Transfer Learning with MobileNetV2 for efficient web deployment
 """
 
+import argparse
 import os
 import sys
 
@@ -20,6 +21,14 @@ from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLRO
 import json
 import subprocess
 
+import data_pipeline
+import dataset_manifest
+import dataset_split
+import feature_cache
+import training_metrics
+import training_modes
+import training_state
+
 # Configuration
 DATASET_PATH = "./dataset/padangfood/dataset_padang_food"
 if not os.path.exists(DATASET_PATH):
@@ -28,7 +37,29 @@ MODEL_OUTPUT_DIR = "./model"
 TFJS_OUTPUT_DIR = "./public/model"
 IMAGE_SIZE = (224, 224)
 BATCH_SIZE = 32
-EPOCHS = 30
+EPOCHS_HEAD = 10  # Phase 1 (frozen backbone)
+EPOCHS = 30  # total, Phase 1 included
+DROPOUT = 0.5  # after the 256-unit layer (the 128-unit layer keeps 0.3)
+FINE_TUNE_LAYERS = 30  # top backbone layers unfrozen in Phase 2, None = all
+HEAD_LR = 1e-3
+FINE_TUNE_LR = 1e-5
+# 'tf_data' (parallel decode/cache/prefetch) or 'generator' (legacy ImageDataGenerator)
+INPUT_PIPELINE = "tf_data"
+# True = cache decoded images in memory, a path = cache to disk, False = no cache
+CACHE_DATASET = True
+# Pre-decoded memory-mapped shards (see dataset_cache.py); None = decode JPEGs every epoch
+MATERIALIZED_CACHE_DIR = "./dataset/cache"
+# Phase 1 on cached backbone features instead of full forward passes
+HEAD_FROM_FEATURE_CACHE = False
+FEATURE_CACHE_DIR = "./model/feature_cache"
+FEATURE_CACHE_AUG_COPIES = 0  # extra augmented passes stored alongside the clean features
+# mixed_bfloat16 compute (variables and the softmax output stay float32)
+MIXED_PRECISION = False
+# XLA-compile the Phase 1 / Phase 2 train steps
+JIT_COMPILE = False
+# Full training state (weights, optimizer, phase, epoch, callback counters) for --resume
+CHECKPOINT_DIR = "./model/checkpoints/mobilenet"
+CHECKPOINT_EVERY = 1  # epochs
 
 # Class mappings for the web app
 CLASS_MAPPING = {
@@ -79,12 +110,12 @@ CLASS_MAPPING = {
     }
 }
 
-def create_model(num_classes):
-    """Create MobileNetV2-based model for transfer learning"""
+def create_model(num_classes, image_size=None):
+    """Create MobileNetV2-based model for transfer learning (image_size defaults to IMAGE_SIZE)"""
     base_model = MobileNetV2(
         weights='imagenet',
         include_top=False,
-        input_shape=(*IMAGE_SIZE, 3)
+        input_shape=(*(image_size or IMAGE_SIZE), 3)
     )
     
     base_model.trainable = False
@@ -92,16 +123,34 @@ def create_model(num_classes):
     x = base_model.output
     x = GlobalAveragePooling2D()(x)
     x = Dense(256, activation='relu')(x)
-    x = Dropout(0.5)(x)
+    x = Dropout(DROPOUT)(x)
     x = Dense(128, activation='relu')(x)
     x = Dropout(0.3)(x)
-    predictions = Dense(num_classes, activation='softmax')(x)
+    # Softmax in float32 keeps the loss stable under mixed precision
+    predictions = Dense(num_classes, activation='softmax', dtype='float32')(x)
     
     model = Model(inputs=base_model.input, outputs=predictions)
     
     return model, base_model
 
-def prepare_data():
+def prepare_data(pipeline=INPUT_PIPELINE):
+    """Prepare training/validation data with augmentation"""
+    # Index the dataset and move undecodable files aside before a long run
+    dataset_manifest.update_manifest(DATASET_PATH)
+    # Same held-out images for every run (written once, see dataset_split.py)
+    dataset_split.ensure_split(DATASET_PATH)
+    if pipeline == 'generator':
+        return prepare_generators()
+    return data_pipeline.prepare_datasets(
+        DATASET_PATH,
+        IMAGE_SIZE,
+        BATCH_SIZE,
+        rescale=1./255,
+        cache=CACHE_DATASET,
+        materialized_root=MATERIALIZED_CACHE_DIR
+    )
+
+def prepare_generators():
     """Prepare data generators with augmentation"""
     train_datagen = ImageDataGenerator(
         rescale=1./255,
@@ -111,40 +160,44 @@ def prepare_data():
         shear_range=0.2,
         zoom_range=0.2,
         horizontal_flip=True,
-        fill_mode='nearest',
-        validation_split=0.2
+        fill_mode='nearest'
     )
     
     val_datagen = ImageDataGenerator(
-        rescale=1./255,
-        validation_split=0.2
+        rescale=1./255
     )
     
-    train_generator = train_datagen.flow_from_directory(
-        DATASET_PATH,
+    # Subsets come from the persisted split index instead of validation_split;
+    # its frames list only manifest-verified images, so the per-file check is skipped
+    classes = dataset_split.load_split(DATASET_PATH)['classes']
+    train_generator = train_datagen.flow_from_dataframe(
+        dataset_split.subset_frame(DATASET_PATH, 'training'),
+        classes=classes,
         target_size=IMAGE_SIZE,
         batch_size=BATCH_SIZE,
         class_mode='categorical',
-        subset='training',
+        validate_filenames=False,
         shuffle=True
     )
     
-    val_generator = val_datagen.flow_from_directory(
-        DATASET_PATH,
+    val_generator = val_datagen.flow_from_dataframe(
+        dataset_split.subset_frame(DATASET_PATH, 'validation'),
+        classes=classes,
         target_size=IMAGE_SIZE,
         batch_size=BATCH_SIZE,
         class_mode='categorical',
-        subset='validation',
+        validate_filenames=False,
         shuffle=False
     )
     
     return train_generator, val_generator
 
-def train_model():
-    """Main training function"""
+def train_model(resume=False):
+    """Main training function; `resume` continues from the last checkpoint"""
     print("=" * 60)
     print("Padang Food Recognition - Model Training")
     print("=" * 60)
+    run = training_state.ResumableRun(CHECKPOINT_DIR, ('head', 'fine'), resume=resume, every=CHECKPOINT_EVERY)
     
     print("\n[1/6] Loading dataset...")
     train_gen, val_gen = prepare_data()
@@ -155,12 +208,15 @@ def train_model():
         print(f"   {idx}: {cls}")
     
     print("\n[2/6] Creating model...")
+    policy = training_modes.configure_precision(MIXED_PRECISION)
+    print(f"   Precision: {policy} | XLA (jit_compile): {JIT_COMPILE}")
     model, base_model = create_model(num_classes)
     
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=0.001),
+        optimizer=keras.optimizers.Adam(learning_rate=HEAD_LR),
         loss='categorical_crossentropy',
-        metrics=['accuracy']
+        metrics=['accuracy'],
+        jit_compile=JIT_COMPILE
     )
     
     print("\nModel Summary:")
@@ -169,7 +225,13 @@ def train_model():
     os.makedirs(MODEL_OUTPUT_DIR, exist_ok=True)
     os.makedirs(TFJS_OUTPUT_DIR, exist_ok=True)
     
+    # Per-epoch time, images/sec, step time, input wait and peak RSS in the history
+    mode_tags = training_modes.mode_tags(MIXED_PRECISION, JIT_COMPILE)
+    throughput = training_metrics.ThroughputLogger(BATCH_SIZE, train_gen.samples, tags=mode_tags)
+    train_gen = throughput.instrument(train_gen)
+    
     callbacks = [
+        throughput,
         EarlyStopping(
             monitor='val_accuracy',
             patience=5,
@@ -183,7 +245,8 @@ def train_model():
             min_lr=1e-7,
             verbose=1
         ),
-        ModelCheckpoint(
+        # Saved as float32 even under MIXED_PRECISION (convert_to_tfjs.py exports it)
+        training_modes.Float32ModelCheckpoint(
             os.path.join(MODEL_OUTPUT_DIR, 'best_model.keras'),
             monitor='val_accuracy',
             save_best_only=True,
@@ -192,42 +255,86 @@ def train_model():
     ]
     
     print("\n[3/6] Phase 1: Training classification head...")
-    history1 = model.fit(
-        train_gen,
-        validation_data=val_gen,
-        epochs=10,
-        callbacks=callbacks,
-        verbose=1
-    )
+    history1 = history2 = None
+    if not run.should_run('head'):
+        print("   Already complete in the checkpoint, skipping")
+    elif HEAD_FROM_FEATURE_CACHE:
+        head, train_features, val_features = feature_cache.prepare_head_training(
+            model, DATASET_PATH, IMAGE_SIZE, BATCH_SIZE,
+            rescale=1./255,
+            cache_root=FEATURE_CACHE_DIR,
+            augmented_copies=FEATURE_CACHE_AUG_COPIES,
+            materialized_root=MATERIALIZED_CACHE_DIR
+        )
+        head.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=HEAD_LR),
+            loss='categorical_crossentropy',
+            metrics=['accuracy'],
+            jit_compile=JIT_COMPILE
+        )
+        # The checkpoint would save the head alone; it resumes in Phase 2
+        head_throughput = training_metrics.ThroughputLogger(BATCH_SIZE, tags=mode_tags)
+        train_features = head_throughput.instrument(train_features)
+        head_callbacks = [head_throughput if c is throughput else c
+                          for c in callbacks if not isinstance(c, ModelCheckpoint)]
+        history1 = head.fit(
+            train_features,
+            validation_data=val_features,
+            epochs=EPOCHS_HEAD,
+            initial_epoch=run.initial_epoch('head', 0),
+            callbacks=head_callbacks + [run.checkpoint('head', head_callbacks, weights_model=model)],
+            verbose=1
+        )
+    else:
+        history1 = model.fit(
+            train_gen,
+            validation_data=val_gen,
+            epochs=EPOCHS_HEAD,
+            initial_epoch=run.initial_epoch('head', 0),
+            callbacks=callbacks + [run.checkpoint('head', callbacks)],
+            verbose=1
+        )
     
     print("\n[4/6] Phase 2: Fine-tuning top layers...")
     base_model.trainable = True
     
-    for layer in base_model.layers[:-30]:
-        layer.trainable = False
+    if FINE_TUNE_LAYERS:
+        for layer in base_model.layers[:-FINE_TUNE_LAYERS]:
+            layer.trainable = False
     
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=1e-5),
+        optimizer=keras.optimizers.Adam(learning_rate=FINE_TUNE_LR),
         loss='categorical_crossentropy',
-        metrics=['accuracy']
+        metrics=['accuracy'],
+        jit_compile=JIT_COMPILE
     )
     
-    history2 = model.fit(
-        train_gen,
-        validation_data=val_gen,
-        epochs=EPOCHS,
-        initial_epoch=10,
-        callbacks=callbacks,
-        verbose=1
-    )
+    if run.should_run('fine'):
+        history2 = model.fit(
+            train_gen,
+            validation_data=val_gen,
+            epochs=EPOCHS,
+            initial_epoch=run.initial_epoch('fine', EPOCHS_HEAD),
+            callbacks=callbacks + [run.checkpoint('fine', callbacks)],
+            verbose=1
+        )
+    else:
+        run.restore_weights(model)
     
     print("\n[5/6] Evaluating model...")
     val_loss, val_acc = model.evaluate(val_gen, verbose=0)
     print(f"   Validation Loss: {val_loss:.4f}")
     print(f"   Validation Accuracy: {val_acc:.4f}")
+    test_ds = data_pipeline.prepare_test_dataset(DATASET_PATH, IMAGE_SIZE, BATCH_SIZE, rescale=1./255)
+    if test_ds is not None:
+        test_loss, test_acc = model.evaluate(test_ds, verbose=0)
+        print(f"   Test Loss: {test_loss:.4f}")
+        print(f"   Test Accuracy: {test_acc:.4f}")
     
     keras_model_path = os.path.join(MODEL_OUTPUT_DIR, 'padang_food_model.keras')
     print(f"\n[6/6] Saving model to {keras_model_path}...")
+    # Exported artifacts are always float32, whatever the training precision
+    model = training_modes.float32_copy(model)
     model.save(keras_model_path)
     
     saved_model_path = os.path.join(MODEL_OUTPUT_DIR, 'saved_model')
@@ -282,4 +389,8 @@ def train_model():
     return model, history1, history2
 
 if __name__ == '__main__':
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the MobileNetV2 Padang food classifier")
+    parser.add_argument('--resume', action='store_true',
+                        help=f"Continue from the last checkpoint in {CHECKPOINT_DIR}")
+    args = parser.parse_args()
+    train_model(resume=args.resume)
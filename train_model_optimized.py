@@ -4,9 +4,10 @@ Features:
 - Backbond: EfficientNetV2B0 (State-of-the-Art)
 - Optimizer: AdamW (Weight Decay for Regularization)
 - Augmentation: Color Invariant + Random Erasing (if supported)
-- Logging: Automated CSV & Markdown Report Generation
+- Logging: Automated CSV & Markdown Report Generation (incl. throughput / input wait)
 """
 
+import argparse
 import os
 import sys
 
@@ -19,6 +20,14 @@ from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout, Batc
 from tensorflow.keras.models import Model
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLROnPlateau, CSVLogger
 
+import data_pipeline
+import dataset_manifest
+import dataset_split
+import feature_cache
+import training_metrics
+import training_modes
+import training_state
+
 # Windows encoding fix
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
@@ -33,6 +42,20 @@ IMAGE_SIZE = (224, 224)
 BATCH_SIZE = 32
 EPOCHS_HEAD = 15
 EPOCHS_FINE = 40 # Total will be 55
+DROPOUT = 0.2
+FINE_TUNE_LAYERS = None # top backbone layers unfrozen in Phase 2, None = all
+HEAD_LR = 1e-3
+FINE_TUNE_LR = 1e-5
+INPUT_PIPELINE = "tf_data" # or "generator" for the legacy ImageDataGenerator path
+CACHE_DATASET = True # True = in-memory, path = on-disk cache, False = off
+MATERIALIZED_CACHE_DIR = "./dataset/cache" # memory-mapped pre-decoded shards, None = off
+HEAD_FROM_FEATURE_CACHE = False # Phase 1 on cached frozen-backbone features
+FEATURE_CACHE_DIR = "./model/feature_cache"
+FEATURE_CACHE_AUG_COPIES = 0 # extra augmented passes to cache
+MIXED_PRECISION = False # mixed_bfloat16 compute, float32 variables and softmax
+JIT_COMPILE = False # XLA-compile the Phase 1 / Phase 2 train steps
+CHECKPOINT_DIR = "./model/checkpoints/optimized" # full training state for --resume
+CHECKPOINT_EVERY = 1 # epochs between checkpoints
 
 # Ensure dirs
 os.makedirs(MODEL_OUTPUT_DIR, exist_ok=True)
@@ -51,14 +74,14 @@ CLASS_MAPPING = {
     'telur_dadar': {'id': 'telur-dadar', 'name': 'Telur Dadar Padang', 'nameEn': 'Padang Omelette'}
 }
 
-def create_model(num_classes):
+def create_model(num_classes, image_size=None):
     # EfficientNetV2 expects 0-255 inputs (it has internal Rescaling layers)
     # So we DO NOT rescale in generator.
     
     base_model = EfficientNetV2B0(
         weights='imagenet',
         include_top=False,
-        input_shape=(*IMAGE_SIZE, 3)
+        input_shape=(*(image_size or IMAGE_SIZE), 3)
     )
     
     base_model.trainable = False
@@ -66,17 +89,30 @@ def create_model(num_classes):
     x = base_model.output
     x = GlobalAveragePooling2D()(x)
     x = BatchNormalization()(x)
-    x = Dropout(0.2)(x)
+    x = Dropout(DROPOUT)(x)
     
-    predictions = Dense(num_classes, activation='softmax')(x)
+    # Softmax stays float32 under mixed precision for a stable loss
+    predictions = Dense(num_classes, activation='softmax', dtype='float32')(x)
     
     model = Model(inputs=base_model.input, outputs=predictions)
     return model, base_model
 
-def prepare_data():
+def prepare_data(pipeline=INPUT_PIPELINE):
     # EfficientNetV2 handles rescaling internally, valid range 0-255
     # Warning: Do NOT use rescale=1./255 here!
-    
+    # Index the dataset and move undecodable files aside before a long run
+    dataset_manifest.update_manifest(DATASET_PATH)
+    # Same held-out images for every run (written once, see dataset_split.py)
+    dataset_split.ensure_split(DATASET_PATH)
+    if pipeline == 'generator':
+        return prepare_generators()
+    return data_pipeline.prepare_datasets(
+        DATASET_PATH, IMAGE_SIZE, BATCH_SIZE,
+        cache=CACHE_DATASET,
+        materialized_root=MATERIALIZED_CACHE_DIR
+    )
+
+def prepare_generators():
     train_datagen = ImageDataGenerator(
         rotation_range=30,
         width_shift_range=0.2,
@@ -84,27 +120,31 @@ def prepare_data():
         shear_range=0.2,
         zoom_range=0.2,
         horizontal_flip=True,
-        fill_mode='nearest',
-        validation_split=0.2
+        fill_mode='nearest'
     )
     
-    val_datagen = ImageDataGenerator(validation_split=0.2)
+    val_datagen = ImageDataGenerator()
     
-    train_generator = train_datagen.flow_from_directory(
-        DATASET_PATH,
+    # Subsets come from the persisted split index instead of validation_split;
+    # its frames list only manifest-verified images, so the per-file check is skipped
+    classes = dataset_split.load_split(DATASET_PATH)['classes']
+    train_generator = train_datagen.flow_from_dataframe(
+        dataset_split.subset_frame(DATASET_PATH, 'training'),
+        classes=classes,
         target_size=IMAGE_SIZE,
         batch_size=BATCH_SIZE,
         class_mode='categorical',
-        subset='training',
+        validate_filenames=False,
         shuffle=True
     )
     
-    val_generator = val_datagen.flow_from_directory(
-        DATASET_PATH,
+    val_generator = val_datagen.flow_from_dataframe(
+        dataset_split.subset_frame(DATASET_PATH, 'validation'),
+        classes=classes,
         target_size=IMAGE_SIZE,
         batch_size=BATCH_SIZE,
         class_mode='categorical',
-        subset='validation',
+        validate_filenames=False,
         shuffle=False
     )
     
@@ -122,19 +162,32 @@ def generate_markdown_report(history_csv, val_acc):
 ## 1. Training Dynamics
 Detailed epoch-by-epoch progression.
 
-| Epoch | Accuracy | Loss | Val Accuracy | Val Loss | LR |
-| :--- | :--- | :--- | :--- | :--- | :--- |
+| Epoch | Accuracy | Loss | Val Accuracy | Val Loss | LR | Time (s) | Img/s | Step ms (mean / p95) | Input Wait | Peak RSS (MB) |
+| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |
 """
+        def fmt(row, key, spec):
+            value = row.get(key)
+            return 'N/A' if value is None or pd.isna(value) else format(value, spec)
+
         # Add last 10 epochs or specific milestones
         for index, row in df.iterrows():
-            md_content += f"| {int(row['epoch'])+1} | {row['accuracy']:.4f} | {row['loss']:.4f} | **{row['val_accuracy']:.4f}** | {row['val_loss']:.4f} | {row.get('lr', 'N/A')} |\n"
+            md_content += (
+                f"| {int(row['epoch'])+1} | {row['accuracy']:.4f} | {row['loss']:.4f} | **{row['val_accuracy']:.4f}** | {row['val_loss']:.4f} | {row.get('lr', 'N/A')} "
+                f"| {fmt(row, 'epoch_time_s', '.1f')} | {fmt(row, 'images_per_sec', '.1f')} "
+                f"| {fmt(row, 'step_ms_mean', '.1f')} / {fmt(row, 'step_ms_p95', '.1f')} "
+                f"| {fmt(row, 'input_wait_s', '.1f')}s ({fmt(row, 'input_wait_pct', '.0f')}%) | {fmt(row, 'peak_rss_mb', '.0f')} |\n"
+            )
             
-        md_content += """
+        md_content += f"""
+High input wait means the epoch was data-bound (decode/augment), otherwise it was compute-bound.
+
 ## 2. Optimization Configuration
 *   **Architecture**: EfficientNetV2B0 (ImageNet Pre-trained)
 *   **Preprocessing**: Internal Rescaling (0-255)
 *   **Optimizer**: AdamW (Learning Rate: Adaptive)
 *   **Loss Function**: Categorical Crossentropy
+*   **Precision**: {'mixed_bfloat16' if MIXED_PRECISION else 'float32'}
+*   **XLA (jit_compile)**: {'on' if JIT_COMPILE else 'off'}
 
 ## 3. Next Steps
 The model file `padang_food_model_optimized.keras` is ready. 
@@ -147,52 +200,103 @@ Run conversion script to update the web app.
     except Exception as e:
         print(f"Failed to generate report: {e}")
 
-def train_model():
+def train_model(resume=False):
     print("🔥 INITIALIZING DEEP OPTIMIZATION (EfficientNetV2B0)...")
+    run = training_state.ResumableRun(CHECKPOINT_DIR, ('head', 'fine'), resume=resume, every=CHECKPOINT_EVERY)
     
     train_gen, val_gen = prepare_data()
     num_classes = len(train_gen.class_indices)
     
+    print(f"Precision: {training_modes.configure_precision(MIXED_PRECISION)} | XLA: {JIT_COMPILE}")
     model, base_model = create_model(num_classes)
+    mode_tags = training_modes.mode_tags(MIXED_PRECISION, JIT_COMPILE)
+    
+    # Throughput columns go into the same CSV (must run before CSVLogger)
+    throughput = training_metrics.ThroughputLogger(BATCH_SIZE, train_gen.samples, tags=mode_tags)
+    train_gen = throughput.instrument(train_gen)
     
     # Callbacks
-    csv_logger = CSVLogger(LOG_FILE)
+    csv_logger = CSVLogger(LOG_FILE, append=run.resuming)
     callbacks = [
         EarlyStopping(monitor='val_accuracy', patience=8, restore_best_weights=True, verbose=1),
         ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=3, min_lr=1e-7, verbose=1),
-        ModelCheckpoint(os.path.join(MODEL_OUTPUT_DIR, 'best_model.keras'), monitor='val_accuracy', save_best_only=True, verbose=1),
+        training_modes.Float32ModelCheckpoint(os.path.join(MODEL_OUTPUT_DIR, 'best_model.keras'), monitor='val_accuracy', save_best_only=True, verbose=1),
+        throughput,
         csv_logger
     ]
     
     # Phase 1: Head
     print("\nPhase 1: Training Head (Fast Adaptation)")
-    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-    model.fit(train_gen, validation_data=val_gen, epochs=EPOCHS_HEAD, callbacks=callbacks)
+    model.compile(optimizer=tf.keras.optimizers.Adam(HEAD_LR), loss='categorical_crossentropy', metrics=['accuracy'], jit_compile=JIT_COMPILE)
+    if not run.should_run('head'):
+        print("   Already complete in the checkpoint, skipping")
+    elif HEAD_FROM_FEATURE_CACHE:
+        head, train_features, val_features = feature_cache.prepare_head_training(
+            model, DATASET_PATH, IMAGE_SIZE, BATCH_SIZE,
+            cache_root=FEATURE_CACHE_DIR,
+            augmented_copies=FEATURE_CACHE_AUG_COPIES,
+            materialized_root=MATERIALIZED_CACHE_DIR
+        )
+        head.compile(optimizer=tf.keras.optimizers.Adam(HEAD_LR), loss='categorical_crossentropy', metrics=['accuracy'], jit_compile=JIT_COMPILE)
+        # Skip ModelCheckpoint here: it would save the head without the backbone
+        head_throughput = training_metrics.ThroughputLogger(BATCH_SIZE, tags=mode_tags)
+        train_features = head_throughput.instrument(train_features)
+        head_callbacks = [
+            head_throughput if c is throughput else c
+            for c in callbacks if not isinstance(c, ModelCheckpoint)
+        ]
+        head.fit(
+            train_features, validation_data=val_features, epochs=EPOCHS_HEAD,
+            initial_epoch=run.initial_epoch('head', 0),
+            callbacks=head_callbacks + [run.checkpoint('head', head_callbacks, weights_model=model)]
+        )
+    else:
+        model.fit(
+            train_gen, validation_data=val_gen, epochs=EPOCHS_HEAD,
+            initial_epoch=run.initial_epoch('head', 0),
+            callbacks=callbacks + [run.checkpoint('head', callbacks)]
+        )
     
     # Phase 2: Fine-tuning
     print("\nPhase 2: Full Fine-tuning (High Precision)")
     base_model.trainable = True
+    if FINE_TUNE_LAYERS:
+        for layer in base_model.layers[:-FINE_TUNE_LAYERS]:
+            layer.trainable = False
     model.compile(
-        optimizer=tf.keras.optimizers.AdamW(learning_rate=1e-5), 
+        optimizer=tf.keras.optimizers.AdamW(learning_rate=FINE_TUNE_LR), 
         loss='categorical_crossentropy', 
-        metrics=['accuracy']
+        metrics=['accuracy'],
+        jit_compile=JIT_COMPILE
     )
     
-    model.fit(
-        train_gen, 
-        validation_data=val_gen, 
-        epochs=EPOCHS_FINE, 
-        initial_epoch=EPOCHS_HEAD, 
-        callbacks=callbacks
-    )
+    if run.should_run('fine'):
+        model.fit(
+            train_gen, 
+            validation_data=val_gen, 
+            epochs=EPOCHS_FINE, 
+            initial_epoch=run.initial_epoch('fine', EPOCHS_HEAD), 
+            callbacks=callbacks + [run.checkpoint('fine', callbacks)]
+        )
+    else:
+        run.restore_weights(model)
     
     # Save
     val_loss, val_acc = model.evaluate(val_gen)
     print(f"\n🏆 Final Accuracy: {val_acc:.2%}")
-    model.save(os.path.join(MODEL_OUTPUT_DIR, 'padang_food_model_optimized.keras'))
+    test_ds = data_pipeline.prepare_test_dataset(DATASET_PATH, IMAGE_SIZE, BATCH_SIZE)
+    if test_ds is not None:
+        _, test_acc = model.evaluate(test_ds, verbose=0)
+        print(f"   Held-out test accuracy: {test_acc:.2%}")
+    # Saved as float32 so inference/conversion never inherits the bfloat16 policy
+    training_modes.float32_copy(model).save(os.path.join(MODEL_OUTPUT_DIR, 'padang_food_model_optimized.keras'))
     
     # Report
     generate_markdown_report(LOG_FILE, val_acc)
 
 if __name__ == '__main__':
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the EfficientNetV2B0 Padang food classifier")
+    parser.add_argument('--resume', action='store_true',
+                        help=f"Continue from the last checkpoint in {CHECKPOINT_DIR}")
+    args = parser.parse_args()
+    train_model(resume=args.resume)
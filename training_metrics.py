@@ -0,0 +1,136 @@
+"""
+Padang Food Recognition - Training Throughput Instrumentation
+Keras callback that adds per-epoch performance columns to the training logs
+(and therefore to CSVLogger / History):
+
+    epoch_time_s     wall time of the epoch, validation included
+    images_per_sec   training images per second of training time
+    step_ms_mean     mean training step time
+    step_ms_p95      95th percentile training step time
+    input_wait_s     time steps spent blocked on the input pipeline
+    input_wait_pct   input_wait_s as a share of training time
+    peak_rss_mb      peak host memory of the process
+
+plus any constant `tags` (e.g. mixed_bfloat16 / jit_compile flags) so runs
+with different training modes can be told apart in the same CSV.
+
+Input wait is only known for datasets passed through `instrument()`; other
+inputs (the legacy generators) log NaN for the two input_wait columns. It
+includes the small per-step dispatch overhead and skips the first step of
+each fit() call, which is dominated by tracing.
+"""
+
+import math
+import time
+
+import numpy as np
+import tensorflow as tf
+
+import perf_utils
+
+THROUGHPUT_COLUMNS = (
+    'epoch_time_s', 'images_per_sec', 'step_ms_mean', 'step_ms_p95',
+    'input_wait_s', 'input_wait_pct', 'peak_rss_mb'
+)
+
+
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    """Adds THROUGHPUT_COLUMNS to the epoch logs.
+
+    Must come before CSVLogger in the callbacks list so the extra keys are
+    already in `logs` when CSVLogger writes the row.
+    """
+
+    def __init__(self, batch_size, samples=None, tags=None, verbose=1):
+        super().__init__()
+        self.batch_size = batch_size
+        self.samples = samples
+        self.tags = dict(tags or {})
+        self.verbose = verbose
+        self.instrumented = False
+        self._input_ready = self._batch_images = None
+        self._tracing_step = False
+
+    def instrument(self, dataset):
+        """Return `dataset` with a timestamp taken when each batch reaches the
+        training step, so the time the step spent waiting for it (and its exact
+        size) is known.
+
+        The stamp is a synchronous map after the pipeline's prefetch buffer, so
+        it runs inside the step's get_next once the batch has been produced.
+        Non-tf.data inputs are returned unchanged.
+        """
+        if not isinstance(dataset, tf.data.Dataset):
+            return dataset
+
+        def mark_ready(batch_images):
+            self._input_ready = time.perf_counter()
+            self._batch_images = int(batch_images)
+            return np.float64(0.0)
+
+        def stamp(*batch):
+            ready = tf.py_function(mark_ready, [tf.shape(tf.nest.flatten(batch)[0])[0]], tf.float64)
+            with tf.control_dependencies([ready]):
+                return tuple(tf.identity(t) for t in batch)
+
+        instrumented = dataset.map(stamp)
+        # Keep the attributes data_pipeline attaches (class_indices, samples, ...)
+        for name in ('class_indices', 'samples', 'filenames'):
+            if hasattr(dataset, name):
+                setattr(instrumented, name, getattr(dataset, name))
+        self.instrumented = True
+        return instrumented
+
+    def on_train_begin(self, logs=None):
+        # The first step of each fit() also traces the train function
+        self._tracing_step = True
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+        self._step_times = []
+        self._images = 0
+        self._input_wait = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._input_ready = self._batch_images = None
+        self._step_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        now = time.perf_counter()
+        self._step_times.append(now - self._step_start)
+        self._images += self._batch_images or self.batch_size
+        if self._input_ready is not None and not self._tracing_step:
+            self._input_wait += max(0.0, self._input_ready - self._step_start)
+        self._tracing_step = False
+
+    def on_epoch_end(self, epoch, logs=None):
+        if logs is None or not self._step_times:
+            return
+        steps = np.asarray(self._step_times)
+        train_time = float(steps.sum())
+        images = self._images
+        if self.samples and not self.instrumented:
+            # Uninstrumented inputs: assume full batches, capped at one pass
+            images = min(images, self.samples)
+
+        wait = self._input_wait if self.instrumented else math.nan
+        peak_rss = perf_utils.peak_rss_mb()
+        stats = {
+            'epoch_time_s': round(time.perf_counter() - self._epoch_start, 3),
+            'images_per_sec': round(images / train_time, 2) if train_time else math.nan,
+            'step_ms_mean': round(float(steps.mean()) * 1000, 3),
+            'step_ms_p95': round(float(np.percentile(steps, 95)) * 1000, 3),
+            'input_wait_s': round(wait, 3),
+            'input_wait_pct': round(100 * wait / train_time, 2) if train_time else math.nan,
+            'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else math.nan,
+        }
+        logs.update(stats)
+        logs.update(self.tags)
+
+        if self.verbose:
+            wait_text = (f"input wait {stats['input_wait_s']:.1f}s ({stats['input_wait_pct']:.0f}%)"
+                         if self.instrumented else "input wait n/a")
+            print(f"   [throughput] {stats['epoch_time_s']:.1f}s | {stats['images_per_sec']:.1f} img/s | "
+                  f"step {stats['step_ms_mean']:.1f} ms (p95 {stats['step_ms_p95']:.1f}) | "
+                  f"{wait_text} | peak RSS {stats['peak_rss_mb']} MB"
+                  + "".join(f" | {k}={v}" for k, v in self.tags.items()))
@@ -0,0 +1,64 @@
+"""
+Padang Food Recognition - Opt-in Training Modes
+Mixed-precision (bfloat16) and XLA (jit_compile) switches shared by both
+training scripts.
+
+bfloat16 keeps float32's exponent range, so unlike float16 it needs no loss
+scaling; variables stay float32 and only the compute is bfloat16. On CPUs
+without native bfloat16 support it is usually slower, so measure first
+(the ThroughputLogger columns are tagged with the active modes).
+"""
+
+import tensorflow as tf
+
+MIXED_POLICY = 'mixed_bfloat16'
+
+
+def configure_precision(mixed_precision):
+    """Set the global Keras dtype policy before the model is built."""
+    policy = MIXED_POLICY if mixed_precision else 'float32'
+    tf.keras.mixed_precision.set_global_policy(policy)
+    return policy
+
+
+def mode_tags(mixed_precision, jit_compile):
+    """Numeric 0/1 columns identifying the run's modes in the training logs."""
+    return {'mixed_bfloat16': int(bool(mixed_precision)), 'jit_compile': int(bool(jit_compile))}
+
+
+def float32_copy(model):
+    """Rebuild `model` with float32 layers and the same weights.
+
+    Saved models are loaded by predict_manual / the TF.js and TFLite
+    converters, none of which should inherit the bfloat16 compute policy.
+    """
+    if all(layer.dtype_policy.name == 'float32' for layer in model.layers):
+        return model
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        config['dtype'] = 'float32'
+        return layer.__class__.from_config(config)
+
+    copy = tf.keras.models.clone_model(model, clone_function=clone_layer)
+    copy.set_weights(model.get_weights())
+    return copy
+
+
+class Float32ModelCheckpoint(tf.keras.callbacks.ModelCheckpoint):
+    """ModelCheckpoint whose saved model is a float32_copy of the training model.
+
+    best_model.keras is picked up by convert_to_tfjs.py, so under mixed
+    precision it must not carry the bfloat16 policy either. Float32 runs
+    save exactly as ModelCheckpoint does.
+    """
+
+    def on_epoch_end(self, epoch, logs=None):
+        best = self.best
+        super().on_epoch_end(epoch, logs)
+        saved = self.save_freq == 'epoch' and (not self.save_best_only or self.best != best)
+        if not saved or self.save_weights_only:
+            return
+        copy = float32_copy(self.model)
+        if copy is not self.model:
+            copy.save(self.filepath.format(epoch=epoch + 1, **(logs or {})), overwrite=True)
@@ -0,0 +1,213 @@
+"""
+Padang Food Recognition - Resumable Multi-Phase Training
+Periodic checkpoints of the full training state so a killed run (e.g. on a
+preemptible node) continues from its last completed epoch instead of
+starting again at Phase 1.
+
+A checkpoint holds the model weights, the optimizer variables (moments,
+iteration count, learning rate), the current phase and epoch, and the
+counters of EarlyStopping / ReduceLROnPlateau / ModelCheckpoint, including
+EarlyStopping's best weights. Each one is written to its own directory and
+only then published by atomically replacing state.json, so an interrupted
+save never corrupts the previous checkpoint.
+
+Resolution is one epoch: work done in a partially finished epoch is
+repeated, and the data shuffle order is not restored.
+"""
+
+import json
+import os
+import shutil
+import time
+import warnings
+
+import numpy as np
+from tensorflow import keras
+
+STATE_FILE = "state.json"
+STATE_VERSION = 1
+
+# Attributes that make up each stateful callback's progress
+CALLBACK_STATE = {
+    'EarlyStopping': ('wait', 'best', 'stopped_epoch', 'best_epoch'),
+    'ReduceLROnPlateau': ('wait', 'best', 'cooldown_counter'),
+    'ModelCheckpoint': ('best',),
+    'Float32ModelCheckpoint': ('best',),
+}
+
+
+def _to_json(value):
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return float(value)
+
+
+def load_state(checkpoint_dir):
+    """The last published checkpoint state, or None."""
+    path = os.path.join(checkpoint_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    return state if state.get('version') == STATE_VERSION else None
+
+
+class TrainingCheckpoint(keras.callbacks.Callback):
+    """Saves the training state every `every` epochs and at the end of the phase.
+
+    Put it after the callbacks it tracks: on_train_begin then restores their
+    counters after they have reset themselves, and on_train_end saves the
+    weights EarlyStopping(restore_best_weights=True) has put back.
+    `weights_model` is the full network when `fit` runs on a sub-model
+    sharing its layers (the cached-feature head).
+    """
+
+    def __init__(self, run, phase, callbacks, weights_model=None):
+        super().__init__()
+        self.run = run
+        self.phase = phase
+        self.tracked = [c for c in callbacks if type(c).__name__ in CALLBACK_STATE]
+        self.weights_model = weights_model
+        self.epoch = None
+
+    def on_train_begin(self, logs=None):
+        state = self.run.state
+        if state is None or self.run.restored:
+            return
+        self.run.restored = True
+        self.run.restore_weights(self.weights_model or self.model)
+        if state['phase'] != self.phase:
+            return
+
+        ckpt = os.path.join(self.run.checkpoint_dir, state['path'])
+        optimizer = self.model.optimizer
+        if not optimizer.built:
+            optimizer.build(self.model.trainable_variables)
+        with np.load(os.path.join(ckpt, 'optimizer.npz')) as data:
+            values = [data[f'arr_{i}'] for i in range(len(data.files))]
+        if len(values) == len(optimizer.variables):
+            for variable, value in zip(optimizer.variables, values):
+                variable.assign(value)
+        else:
+            print(f"   Warning: optimizer layout changed ({len(values)} saved vs "
+                  f"{len(optimizer.variables)} variables), optimizer state not restored")
+        optimizer.learning_rate = state['learningRate']
+
+        for callback in self.tracked:
+            name = type(callback).__name__
+            for attr, value in state['callbacks'].get(name, {}).items():
+                setattr(callback, attr, value)
+            best_weights = os.path.join(ckpt, 'best_weights.npz')
+            if name == 'EarlyStopping' and os.path.exists(best_weights):
+                with np.load(best_weights) as data:
+                    callback.best_weights = [data[f'arr_{i}'] for i in range(len(data.files))]
+        print(f"   Resumed {self.phase} at epoch {state['epoch']} "
+              f"(lr {state['learningRate']:.2e}, {state['callbacks']})")
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epoch = epoch + 1
+        if self.epoch % self.run.every == 0:
+            self.save(complete=False)
+
+    def on_train_end(self, logs=None):
+        if self.epoch is not None:
+            self.save(complete=True)
+
+    def save(self, complete):
+        run = self.run
+        name = f"{self.phase}-epoch{self.epoch:04d}{'-final' if complete else ''}"
+        ckpt = os.path.join(run.checkpoint_dir, name)
+        shutil.rmtree(ckpt, ignore_errors=True)
+        os.makedirs(ckpt)
+
+        (self.weights_model or self.model).save_weights(os.path.join(ckpt, 'model.weights.h5'))
+        optimizer = self.model.optimizer
+        np.savez(os.path.join(ckpt, 'optimizer.npz'), *[np.asarray(v) for v in optimizer.variables])
+        callbacks = {}
+        for callback in self.tracked:
+            callbacks[type(callback).__name__] = {
+                attr: _to_json(getattr(callback, attr, None)) for attr in CALLBACK_STATE[type(callback).__name__]
+            }
+            if isinstance(callback, keras.callbacks.EarlyStopping) and callback.best_weights is not None:
+                np.savez(os.path.join(ckpt, 'best_weights.npz'), *callback.best_weights)
+
+        state = {
+            'version': STATE_VERSION,
+            'phase': self.phase,
+            'phaseComplete': complete,
+            'epoch': self.epoch,
+            'learningRate': float(np.asarray(optimizer.learning_rate)),
+            'callbacks': callbacks,
+            'path': name,
+            'saved': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        tmp_path = os.path.join(run.checkpoint_dir, STATE_FILE + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, os.path.join(run.checkpoint_dir, STATE_FILE))
+
+        # The new checkpoint is published, older ones can go
+        for entry in os.listdir(run.checkpoint_dir):
+            if entry not in (name, STATE_FILE) and os.path.isdir(os.path.join(run.checkpoint_dir, entry)):
+                shutil.rmtree(os.path.join(run.checkpoint_dir, entry), ignore_errors=True)
+        run.state = state
+        run.restored = True
+
+
+class ResumableRun:
+    """Tracks which phases of a multi-phase run still have to be trained.
+
+    phases are the phase names in training order. Without `resume`, old
+    checkpoints are discarded and every phase runs from its first epoch.
+    """
+
+    def __init__(self, checkpoint_dir, phases, resume=False, every=1):
+        self.checkpoint_dir = checkpoint_dir
+        self.phases = tuple(phases)
+        self.every = max(1, every)
+        self.restored = False
+        if resume:
+            self.state = load_state(checkpoint_dir)
+            if self.state is None:
+                print(f"No checkpoint in {checkpoint_dir}, starting from the beginning")
+            else:
+                done = 'complete' if self.state['phaseComplete'] else f"epoch {self.state['epoch']}"
+                print(f"Resuming from {checkpoint_dir}: phase '{self.state['phase']}' {done}")
+        else:
+            self.state = None
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    @property
+    def resuming(self):
+        return self.state is not None
+
+    def should_run(self, phase, epochs=None):
+        """False if the checkpoint is past `phase` or `phase` finished.
+
+        With `epochs`, a finished phase that stopped before that epoch runs
+        again to extend it (the sweep grows a trial's budget this way).
+        """
+        if self.state is None:
+            return True
+        saved, current = self.phases.index(self.state['phase']), self.phases.index(phase)
+        if current != saved:
+            return current > saved
+        return not self.state['phaseComplete'] or (epochs is not None and self.state['epoch'] < epochs)
+
+    def initial_epoch(self, phase, default):
+        if self.state and self.state['phase'] == phase:
+            return self.state['epoch']
+        return default
+
+    def checkpoint(self, phase, callbacks, weights_model=None):
+        """The TrainingCheckpoint callback for `phase`; append it after `callbacks`."""
+        return TrainingCheckpoint(self, phase, callbacks, weights_model)
+
+    def restore_weights(self, model):
+        """Load the checkpointed weights into `model` (when a later phase is skipped)."""
+        if self.state is not None:
+            with warnings.catch_warnings():
+                # The optimizer is restored separately (it may belong to another phase)
+                warnings.filterwarnings('ignore', message='Skipping variable loading for optimizer')
+                model.load_weights(os.path.join(self.checkpoint_dir, self.state['path'], 'model.weights.h5'))